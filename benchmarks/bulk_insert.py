@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark: inserting daily quote into a local SQLite file, row by row vs. bulk_insert.
+
+Usage:
+    PYTHONPATH=src python benchmarks/bulk_insert.py [rows]
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+from sqlalchemy import create_engine, MetaData
+
+from qat.database import quote_table_daily_base, bulk_insert
+
+
+def make_quote(rows: int) -> dict:
+    rng = np.random.default_rng(0)
+    close = rng.random(rows) * 100
+    return {
+        'date': np.datetime64('1990-12-19') + np.arange(rows),
+        'open': close,
+        'high': close + 0.1,
+        'low': close - 0.1,
+        'close': close,
+        'volume': rng.integers(0, 10 ** 7, rows).astype(np.float64),
+        'amount': rng.random(rows) * 1e8,
+    }
+
+
+def timeit(title: str, rows: int, function) -> None:
+    begin = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - begin
+    print('{:<32}{:>10.3f} s{:>14,.0f} rows/s'.format(title, elapsed, rows / elapsed))
+
+
+def main(rows: int) -> None:
+    data = make_quote(rows)
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine('sqlite:///{}'.format(os.path.join(directory, 'benchmark.sqlite')))
+        metadata = MetaData()
+        row_table = quote_table_daily_base.tometadata(metadata, name='quote_row')
+        bulk_table = quote_table_daily_base.tometadata(metadata, name='quote_bulk')
+        metadata.create_all(engine)
+
+        row_count = min(rows, 20000)
+        row_data = [{x: y[i].item() for x, y in data.items()} for i in range(row_count)]
+
+        def row_by_row():
+            with engine.begin() as connection:
+                for item in row_data:
+                    connection.execute(row_table.insert(), item)
+
+        print('{} rows'.format(rows))
+        timeit('row by row ({} rows)'.format(row_count), row_count, row_by_row)
+        timeit('bulk_insert', rows, lambda: bulk_insert(bulk_table, data, bind=engine))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark: import time budget of qat modules, measured with <python -X importtime>.
+
+Each module is imported in a fresh interpreter, in an empty working directory. The benchmark fails
+(exit status 1) if a module exceeds its budget, pulls in a forbidden heavy dependency, or leaves files
+(qat.log, security.sqlite) behind.
+
+Usage:
+    PYTHONPATH=src python benchmarks/import_time.py
+"""
+
+import os
+import sys
+import subprocess
+import tempfile
+
+# module: (budget in milliseconds, modules that must not be imported)
+BUDGET = {
+    'qat': (20, ('pandas', 'numpy', 'sqlalchemy')),
+    'qat.config': (60, ('pandas', 'numpy', 'sqlalchemy')),
+    'qat.datasource.tdx': (300, ('pandas', 'sqlalchemy', 'qat.database')),
+    'qat.database': (800, ('pandas',)),
+    'qat.quote': (300, ('pandas', 'sqlalchemy', 'qat.database')),
+    'qat.data_source': (60, ('pandas', 'numpy', 'sqlalchemy')),
+    'qat.data_source.industry': (100, ('pandas', 'sqlalchemy')),
+    'qat.data_source.basic': (1000, ('pandas',)),
+    'qat.data_source.tdx_sync': (1000, ('pandas',)),
+    'qat.data_source.fetch': (300, ('pandas', 'numpy', 'sqlalchemy')),
+    'qat.data_source.tushare': (1000, ('pandas',)),
+}
+
+
+def measure(module: str, directory: str) -> (float, set):
+    """
+    Import a module in a fresh interpreter.
+    :return: (cumulative import time in milliseconds, names of all imported modules).
+    """
+    # 子进程在另一个目录中运行，PYTHONPATH 中的相对路径要先转为绝对路径。
+    environment = dict(os.environ)
+    environment['PYTHONPATH'] = os.pathsep.join(os.path.abspath(x)
+                                                for x in environment.get('PYTHONPATH', '').split(os.pathsep) if x)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import {}'.format(module)],
+                            cwd=directory,
+                            env=environment,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True,
+                            check=True)
+    imported = {}
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line and 'self [us]' not in line:
+            _, cumulative, name = line[len('import time:'):].split('|')
+            imported[name.strip()] = int(cumulative)
+    return imported[module] / 1000, set(imported.keys())
+
+
+def main() -> int:
+    failed = False
+    for module, (budget, forbidden) in BUDGET.items():
+        with tempfile.TemporaryDirectory() as directory:
+            elapsed, imported = measure(module, directory)
+            leftover = os.listdir(directory)
+        heavy = sorted(x for x in forbidden if x in imported)
+        ok = elapsed <= budget and not heavy and not leftover
+        failed = failed or not ok
+        print('{:<24}{:>10.1f} ms  (budget {:>4} ms)  {}{}{}'.format(
+            module, elapsed, budget,
+            'OK' if ok else 'FAIL',
+            '  imports: {}'.format(', '.join(heavy)) if heavy else '',
+            '  leaves: {}'.format(', '.join(leftover)) if leftover else ''))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
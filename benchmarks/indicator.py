@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark: technical indicators over the whole A-share market, full computation vs. incremental update.
+
+Usage:
+    PYTHONPATH=src python benchmarks/indicator.py [securities] [daily bars] [minute bars]
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from qat.quote import MA, EMA, MACD, RSI, KDJ, BOLL, ATR, OBV
+
+
+def make_bars(rows: int, seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    close = 10.0 * np.exp(np.cumsum(rng.normal(0.0, 0.02, rows)))
+    spread = close * rng.random(rows) * 0.02
+    return {
+        'open': close + spread * (rng.random(rows) - 0.5),
+        'high': close + spread,
+        'low': close - spread,
+        'close': close,
+        'volume': rng.integers(0, 10 ** 7, rows).astype(np.float64),
+    }
+
+
+def make_indicators() -> list:
+    return [MA(5), MA(20), EMA(12), MACD(), RSI(), KDJ(), BOLL(), ATR(), OBV()]
+
+
+def run(title: str, securities: int, rows: int) -> None:
+    market = [make_bars(rows, x) for x in range(securities)]
+    indicators = [make_indicators() for _ in range(securities)]
+
+    begin = time.perf_counter()
+    for bars, items in zip(market, indicators):
+        for item in items:
+            item.compute(bars)
+    full = time.perf_counter() - begin
+
+    new_bar = [{x: y[-1] for x, y in bars.items()} for bars in market]
+    begin = time.perf_counter()
+    for bar, items in zip(new_bar, indicators):
+        for item in items:
+            item.update(bar)
+    incremental = time.perf_counter() - begin
+
+    print('{}: {} securities x {} bars'.format(title, securities, rows))
+    print('    {:<36}{:>10.3f} s{:>14,.0f} bars/s'.format('compute (whole history)', full, securities * rows / full))
+    print('    {:<36}{:>10.3f} s'.format('update (one new bar each)', incremental))
+
+
+def main(securities: int, daily: int, minute: int) -> None:
+    run('daily', securities, daily)
+    run('1min', securities, minute)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 4000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 5000,
+         int(sys.argv[3]) if len(sys.argv) > 3 else 4800)
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark: loading daily quote per security from raw TDX files, SQLite quote tables and the column store.
+
+Usage:
+    PYTHONPATH=src python benchmarks/quote_store.py [securities] [records]
+"""
+
+import os
+import sys
+import time
+import datetime
+import tempfile
+
+import pandas as pd
+from sqlalchemy import create_engine, MetaData, select
+
+from qat.database import quote_table_daily_base, bulk_insert
+from qat.datasource.tdx import DailyQuoteReader
+from qat.quote import ColumnStore
+
+from tdx_daily import make_daily_file
+
+
+def timeit(title: str, function) -> None:
+    begin = time.perf_counter()
+    function()
+    print('{:<40}{:>10.3f} s'.format(title, time.perf_counter() - begin))
+
+
+def size_of(path: str) -> float:
+    if os.path.isfile(path):
+        return os.path.getsize(path) / 2 ** 20
+    return sum(os.path.getsize(os.path.join(x, z)) for x, _, y in os.walk(path) for z in y) / 2 ** 20
+
+
+def main(securities: int, records: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        vipdoc = os.path.join(directory, 'vipdoc')
+        os.makedirs(os.path.join(vipdoc, 'sh', 'lday'))
+        codes = ['{:06d}'.format(600000 + x) for x in range(securities)]
+        for code in codes:
+            make_daily_file(os.path.join(vipdoc, 'sh', 'lday', 'sh' + code + '.day'), records)
+
+        engine = create_engine('sqlite:///{}'.format(os.path.join(directory, 'benchmark.sqlite')))
+        metadata = MetaData()
+        table = {x: quote_table_daily_base.tometadata(metadata, name='quote_sh_stock_{}_daily'.format(x))
+                 for x in codes}
+        metadata.create_all(engine)
+        for code in codes:
+            frame = DailyQuoteReader(os.path.join(vipdoc, 'sh', 'lday', 'sh' + code + '.day')).to_pandas(date_as_object=False)
+            bulk_insert(table[code], frame, bind=engine)
+
+        store = ColumnStore(os.path.join(directory, 'store'))
+        store.import_tdx(vipdoc, 'daily', ('sh',))
+
+        print('{} securities x {} records'.format(securities, records))
+        print('{:<40}{:>10.1f} MB'.format('size: TDX files', size_of(vipdoc)))
+        print('{:<40}{:>10.1f} MB'.format('size: SQLite', size_of(os.path.join(directory, 'benchmark.sqlite'))))
+        print('{:<40}{:>10.1f} MB'.format('size: column store', size_of(store.root)))
+
+        start, end = datetime.date(2000, 1, 1), datetime.date(2000, 12, 31)
+
+        def sql(code, where=None, columns=None):
+            t = table[code]
+            query = select([t.c[x] for x in columns] if columns else [t])
+            if where:
+                query = query.where((t.c.date >= start) & (t.c.date <= end))
+            result = engine.execute(query.order_by(t.c.date))
+            return pd.DataFrame(result.fetchall(), columns=result.keys())
+
+        def tdx(code, **kwargs):
+            return DailyQuoteReader(os.path.join(vipdoc, 'sh', 'lday', 'sh' + code + '.day')).to_pandas(date_as_object=False, **kwargs)
+
+        timeit('full history: TDX files', lambda: [tdx(x) for x in codes])
+        timeit('full history: SQLite', lambda: [sql(x) for x in codes])
+        timeit('full history: column store', lambda: [store.read('daily', 'sh', x) for x in codes])
+        timeit('one year: TDX files', lambda: [tdx(x, start=start, end=end) for x in codes])
+        timeit('one year: SQLite', lambda: [sql(x, True) for x in codes])
+        timeit('one year: column store', lambda: [store.read('daily', 'sh', x, start, end) for x in codes])
+        timeit('one year, close only: SQLite', lambda: [sql(x, True, ['date', 'close']) for x in codes])
+        timeit('one year, close only: column store',
+               lambda: [store.read('daily', 'sh', x, start, end, columns=['close']) for x in codes])
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 5000)
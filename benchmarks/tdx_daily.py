@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark: decoding TDX .day files, generator path vs. NumPy path.
+
+Usage:
+    PYTHONPATH=src python benchmarks/tdx_daily.py [records]
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from qat.datasource.tdx import DailyQuoteReader
+
+
+def make_daily_file(filename: str, records: int) -> None:
+    """
+    Write a synthetic .day file with <records> records.
+    """
+    reader = DailyQuoteReader(filename)
+    data = np.zeros(records, dtype=reader.dtype)
+    date = np.datetime64('1990-12-19') + np.arange(records)
+    month = date.astype('datetime64[M]')
+    data['date'] = ((month.astype('datetime64[Y]').astype(np.int64) + 1970) * 10000
+                    + (month.astype(np.int64) % 12 + 1) * 100
+                    + (date - month).astype(np.int64) + 1)
+    rng = np.random.default_rng(0)
+    close = rng.integers(100, 10000, records)
+    data['open'] = close
+    data['high'] = close + 10
+    data['low'] = close - 10
+    data['close'] = close
+    data['amount'] = rng.random(records) * 1e8
+    data['volume'] = rng.integers(0, 1e7, records)
+    data['pre_close'] = np.roll(close, 1)
+    data.tofile(filename)
+
+
+def timeit(title: str, function) -> float:
+    begin = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - begin
+    print('{:<32}{:>10.3f} s'.format(title, elapsed))
+    return elapsed
+
+
+def main(records: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'sh600000.day')
+        make_daily_file(filename, records)
+        reader = DailyQuoteReader(filename)
+        print('{} records, {:.1f} MB'.format(records, os.path.getsize(filename) / 2 ** 20))
+
+        python = timeit('generator (to_python)',
+                        lambda: pd.DataFrame(reader.to_python(),
+                                             columns=['date', 'open', 'high', 'low', 'close', 'amount', 'volume']))
+        vectorized = timeit('numpy (to_pandas)', reader.to_pandas)
+        print('speed up: {:.1f}x'.format(python / vectorized))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000)
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+
+"""
+Backtest module.
+
+以面板（<qat.quote.Panel>，交易日 × 证券）为输入的向量化回测。
+    weights[t] 是第 t 根 K 线收盘后决定的目标仓位（占总资产的比例），在第 t + 1 根 K 线以开盘价或收盘价成交。
+每根 K 线上对全部证券整列计算：调仓数量、涨停不能买入、跌停不能卖出、停牌不能交易、
+T+1（当日买入的股份当日不能卖出，分钟线面板才会遇到）、佣金与卖出印花税、现金不足时按比例缩减买单。
+资金在 K 线之间传递，只有按时间的一层循环，与证券数无关；参数寻优用进程池并行，
+面板以 mmap 方式在各进程间共享（见 <Panel.load>）。
+A 股不能卖空，负的目标仓位视为 0；成交数量不取整到手。
+"""
+
+import concurrent.futures
+import typing
+
+import numpy as np
+
+from .config import logger
+from .quote.panel import Panel
+
+
+class BacktestResult:
+    """
+    回测结果，每根 K 线一个值。
+    """
+
+    def __init__(self,
+                 dates: np.ndarray,
+                 nav: np.ndarray,
+                 cost: np.ndarray,
+                 turnover: np.ndarray,
+                 positions: typing.Optional[np.ndarray] = None,
+                 parameters: typing.Optional[dict] = None):
+        """
+        :param dates: 日期（时间）。
+        :param nav: 总资产（收盘时）。
+        :param cost: 佣金与印花税。
+        :param turnover: 成交金额与成交前总资产之比。
+        :param positions: 持仓股数 (K 线 × 证券)，未记录则为 None。
+        :param parameters: 策略参数。
+        """
+        self.dates = dates
+        self.nav = nav
+        self.cost = cost
+        self.turnover = turnover
+        self.positions = positions
+        self.parameters = parameters
+
+    def __repr__(self):
+        return 'BacktestResult(parameters=%s, total_return=%.4f)' % (self.parameters, self.total_return)
+
+    @property
+    def total_return(self) -> float:
+        """
+        总收益率，没有 K 线时为 NaN。
+        """
+        return float(self.nav[-1] / self.nav[0] - 1.0) if len(self.nav) else np.nan
+
+    @property
+    def returns(self) -> np.ndarray:
+        """
+        每根 K 线的收益率，第一根为 0。
+        """
+        return np.r_[0.0, self.nav[1:] / self.nav[:-1] - 1.0][:len(self.nav)]
+
+    def summary(self, periods_per_year: int = 244) -> typing.Dict[str, float]:
+        """
+        :param periods_per_year: 每年的 K 线数，日线约 244。
+        :return: 总收益率、年化收益率、年化波动率、夏普比率（无风险利率为 0）、最大回撤、平均换手率、总费用。
+                 没有 K 线时除总费用外均为 NaN。
+        """
+        if len(self.nav) == 0:
+            return {
+                'total_return': np.nan,
+                'annual_return': np.nan,
+                'volatility': np.nan,
+                'sharpe': np.nan,
+                'max_drawdown': np.nan,
+                'turnover': np.nan,
+                'cost': 0.0,
+            }
+        returns = self.returns[1:]
+        years = max(len(returns), 1) / periods_per_year
+        total = self.total_return
+        volatility = returns.std() * np.sqrt(periods_per_year) if len(returns) else 0.0
+        drawdown = 1.0 - self.nav / np.maximum.accumulate(self.nav)
+        return {
+            'total_return': total,
+            'annual_return': (1.0 + total) ** (1.0 / years) - 1.0,
+            'volatility': volatility,
+            'sharpe': returns.mean() * periods_per_year / volatility if volatility > 0 else 0.0,
+            'max_drawdown': drawdown.max(),
+            'turnover': self.turnover.mean(),
+            'cost': self.cost.sum(),
+        }
+
+
+def _forward_fill(value: np.ndarray) -> np.ndarray:
+    """
+    沿时间（第 0 维）向前填充 NaN，整列运算。
+    """
+    index = np.where(np.isnan(value), 0, np.arange(len(value))[:, None])
+    np.maximum.accumulate(index, axis=0, out=index)
+    return value[index, np.arange(value.shape[1])]
+
+
+def backtest(panel: Panel,
+             weights: np.ndarray,
+             fill: str = 'open',
+             commission: float = 0.0003,
+             stamp_tax: float = 0.001,
+             limit: typing.Union[float, np.ndarray] = 0.1,
+             capital: float = 1000000.0,
+             record_positions: bool = False
+             ) -> BacktestResult:
+    """
+    向量化回测。
+    :param panel: 面板，需有 open（fill 为 'open' 时）、close，可以有 pre_close、volume。
+    :param weights: 目标仓位 (K 线 × 证券)，与 panel 对齐；NaN 视为 0。
+    :param fill: 'open' or 'close'，下一根 K 线的成交价。
+    :param commission: 佣金费率，买卖双向。
+    :param stamp_tax: 印花税率，只在卖出时收取。
+    :param limit: 涨跌停幅度，标量或每只证券一个值（如 ST 0.05、创业板 0.2）。
+    :param capital: 初始资金。
+    :param record_positions: True 则记录每根 K 线的持仓。
+    :return: BacktestResult.
+    """
+    close = np.asarray(panel['close'], dtype=np.float64)
+    price = np.asarray(panel[fill], dtype=np.float64)
+    if weights.shape != close.shape:
+        raise ValueError('Shape of weights {} does not match the panel {}.'.format(weights.shape, close.shape))
+    count, width = close.shape
+
+    # 估值价：停牌时沿用最后的收盘价。
+    mark_close = np.nan_to_num(_forward_fill(close))
+    # 涨跌停价由前收盘价计算，四舍五入到分。
+    reference = np.vstack([np.full((1, width), np.nan), mark_close[:-1]])
+    if 'pre_close' in panel.data:
+        given = np.asarray(panel['pre_close'], dtype=np.float64)
+        reference = np.where(given > 0, given, reference)
+    with np.errstate(invalid='ignore'):
+        rate = np.broadcast_to(np.asarray(limit, dtype=np.float64), (width,))
+        at_upper = price >= np.round(reference * (1.0 + rate), 2) - 1e-6
+        at_lower = price <= np.round(reference * (1.0 - rate), 2) + 1e-6
+        tradable = ~np.isnan(price)
+        if 'volume' in panel.data:
+            tradable &= np.asarray(panel['volume']) > 0
+    can_buy = tradable & ~at_upper
+    can_sell = tradable & ~at_lower
+    target_weight = np.clip(np.nan_to_num(np.asarray(weights, dtype=np.float64)), 0.0, None)
+
+    day = panel.dates.astype('datetime64[D]')
+    position = np.zeros(width)
+    locked = np.zeros(width)
+    cash = float(capital)
+    nav = np.empty(count)
+    cost = np.zeros(count)
+    turnover = np.zeros(count)
+    positions = np.zeros((count, width)) if record_positions else None
+    if count:
+        nav[0] = cash
+
+    for i in range(1, count):
+        if day[i] != day[i - 1]:
+            locked[:] = 0.0
+        # 成交价；不能交易的证券按最后的收盘价估值。
+        mark = np.where(tradable[i], np.nan_to_num(price[i]), mark_close[i - 1])
+        value = cash + position @ mark
+        with np.errstate(divide='ignore', invalid='ignore'):
+            target = np.where(mark > 0, target_weight[i - 1] * value / mark, 0.0)
+        delta = target - position
+
+        sell = np.where(can_sell[i] & (delta < 0), np.maximum(delta, locked - position), 0.0)
+        proceeds = -(sell @ mark)
+        sell_cost = proceeds * (commission + stamp_tax)
+        cash += proceeds - sell_cost
+
+        buy = np.where(can_buy[i] & (delta > 0), delta, 0.0)
+        need = (buy @ mark) * (1.0 + commission)
+        # 现金不足时按比例缩减买单；上一步舍入可能留下极小的负现金。
+        if need > max(cash, 0.0):
+            buy *= max(cash, 0.0) / need
+        spend = buy @ mark
+        buy_cost = spend * commission
+        cash -= spend + buy_cost
+
+        position += buy + sell
+        locked += buy
+        nav[i] = cash + position @ mark_close[i]
+        cost[i] = sell_cost + buy_cost
+        turnover[i] = (spend + proceeds) / value if value > 0 else 0.0
+        if record_positions:
+            positions[i] = position
+
+    return BacktestResult(panel.dates, nav, cost, turnover, positions)
+
+
+# 进程池中每个进程各自持有的面板，由 <_initialize_worker> 打开一次。
+_worker_panel: typing.Optional[Panel] = None
+
+
+def _initialize_worker(panel: typing.Union[Panel, str]) -> None:
+    global _worker_panel
+    _worker_panel = Panel.load(panel) if isinstance(panel, str) else panel
+
+
+def _run(task: tuple) -> BacktestResult:
+    strategy, parameters, kwargs = task
+    result = backtest(_worker_panel, strategy(_worker_panel, **parameters), **kwargs)
+    result.parameters = parameters
+    return result
+
+
+def sweep(strategy: typing.Callable[..., np.ndarray],
+          parameters: typing.Iterable[dict],
+          panel: typing.Union[Panel, str],
+          workers: typing.Optional[int] = None,
+          **kwargs
+          ) -> typing.List[BacktestResult]:
+    """
+    用进程池对多组参数并行回测。
+    :param strategy: 模块级函数 strategy(panel, **parameters) -> weights，以便传给子进程。
+    :param parameters: 参数组，每组一个 dict。
+    :param panel: 面板，或 <Panel.save> 保存的目录（子进程以 mmap 打开，不复制数据）。
+    :param workers: 进程数，None 为 CPU 核数，1 为在本进程内串行执行。
+    :param kwargs: 传给 <backtest>。
+    :return: 与 <parameters> 顺序相同的 BacktestResult。
+    """
+    tasks = [(strategy, x, kwargs) for x in parameters]
+    logger.debug('Backtest {} parameter sets with {} workers.'.format(len(tasks), workers or 'all'))
+    if workers == 1:
+        _initialize_worker(panel)
+        return list(map(_run, tasks))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers,
+                                                initializer=_initialize_worker,
+                                                initargs=(panel,)) as executor:
+        return list(executor.map(_run, tasks))
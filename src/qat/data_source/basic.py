@@ -8,41 +8,111 @@ import datetime
 import csv
 import os.path
 
-from sqlalchemy import inspect
+from sqlalchemy import select
+from sqlalchemy.orm import Session
 
 from qat.config import logger
-from qat.database import db_engine, db_inspect, db_metadata, db_session, ModelBase
+from qat.database import session_scope, ModelBase
 from qat.database import is_table_exist, create_table
+from qat.database.reference import reference_cache
+from qat.data_source.industry import IndustryTree
 from qat.database.model import (Currency,
                                 Location,
                                 Exchange,
                                 Board,
                                 SecurityStatus,
-                                IndustryBase,
                                 IndustryNBS,
                                 IndustryCSRC,
                                 IndustryCSIC)
 
 
+def _insert_joined(db_session: Session, instance: ModelBase, value_list: list, fields: list) -> None:
+    """
+    Insert items of a joined-inheritance class with one executemany per table.
+    The primary keys of the new base-table rows are fetched back by one select on the duplicate-check fields,
+    which must be columns of the base table.
+    :param db_session: the session.
+    :param instance: the ORM instance, type of <qat.database.ModelBase>.
+    :param value_list: new items, list of dict, with the polymorphic discriminator filled in.
+    :param fields: the duplicate-check fields.
+    :return:
+    """
+    # bulk_insert_mappings(return_defaults=True) 为了取回主键会逐行插入，这里每张表只执行一次。
+    mapper = instance.__mapper__
+    base, children = mapper.tables[0], mapper.tables[1:]
+    db_session.execute(base.insert(), [{x.name: item[x.name] for x in base.columns if x.name in item}
+                                       for item in value_list])
+
+    key_columns = [base.c[x] for x in fields]
+    rows = db_session.execute(select([base.c.id] + key_columns)
+                              .where(mapper.polymorphic_on == mapper.polymorphic_identity)).fetchall()
+    id_map = {tuple(x[1:]): x[0] for x in rows}
+    for table in children:
+        db_session.execute(table.insert(), [dict({x.name: item[x.name] for x in table.columns
+                                                  if x.name in item and not x.primary_key},
+                                                 **{x.name: id_map[tuple(item[y] for y in fields)]
+                                                    for x in table.primary_key.columns})
+                                            for item in value_list])
+
+
 def _initialize_from_value_list(instance: ModelBase,
                                 value_list: list,
                                 fields: list,
                                 create: bool = False
                                 ) -> None:
-    query_fields = list([getattr(instance, x) for x in fields])
-    duplicates_avoid_existed_element_list = db_session.query(*query_fields).all()
-
+    """
+    Insert the items whose duplicate-check fields are not in the table yet, in one batch.
+    Re-running is idempotent.
+    :param instance: the ORM instance, type of <qat.database.ModelBase>.
+    :param value_list: items, list of dict.
+    :param fields: the duplicate-check fields.
+    :param create: True if create the table when it does not exist.
+    :return:
+    """
     if not is_table_exist(instance) and create:
         create_table(instance)
 
-    item: dict
-    for item in value_list:
-        duplicates_avoid_new_element = (item[x] for x in fields)
-        if duplicates_avoid_new_element not in duplicates_avoid_existed_element_list:
-            parameter_dictionary = {x: item[x] for x in item.keys()}
-            db_session.add(instance(**parameter_dictionary))
-            duplicates_avoid_existed_element_list.append(list([item[x] for x in fields]))
-    db_session.commit()
+    # 批量插入不经过 ORM 对象的构造，多态鉴别字段要自己填。
+    mapper = instance.__mapper__
+    polymorphic = {mapper.polymorphic_on.key: mapper.polymorphic_identity} if mapper.polymorphic_on is not None else {}
+
+    # 查重与插入在同一个写事务中，并发的初始化不会插入重复记录。
+    with session_scope(write=True) as db_session:
+        query_fields = list([getattr(instance, x) for x in fields])
+        existed = set(tuple(x) for x in db_session.query(*query_fields).all())
+
+        new_list = []
+        item: dict
+        for item in value_list:
+            key = tuple(item[x] for x in fields)
+            if key not in existed:
+                existed.add(key)
+                new_list.append(dict(item, **polymorphic))
+
+        if new_list and len(mapper.tables) > 1:
+            _insert_joined(db_session, instance, new_list, fields)
+        elif new_list:
+            db_session.bulk_insert_mappings(instance, new_list)
+    reference_cache.invalidate(instance)
+    logger.debug('Insert {} new records into <{}>.'.format(len(new_list), instance.__tablename__))
+
+
+def _update_industry_tree(instance: ModelBase, tree: IndustryTree) -> None:
+    """
+    Persist the hierarchy (parent_id, level, lft, rgt) of an industry classification, in one batch.
+    :param instance: the ORM instance, type of <qat.database.ModelBase>.
+    :param tree: the industry tree.
+    :return:
+    """
+    id_map = {code: row.id for code, row in reference_cache.refresh(instance).items()}
+    with session_scope(write=True) as db_session:
+        db_session.bulk_update_mappings(instance, [{'id': id_map[x.code],
+                                                    'parent_id': id_map[x.parent.code] if x.parent else None,
+                                                    'level': x.level,
+                                                    'lft': x.lft,
+                                                    'rgt': x.rgt}
+                                                   for x in tree.order])
+    reference_cache.invalidate(instance)
 
 
 def initialize_table_currency() -> None:
@@ -224,7 +294,7 @@ def initialize_table_board() -> None:
     :return: None.
     """
     instance = Board
-    duplicated_check_fields = ['name', ]
+    duplicated_check_fields = ['exchange_id', 'name', ]
     logger.debug('Initialize table <{table_name}>.'.format(table_name=instance.__tablename__))
 
     item_list = [
@@ -262,17 +332,12 @@ def initialize_table_board() -> None:
          'currency': 'CNY', },
     ]
 
-    existed_list = db_session.query(Board.name).all()
+    # 交易所与货币的 id 各用一次查询取回，在内存中解析。
     for item in item_list:
-        if (item['name'],) not in existed_list:
-            db_session.add(Board(name=item['name'],
-                                 opening_date=item['opening_date'],
-                                 exchange_id=db_session.query(Exchange).filter(
-                                     Exchange.abbr_en == item['exchange']).first().id,
-                                 currency_id=db_session.query(Currency).filter(
-                                     Currency.abbr == item['currency']).first().id)
-                           )
-    db_session.commit()
+        item['exchange_id'] = reference_cache.resolve(Exchange, item.pop('exchange'))
+        item['currency_id'] = reference_cache.resolve(Currency, item.pop('currency'))
+
+    _initialize_from_value_list(instance, item_list, duplicated_check_fields)
 
 
 def initialize_table_security_status() -> None:
@@ -305,8 +370,9 @@ def initialize_table_industry_csrc() -> None:
     logger.debug('Initialize table <{table_name}>.'.format(table_name=instance.__tablename__))
 
     with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), csv_file), 'r', encoding='utf-8') as data:
-        item_list = csv.DictReader(data)
-        _initialize_from_value_list(instance, list(item_list), duplicated_check_fields)
+        item_list = list(csv.DictReader(data))
+    _initialize_from_value_list(instance, item_list, duplicated_check_fields)
+    _update_industry_tree(instance, IndustryTree(item_list))
 
 
 def initialize_table_industry_nbs() -> None:
@@ -320,8 +386,9 @@ def initialize_table_industry_nbs() -> None:
     logger.debug('Initialize table <{table_name}>.'.format(table_name=instance.__tablename__))
 
     with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), csv_file), 'r', encoding='utf-8') as data:
-        item_list = csv.DictReader(data)
-        _initialize_from_value_list(instance, list(item_list), duplicated_check_fields)
+        item_list = list(csv.DictReader(data))
+    _initialize_from_value_list(instance, item_list, duplicated_check_fields)
+    _update_industry_tree(instance, IndustryTree(item_list))
 
 
 def initialize_table_industry_csic() -> None:
@@ -335,5 +402,6 @@ def initialize_table_industry_csic() -> None:
     logger.debug('Initialize table <{table_name}>.'.format(table_name=instance.__tablename__))
 
     with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), csv_file), 'r', encoding='utf-8') as data:
-        item_list = csv.DictReader(data)
-        _initialize_from_value_list(instance, list(item_list), duplicated_check_fields)
+        item_list = list(csv.DictReader(data))
+    _initialize_from_value_list(instance, item_list, duplicated_check_fields)
+    _update_industry_tree(instance, IndustryTree(item_list))
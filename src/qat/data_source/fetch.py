@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+
+"""
+Database initialize module - asynchronous fetching from remote data sources.
+
+Requests run on an asyncio event loop:
+    - a semaphore bounds the requests in flight;
+    - a token bucket bounds the request rate (remote APIs limit calls per minute);
+    - failed requests are retried with exponential backoff, <config.RETRY_TIMES> / <config.RETRY_INTERVAL>,
+      for <config.RETRY_MAX_TIME> seconds at most.
+The semaphore and locks belong to the event loop they are used in, and are recreated for a new loop.
+The blocking HTTP calls (urllib) run in a thread pool as large as the semaphore,
+so the latency of thousands of requests overlaps instead of adding up.
+"""
+
+import asyncio
+import concurrent.futures
+import http.client
+import json
+import socket
+import time
+import typing
+import urllib.error
+import urllib.request
+
+from qat import config
+from qat.config import logger
+
+
+# 这些 HTTP 状态码表示暂时的失败，重试可能成功。
+RETRYABLE_STATUS = (408, 429, 500, 502, 503, 504)
+
+
+class FetchError(Exception):
+    """
+    A request failed and retrying would not help, or all retries failed.
+    """
+
+    def __init__(self, message: str, retryable: bool = False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Whether a failed request is worth retrying.
+    :param error: the exception raised by the request.
+    :return: True for timeouts, connection errors, HTTP 408/429/5xx and retryable <FetchError>.
+    """
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code in RETRYABLE_STATUS
+    if isinstance(error, FetchError):
+        return error.retryable
+    return isinstance(error, (urllib.error.URLError, socket.timeout, ConnectionError, http.client.HTTPException))
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter: <rate> tokens per second, bursts of up to <capacity>.
+    """
+
+    def __init__(self, rate: float, capacity: typing.Optional[float] = None):
+        """
+        :param rate: tokens per second.
+        :param capacity: the bucket size, None for max(1, rate).
+        """
+        self.rate = rate
+        self.capacity = max(1.0, rate) if capacity is None else capacity
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = None
+        self._loop = None
+
+    async def acquire(self) -> None:
+        """
+        Take one token, waiting until one is available.
+        """
+        # 锁属于创建它的事件循环，换了事件循环（如再次 asyncio.run）就重新创建；排队的协程按先后顺序取得令牌。
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+
+
+class AsyncFetcher:
+    """
+    Concurrent HTTP client with bounded concurrency, rate limiting and retries.
+    Use it as an async context manager, so that its thread pool is shut down.
+    """
+
+    def __init__(self,
+                 concurrency: int = 16,
+                 rate: typing.Optional[float] = None,
+                 capacity: typing.Optional[float] = None,
+                 retry_times: typing.Optional[int] = None,
+                 retry_interval: typing.Optional[float] = None,
+                 max_interval: float = 300.0,
+                 max_retry_time: typing.Optional[float] = None,
+                 timeout: float = 30.0):
+        """
+        :param concurrency: requests in flight at most.
+        :param rate: requests per second at most, None for no limit.
+        :param capacity: burst size of the rate limiter, see <TokenBucket>.
+        :param retry_times: retries after the first attempt, None for <config.RETRY_TIMES>.
+        :param retry_interval: delay before the first retry in seconds, doubled for each retry,
+            None for <config.RETRY_INTERVAL>.
+        :param max_interval: upper bound of the retry delay in seconds.
+        :param max_retry_time: give up once the retries of a request would take longer than this many seconds,
+            counted from its first attempt, None for <config.RETRY_MAX_TIME>.
+        :param timeout: timeout of each attempt in seconds.
+        """
+        self.concurrency = concurrency
+        self.retry_times = config.RETRY_TIMES if retry_times is None else retry_times
+        self.retry_interval = config.RETRY_INTERVAL if retry_interval is None else retry_interval
+        self.max_interval = max_interval
+        self.max_retry_time = config.RETRY_MAX_TIME if max_retry_time is None else max_retry_time
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate, capacity) if rate else None
+        self._semaphore = None
+        self._loop = None
+        self._executor = None
+
+    async def __aenter__(self) -> 'AsyncFetcher':
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Shut down the thread pool. The fetcher can be used again, with a new pool and semaphore.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._executor = None
+        self._semaphore = None
+        self._loop = None
+
+    def delay(self, attempt: int) -> float:
+        """
+        The backoff before retry number <attempt> (counted from 0).
+        """
+        return min(self.retry_interval * 2 ** attempt, self.max_interval)
+
+    def _open(self, url: str, data: typing.Optional[bytes], headers: dict) -> bytes:
+        request = urllib.request.Request(url, data=data, headers=headers)
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return response.read()
+
+    async def request(self,
+                      url: str,
+                      data: typing.Optional[bytes] = None,
+                      headers: typing.Optional[dict] = None,
+                      parse: typing.Optional[typing.Callable[[bytes], typing.Any]] = None
+                      ) -> typing.Any:
+        """
+        GET <url>, or POST <data> to it, retrying temporary failures.
+        :param url: the URL.
+        :param data: the request body, None for GET.
+        :param headers: request headers.
+        :param parse: applied to the response body; it may raise a retryable <FetchError>
+            for failures reported in the body (such as the API's own rate limiting).
+        :return: the response body, or what <parse> returns.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._loop = loop
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency)
+
+        attempt = 0
+        begin = time.monotonic()
+        while True:
+            if self.bucket is not None:
+                await self.bucket.acquire()
+            try:
+                # 退避等待时不占用并发名额。
+                async with self._semaphore:
+                    body = await loop.run_in_executor(self._executor, self._open, url, data, headers or {})
+                return body if parse is None else parse(body)
+            except Exception as error:
+                if not is_retryable(error):
+                    raise FetchError('Request <{}> failed: {}'.format(url, error)) from error
+                delay = self.delay(attempt)
+                if attempt >= self.retry_times or time.monotonic() - begin + delay > self.max_retry_time:
+                    raise FetchError('Request <{}> failed after {} retries: {}'.format(url, attempt, error),
+                                     retryable=True) from error
+                logger.debug('Request <{}> failed: {}, retry in {:.2f} s.'.format(url, error, delay))
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    async def request_json(self,
+                           url: str,
+                           payload: typing.Any = None,
+                           parse: typing.Optional[typing.Callable[[typing.Any], typing.Any]] = None
+                           ) -> typing.Any:
+        """
+        GET <url>, or POST <payload> as JSON to it, and decode the JSON response.
+        :param url: the URL.
+        :param payload: JSON-serializable request body, None for GET.
+        :param parse: applied to the decoded response, see <request>.
+        :return: the decoded response, or what <parse> returns.
+        """
+        data = None if payload is None else json.dumps(payload).encode('utf-8')
+        headers = {'Content-Type': 'application/json'} if data is not None else {}
+        decode = json.loads if parse is None else (lambda x: parse(json.loads(x)))
+        return await self.request(url, data, headers, decode)
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+"""
+Industry classification tree.
+
+行业分类的代码本身就带有层级（A → A1 → A11 → A111，或 00 → 0001 → 000101 → 00010101）：
+一个代码的上级是它在同一分类中存在的最长真前缀。
+按文件中的顺序先序遍历，为每个节点编号 (lft, rgt)（嵌套集合）：
+    节点的全部下级，正好是先序序列中 lft 在 (节点.lft, 节点.rgt] 内的连续一段；
+    叶子节点 lft == rgt。
+这样上级链为 O(depth)，全部下级为 O(k)，存入数据库后 SQL 也可以用 lft 上的索引做范围查询。
+"""
+
+import os.path
+import csv
+import typing
+
+
+class IndustryNode:
+    """
+    行业分类树的节点。
+    """
+
+    __slots__ = ('code', 'name_zh', 'name_en', 'comment', 'parent', 'children', 'level', 'lft', 'rgt')
+
+    def __init__(self, code: str, name_zh: str, name_en: str = '', comment: str = ''):
+        self.code = code
+        self.name_zh = name_zh
+        self.name_en = name_en
+        self.comment = comment
+        self.parent: typing.Optional[IndustryNode] = None
+        self.children: typing.List[IndustryNode] = []
+        self.level = 0
+        self.lft = 0
+        self.rgt = 0
+
+    @property
+    def is_leaf(self) -> bool:
+        return self.lft == self.rgt
+
+    def __repr__(self):
+        return 'IndustryNode(code="%s", name_zh="%s")' % (self.code, self.name_zh)
+
+
+class IndustryTree:
+    """
+    行业分类树的内存索引。
+    """
+
+    def __init__(self, item_list: typing.Iterable[dict]):
+        """
+        :param item_list: 行业，dict 需有 code, name_zh，可选 name_en, comment；顺序即同级节点的顺序。
+        """
+        self.node: typing.Dict[str, IndustryNode] = {}
+        for item in item_list:
+            self.node[item['code']] = IndustryNode(item['code'],
+                                                   item['name_zh'],
+                                                   item.get('name_en') or '',
+                                                   item.get('comment') or '')
+
+        self.root: typing.List[IndustryNode] = []
+        for node in self.node.values():
+            for length in range(len(node.code) - 1, 0, -1):
+                parent = self.node.get(node.code[:length])
+                if parent is not None:
+                    node.parent = parent
+                    parent.children.append(node)
+                    break
+            else:
+                self.root.append(node)
+
+        # 先序遍历编号。
+        self.order: typing.List[IndustryNode] = []
+        stack = [(x, 1) for x in reversed(self.root)]
+        while stack:
+            node, level = stack.pop()
+            node.level = level
+            node.lft = len(self.order)
+            self.order.append(node)
+            stack.extend((x, level + 1) for x in reversed(node.children))
+        for node in reversed(self.order):
+            node.rgt = node.children[-1].rgt if node.children else node.lft
+
+        self._name: typing.Dict[str, typing.List[IndustryNode]] = {}
+        for node in self.order:
+            self._name.setdefault(node.name_zh, []).append(node)
+
+    @classmethod
+    def from_csv(cls, filename: str) -> 'IndustryTree':
+        """
+        从 <qat/data_source/industry_*.csv> 格式的文件构造。
+        :param filename: 文件名，相对路径则相对于本模块所在目录。
+        :return: IndustryTree.
+        """
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), filename), 'r', encoding='utf-8') as data:
+            return cls(csv.DictReader(data))
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def __contains__(self, code: str) -> bool:
+        return code in self.node
+
+    def __getitem__(self, code: str) -> IndustryNode:
+        return self.node[code]
+
+    def parent(self, code: str) -> typing.Optional[IndustryNode]:
+        return self.node[code].parent
+
+    def level(self, code: str) -> int:
+        """
+        层级，门类（顶层）为 1。
+        """
+        return self.node[code].level
+
+    def ancestors(self, code: str) -> typing.List[IndustryNode]:
+        """
+        全部上级，由近及远，O(depth)。
+        """
+        result = []
+        node = self.node[code].parent
+        while node is not None:
+            result.append(node)
+            node = node.parent
+        return result
+
+    def descendants(self, code: str) -> typing.List[IndustryNode]:
+        """
+        全部下级（先序），O(k)。
+        """
+        node = self.node[code]
+        return self.order[node.lft + 1:node.rgt + 1]
+
+    def leaves(self, code: str) -> typing.List[IndustryNode]:
+        """
+        全部叶子下级，O(k)。
+        """
+        return [x for x in self.descendants(code) if x.is_leaf]
+
+    def is_ancestor(self, ancestor: str, code: str) -> bool:
+        """
+        <ancestor> 是否为 <code> 的上级，O(1)。
+        """
+        a, b = self.node[ancestor], self.node[code]
+        return a.lft < b.lft <= a.rgt
+
+    def map_to(self, code: str, other: 'IndustryTree') -> typing.List[IndustryNode]:
+        """
+        把本分类中的行业映射到另一个分类：取另一个分类中同名（中文）的行业；
+        没有同名行业时沿上级链向上找，O(depth)。
+        :param code: 本分类中的行业代码。
+        :param other: 另一个分类。
+        :return: 另一个分类中的行业，找不到时为空 list。
+        """
+        node = self.node[code]
+        while node is not None:
+            if node.name_zh in other._name:
+                return other._name[node.name_zh]
+            node = node.parent
+        return []
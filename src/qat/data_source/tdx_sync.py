@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+"""
+Database initialize module - incremental sync of TDX (通达信) quote files into the quote tables.
+
+The readers of the TDX files themselves are in <qat.datasource.tdx>.
+"""
+
+import os.path
+import typing
+import datetime
+
+from sqlalchemy import Table, select, func
+from sqlalchemy.orm import Session
+
+from qat.config import logger
+from qat.database import session_scope, get_quote_table, create_table, is_table_exist, bulk_insert
+from qat.database.model import QuoteSyncState
+from qat.database.calendar import save_trading_calendar
+from qat.datasource.tdx import TDX_FILE_LAYOUT, QuoteReaderBase, MinuteQuoteReader, find_quote_files, read_trading_dates
+from qat.quote.calendar import TradingCalendar
+from qat.quote.derive import derive_quote_columns
+
+
+# 通达信的交易所代码 -> 表<exchange>的<abbr_en>。
+TDX_EXCHANGE = {
+    'sh': 'SSE',
+    'sz': 'SZSE',
+}
+
+
+def _stored_records(db_session: Session, table: Table, reader: QuoteReaderBase) -> int:
+    """
+    The number of leading records of a file that are already in its quote table,
+    located by the last date (and time) in the table.
+    """
+    if 'time' in table.c:
+        row = db_session.execute(select([table.c.date, table.c.time])
+                                 .order_by(table.c.date.desc(), table.c.time.desc())
+                                 .limit(1)).first()
+        last = None if row is None else datetime.datetime.combine(row[0], row[1])
+    else:
+        last = db_session.execute(select([func.max(table.c.date)])).scalar()
+    return 0 if last is None else reader.locate(end=last).stop
+
+
+def sync_quote_file(filename: str,
+                    exchange: str,
+                    code: str,
+                    frequency: str = 'daily',
+                    product: str = 'stock',
+                    chunk_rows: int = 100000
+                    ) -> int:
+    """
+    Incrementally import a TDX quote file into its quote table.
+    Only the records appended since the last import are decoded and inserted;
+    if the file was rewritten, the quote table is reloaded from scratch.
+    A file without a sync state resumes after the last date already in the quote table.
+    :param filename: the TDX quote file.
+    :param exchange: exchange abbreviation, such as 'sh'.
+    :param code: security code, such as '600000'.
+    :param frequency: 'daily', '1min' or '5min'.
+    :param product: product, such as 'stock'.
+    :param chunk_rows: records decoded and inserted per batch.
+    :return: the number of inserted records.
+    """
+    if not is_table_exist(QuoteSyncState):
+        create_table(QuoteSyncState)
+
+    # 进度记录与行情在同一个写事务中提交。
+    with session_scope(write=True) as db_session:
+        reader = TDX_FILE_LAYOUT[frequency][2](filename)
+        size = reader.struct.size
+        stat = os.stat(filename)
+        state = db_session.query(QuoteSyncState).filter(QuoteSyncState.filename == filename).first()
+        if state is not None and state.size == stat.st_size and state.mtime == stat.st_mtime_ns:
+            return 0
+
+        record = reader.memmap()
+        table = get_quote_table(exchange, product, code, frequency)
+
+        begin = 0
+        if state is None:
+            state = QuoteSyncState(filename=filename, table_name=table.name)
+            db_session.add(state)
+            # 没有进度记录，而行情表已有数据（如进度表被清空、重建），由表中最后的日期定位，不重复导入。
+            begin = _stored_records(db_session, table, reader)
+        elif (state.offset <= len(record) * size
+              and (state.offset == 0 or record[state.offset // size - 1].tobytes().hex() == state.last_record)):
+            begin = state.offset // size
+        else:
+            logger.debug('File <{}> was rewritten, reload table <{}>.'.format(filename, table.name))
+            db_session.execute(table.delete())
+
+        # 由 <iter_chunks> 分批读入、解码、写入，内存占用与文件大小无关；前一条记录的收盘价直接从 memmap 取得，
+        # 派生列不必回读已导入的历史，批与批之间也由它衔接。
+        last = record[begin - 1:begin]
+        last_close = reader.decode(last)['close'].iloc[0] if begin > 0 else None
+        # 日线文件自带上日收盘价（除权参考价），优先于前一条记录的收盘价。
+        options = {} if isinstance(reader, MinuteQuoteReader) else {'pre_close': True}
+        end = begin
+        total = 0
+        for chunk in reader.iter_chunks(chunk_rows, raw=True, offset=begin):
+            frame = derive_quote_columns(reader.decode(chunk, **options), last_close)
+            # 与进度记录在同一个事务中写入。
+            total += bulk_insert(table, frame, bind=db_session.connection())
+            last_close = frame['close'].iloc[-1]
+            last = chunk[-1:]
+            end += len(chunk)
+
+        # 进度记到实际读入的最后一条记录，即使文件在 stat 之后又被追加。
+        state.offset = end * size
+        state.size = stat.st_size
+        state.mtime = stat.st_mtime_ns
+        if end > 0:
+            state.last_record = last[0].tobytes().hex()
+            state.last_date = reader.decode(last, date_as_object=True)['date'].iloc[0]
+            state.last_time = None
+            if isinstance(reader, MinuteQuoteReader):
+                minute = int(last[0]['time'])
+                state.last_time = datetime.time(hour=minute // 60, minute=minute % 60)
+
+    logger.debug('Import {} records from <{}> into <{}>.'.format(total, filename, table.name))
+    return total
+
+
+def sync_vipdoc(vipdoc: typing.Optional[str] = None,
+                frequency: str = 'daily',
+                exchange: typing.Iterable[str] = ('sh', 'sz'),
+                product: str = 'stock'
+                ) -> int:
+    """
+    Incrementally import all TDX quote files of a frequency under vipdoc.
+    :param vipdoc: the vipdoc directory, None for <config.TDX_ROOT_PATH>/vipdoc.
+    :param frequency: 'daily', '1min' or '5min'.
+    :param exchange: exchange abbreviations.
+    :param product: product, such as 'stock'.
+    :return: the number of inserted records.
+    """
+    return sum(sync_quote_file(filename, item, code, frequency, product)
+               for item, code, filename in find_quote_files(vipdoc, frequency, exchange))
+
+
+def sync_trading_calendar(vipdoc: typing.Optional[str] = None,
+                          exchange: typing.Iterable[str] = ('sh', 'sz')
+                          ) -> int:
+    """
+    Derive the trading calendars from the dates in the TDX daily files, and store the new sessions.
+    :param vipdoc: the vipdoc directory, None for <config.TDX_ROOT_PATH>/vipdoc.
+    :param exchange: exchange abbreviations.
+    :return: the number of inserted sessions.
+    """
+    return sum(save_trading_calendar(TDX_EXCHANGE[item], TradingCalendar(read_trading_dates(vipdoc, item)))
+               for item in exchange)
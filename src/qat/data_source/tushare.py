@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+
+"""
+Database initialize module - TuShare quote.
+
+TuShare Pro HTTP API: POST {"api_name", "token", "params", "fields"} as JSON, the response is
+    {"code": 0, "msg": "", "data": {"fields": [...], "items": [[...], ...]}}
+The daily quotes of all securities are requested concurrently through <AsyncFetcher>,
+and each response is written into its quote table by <bulk_insert> as soon as it arrives,
+in a single database thread so that the event loop never blocks.
+"""
+
+import asyncio
+import concurrent.futures
+import datetime
+import typing
+
+import numpy as np
+from sqlalchemy import select, func
+
+from qat import config
+from qat.config import logger
+from qat.database import get_engine, get_quote_table, bulk_insert
+from qat.data_source.fetch import AsyncFetcher, FetchError
+from qat.quote.derive import derive_quote_columns
+
+
+# TuShare 的返回码：每分钟调用次数超限，稍后重试即可。
+TUSHARE_RATE_LIMITED = 40203
+
+
+def _tushare_url() -> str:
+    return next(x['url'] for x in config.data_source if x['name'] == 'TuShare')
+
+
+def _parse(response: dict) -> typing.Dict[str, list]:
+    """
+    Turn a TuShare response into {field: values}.
+    """
+    if response.get('code') != 0:
+        raise FetchError('TuShare error {}: {}'.format(response.get('code'), response.get('msg')),
+                         retryable=response.get('code') == TUSHARE_RATE_LIMITED)
+    data = response.get('data') or {'fields': [], 'items': []}
+    columns = list(zip(*data['items'])) if data['items'] else [()] * len(data['fields'])
+    return {x: list(y) for x, y in zip(data['fields'], columns)}
+
+
+async def query(fetcher: AsyncFetcher,
+                api_name: str,
+                token: typing.Optional[str] = None,
+                url: typing.Optional[str] = None,
+                fields: str = '',
+                **params
+                ) -> typing.Dict[str, list]:
+    """
+    Call a TuShare API.
+    :param fetcher: the fetcher, type of <AsyncFetcher>.
+    :param api_name: the API, such as 'daily'.
+    :param token: the TuShare token, None for <config.TUSHARE_TOKEN>.
+    :param url: the API URL, None for the TuShare entry of <config.data_source>.
+    :param fields: comma-separated fields, '' for the API default.
+    :param params: the API parameters.
+    :return: {field: values}.
+    """
+    payload = {'api_name': api_name,
+               'token': config.TUSHARE_TOKEN if token is None else token,
+               'params': params,
+               'fields': fields}
+    return await fetcher.request_json(url or _tushare_url(), payload, _parse)
+
+
+def _to_quote(data: typing.Dict[str, list]):
+    """
+    Convert TuShare daily quotes into the columns of a daily quote table, sorted by date.
+    TuShare gives volume in lots (100 shares) and amount in thousand yuan, the tables
+    (like the TDX files) store shares and yuan.
+    <pct_chg> is in percent and is not used; <change_percent> is derived from <pre_close> as a ratio.
+    """
+    import pandas as pd
+
+    date = np.array(['{}-{}-{}'.format(x[:4], x[4:6], x[6:]) for x in data['trade_date']], dtype='datetime64[D]')
+    order = np.argsort(date)
+    frame = pd.DataFrame({
+        'date': date[order],
+        'open': np.asarray(data['open'], dtype=np.float64)[order],
+        'high': np.asarray(data['high'], dtype=np.float64)[order],
+        'low': np.asarray(data['low'], dtype=np.float64)[order],
+        'close': np.asarray(data['close'], dtype=np.float64)[order],
+        'volume': np.asarray(data['vol'], dtype=np.float64)[order] * 100.0,
+        'amount': np.asarray(data['amount'], dtype=np.float64)[order] * 1000.0,
+        'pre_close': np.asarray(data['pre_close'], dtype=np.float64)[order],
+    })
+    return derive_quote_columns(frame)
+
+
+async def _sync_daily(securities: typing.List[typing.Tuple[str, str]],
+                      start: typing.Optional[datetime.date],
+                      end: typing.Optional[datetime.date],
+                      product: str,
+                      fetcher: AsyncFetcher,
+                      token: typing.Optional[str],
+                      url: typing.Optional[str]
+                      ) -> int:
+    engine = get_engine()
+    end_date = (end or datetime.date.today()).strftime('%Y%m%d')
+    loop = asyncio.get_running_loop()
+    # 数据库调用是阻塞的，都交给一个线程依次执行：事件循环不被阻塞，写库也只有一个写者（SQLite 只允许一个写者）。
+    database = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    def last_date(exchange: str, code: str):
+        table = get_quote_table(exchange, product, code, 'daily')
+        return table, engine.execute(select([func.max(table.c.date)])).scalar()
+
+    def insert(table, data: dict) -> int:
+        return bulk_insert(table, _to_quote(data), bind=engine)
+
+    async def fetch(exchange: str, code: str):
+        table, last = await loop.run_in_executor(database, last_date, exchange, code)
+        begin = start
+        if last is not None:
+            following = last + datetime.timedelta(days=1)
+            begin = following if begin is None else max(begin, following)
+        params = {'ts_code': '{}.{}'.format(code, exchange.upper()), 'end_date': end_date}
+        if begin is not None:
+            params['start_date'] = begin.strftime('%Y%m%d')
+        try:
+            return table, await query(fetcher, 'daily', token, url, **params)
+        except FetchError as error:
+            # 重试用尽说明服务本身不可用，整批中止；其余错误（如代码无效）只跳过这只证券。
+            if error.retryable:
+                raise
+            logger.warning('Skip {}{}: {}'.format(exchange, code, error))
+            failed.append(exchange + code)
+            return table, {}
+
+    total = 0
+    failed = []
+    try:
+        async with fetcher:
+            # 网络请求并发进行，每个响应到达后即交给数据库线程写入。
+            for task in asyncio.as_completed([fetch(x, y) for x, y in securities]):
+                table, data = await task
+                if data.get('trade_date'):
+                    total += await loop.run_in_executor(database, insert, table, data)
+    finally:
+        database.shutdown()
+    if failed:
+        logger.warning('Failed to import {} of {} securities from TuShare: {}.'.format(
+            len(failed), len(securities), ', '.join(sorted(failed))))
+    return total
+
+
+def sync_tushare_daily(securities: typing.Iterable[typing.Tuple[str, str]],
+                       start: typing.Optional[datetime.date] = None,
+                       end: typing.Optional[datetime.date] = None,
+                       product: str = 'stock',
+                       token: typing.Optional[str] = None,
+                       url: typing.Optional[str] = None,
+                       concurrency: int = 16,
+                       rate: typing.Optional[float] = None,
+                       **kwargs
+                       ) -> int:
+    """
+    Incrementally import the daily quotes of securities from TuShare into their quote tables.
+    Each security is requested from the day after the last date already in its table.
+    :param securities: (exchange abbreviation, code), such as ('sh', '600000').
+    :param start: the first date, None for no limit.
+    :param end: the last date (inclusive), None for today.
+    :param product: product, such as 'stock'.
+    :param token: the TuShare token, None for <config.TUSHARE_TOKEN>.
+    :param url: the API URL, None for the TuShare entry of <config.data_source>.
+    :param concurrency: requests in flight at most.
+    :param rate: requests per second at most, None for no limit.
+    :param kwargs: passed to <AsyncFetcher>, such as retry_times and retry_interval.
+    :return: the number of inserted records. A security whose request fails without retry (such as
+        an unknown code) is skipped and logged; a request that fails after all retries aborts the batch.
+    """
+    securities = list(securities)
+    fetcher = AsyncFetcher(concurrency=concurrency, rate=rate, **kwargs)
+    total = asyncio.run(_sync_daily(securities, start, end, product, fetcher, token, url))
+    logger.debug('Import {} records of {} securities from TuShare.'.format(total, len(securities)))
+    return total
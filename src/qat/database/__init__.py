@@ -4,26 +4,184 @@
 Database interface module.
 """
 
-from sqlalchemy import create_engine, MetaData, inspect
-from sqlalchemy.orm import sessionmaker
+import contextlib
+import os
+import threading
+import typing
+
+from sqlalchemy import create_engine, event, MetaData, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.engine.reflection import Inspector
+from sqlalchemy.orm import sessionmaker, scoped_session, Session
+from sqlalchemy.pool import QueuePool, StaticPool
 from sqlalchemy.ext.declarative import declarative_base
 
 from .. import config
 
 ModelBase = declarative_base()
 
-db_engine = create_engine(config.database_url, echo=False)
-db_inspect = inspect(db_engine)
-db_session = sessionmaker(bind=db_engine)()
-db_metadata = MetaData(bind=db_engine)
-db_metadata.reflect(db_engine)
+# 表定义与按需反射得到的表，反射见 <qat.database.utility.get_table_instance>。
+db_metadata = MetaData()
+
+# 引擎和会话工厂在首次使用时才创建，导入本模块不会连接数据库。
+# 子进程不能沿用父进程的连接，记下创建引擎的进程，fork 之后在子进程中重新创建。
+_engine = None
+_engine_pid = None
+_session = None
+
+# SQLite 同一时刻只允许一个写者：本进程内的写操作在这把锁上排队，
+# 进程之间由 WAL 模式和 busy timeout 协调。
+_sqlite_writer = threading.RLock()
+
+
+def _set_sqlite_pragma(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    # WAL 模式下读者不阻塞写者，写者也不阻塞读者。
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
+
+
+def create_database_engine(url: str) -> Engine:
+    """
+    Create an engine configured for concurrent use.
+    PostgreSQL: a QueuePool sized by <config.DATABASE_POOL_SIZE> and <config.DATABASE_MAX_OVERFLOW>.
+    SQLite: WAL journal mode, connections usable across threads, and a busy timeout
+        of <config.SQLITE_BUSY_TIMEOUT> seconds for writers of other processes.
+        An in-memory database is a single connection shared by all threads.
+    :param url: the database URL.
+    :return: the engine, type of <sqlalchemy.engine.Engine>.
+    """
+    if url.startswith('sqlite'):
+        # 内存数据库默认每个线程一个连接，也就是每个线程各自一个空数据库。
+        memory = make_url(url).database in (None, '', ':memory:')
+        engine = create_engine(url,
+                               echo=False,
+                               poolclass=StaticPool if memory else None,
+                               connect_args={'timeout': config.SQLITE_BUSY_TIMEOUT, 'check_same_thread': False})
+        event.listen(engine, 'connect', _set_sqlite_pragma)
+        return engine
+    return create_engine(url,
+                         echo=False,
+                         poolclass=QueuePool,
+                         pool_size=config.DATABASE_POOL_SIZE,
+                         max_overflow=config.DATABASE_MAX_OVERFLOW,
+                         pool_timeout=config.DATABASE_POOL_TIMEOUT,
+                         pool_pre_ping=True)
+
+
+def get_engine() -> Engine:
+    """
+    Return the database engine of this process, created on first use.
+    :return: the engine, type of <sqlalchemy.engine.Engine>.
+    """
+    global _engine, _engine_pid, _session
+    if _engine is None or _engine_pid != os.getpid():
+        _engine = create_database_engine(config.database_url)
+        _engine_pid = os.getpid()
+        _session = None
+    return _engine
+
+
+def _get_session_registry() -> scoped_session:
+    global _session
+    engine = get_engine()
+    if _session is None:
+        _session = scoped_session(sessionmaker(bind=engine))
+    return _session
+
+
+def get_session() -> Session:
+    """
+    Return the session of the current thread, created on first use.
+    Each thread gets its own session; call <remove_session> when a worker thread finishes.
+    :return: the session, type of <sqlalchemy.orm.Session>.
+    """
+    return _get_session_registry()()
+
+
+def remove_session() -> None:
+    """
+    Close and discard the session of the current thread.
+    """
+    if _session is not None:
+        _session.remove()
+
+
+@contextlib.contextmanager
+def writer(bind: typing.Optional[Engine] = None) -> typing.Iterator[None]:
+    """
+    Hold the write lock while writing: on SQLite the writers of this process queue up here,
+    on other databases it does nothing.
+    :param bind: the engine written to, None for <get_engine()>.
+    """
+    if (bind or get_engine()).dialect.name == 'sqlite':
+        with _sqlite_writer:
+            yield
+    else:
+        yield
+
+
+@contextlib.contextmanager
+def session_scope(write: bool = False) -> typing.Iterator[Session]:
+    """
+    A new session for a unit of work: committed when the block succeeds,
+    rolled back when it raises, closed either way.
+    :param write: True if the block writes, so that it holds <writer> on SQLite.
+    :return: the session, type of <sqlalchemy.orm.Session>.
+    """
+    with writer() if write else contextlib.nullcontext():
+        session = _get_session_registry().session_factory()
+        try:
+            yield session
+            session.commit()
+        except BaseException:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+
+def get_inspector() -> Inspector:
+    """
+    Return a new inspector, its cache is not shared so it never returns stale names.
+    :return: the inspector, type of <sqlalchemy.engine.reflection.Inspector>.
+    """
+    return inspect(get_engine())
+
+
+def __getattr__(name: str):
+    # 兼容模块级的 db_engine / db_session / db_inspect，首次访问时才创建。
+    if name == 'db_engine':
+        return get_engine()
+    if name == 'db_session':
+        return get_session()
+    if name == 'db_inspect':
+        return get_inspector()
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
+
+# 证券行情表的命名规则
+# quote_<exchange>_<product>_<code>_<frequency>_<>
+#   exchange:   交易所简称
+#   product:    证券品种
+#   code:       证券代码
+#   frequency:  行情频次
+#
+security_quote_table_name_template = 'quote_{exchange}_{product}_{code}_{frequency}'
+
+index_quote_table_name_template = 'quote_index_{code}'
 
 
 from .table import (
+    quote_table_base,
     quote_table_minutely_base,
     quote_table_daily_base,
     quote_table_weekly_base,
-    quote_table_monthly_base
+    quote_table_monthly_base,
+    quote_table_daily,
+    quote_table_minutely
 )
 
 from .model import (
@@ -43,17 +201,9 @@ from .utility import (
     create_all_tables,
     create_table,
     drop_all_tables,
-    drop_table
+    drop_table,
+    get_table_instance,
+    get_quote_table
 )
 
-
-# 证券行情表的命名规则
-# quote_<exchange>_<product>_<code>_<frequency>_<>
-#   exchange:   交易所简称
-#   product:    证券品种
-#   code:       证券代码
-#   frequency:  行情频次
-#
-security_quote_table_name_template = 'quote_{exchange}_{product}_{code}_{frequency}'
-
-index_quote_table_name_template = 'quote_index_{code}'
+from .bulk import bulk_insert
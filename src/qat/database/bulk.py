@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+"""
+Database module - bulk insert.
+"""
+
+from __future__ import annotations
+
+import io
+import typing
+
+import numpy as np
+from sqlalchemy import Table, Date, Time
+from sqlalchemy.engine import Engine, Connection
+
+from . import get_engine, writer
+from ..config import logger
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+
+
+def _to_columns(table: Table, data) -> typing.Dict[str, np.ndarray]:
+    """
+    Normalize a DataFrame, a dict of arrays or a NumPy structured array into
+    {column name: array}, keeping only the columns of the table.
+    """
+    # DataFrame 与 dict 都有 keys()，不必为类型判断导入 pandas。
+    if isinstance(data, np.ndarray):
+        names = data.dtype.names
+    else:
+        names = data.keys()
+    return {x.name: np.asarray(data[x.name]) for x in table.columns if x.name in names}
+
+
+def _to_python(value: np.ndarray, sql_type) -> np.ndarray:
+    """
+    Convert a native datetime64/timedelta64 column into the Python objects the DBAPI expects.
+    Time columns may be given as timedelta64 since midnight.
+    """
+    if isinstance(sql_type, Date) and value.dtype.kind == 'M':
+        return value.astype('datetime64[D]').astype(object)
+    if isinstance(sql_type, Time) and value.dtype.kind == 'm':
+        # 一天至多 1440 个不同的分钟，每个不同的值只构造一次对象。
+        unique, inverse = np.unique(value, return_inverse=True)
+        moment = (np.datetime64('1970-01-01') + unique.astype('timedelta64[us]')).astype(object)
+        result = np.empty(len(unique), dtype=object)
+        result[:] = [x.time() for x in moment]
+        return result[inverse]
+    return value
+
+
+def _execute_many(connection: Connection, table: Table, columns: typing.Dict[str, np.ndarray]) -> None:
+    """
+    Insert a chunk via SQLAlchemy Core executemany.
+    """
+    names = list(columns.keys())
+    value = [_to_python(columns[x], table.columns[x].type).tolist() for x in names]
+    connection.execute(table.insert(), [dict(zip(names, row)) for row in zip(*value)])
+
+
+def _copy(connection: Connection, table: Table, columns: typing.Dict[str, np.ndarray]) -> None:
+    """
+    Insert a chunk via PostgreSQL <COPY FROM STDIN>.
+    """
+    import pandas as pd
+
+    frame = pd.DataFrame({x: _to_python(y, table.columns[x].type) for x, y in columns.items()})
+    buffer = io.StringIO()
+    frame.to_csv(buffer, header=False, index=False)
+    buffer.seek(0)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert('COPY {} ({}) FROM STDIN WITH (FORMAT csv)'.format(
+            table.name, ', '.join(columns.keys())), buffer)
+    finally:
+        cursor.close()
+
+
+def bulk_insert(table: Table,
+                data: typing.Union[pd.DataFrame, np.ndarray, typing.Dict[str, np.ndarray]],
+                chunk_size: int = 100000,
+                commit_every: typing.Optional[int] = None,
+                bind: typing.Union[Engine, Connection, None] = None
+                ) -> int:
+    """
+    Insert columnar data into a table in large chunks.
+    Use <COPY FROM STDIN> on PostgreSQL, and SQLAlchemy Core executemany otherwise.
+    :param table: the table, type of <sqlalchemy.Table>.
+    :param data: a DataFrame, a NumPy structured array or a dict of arrays; columns not in the table are ignored.
+    :param chunk_size: rows per chunk.
+    :param commit_every: commit after every <commit_every> chunks, None to insert all chunks in one transaction.
+        Ignored when <bind> is a Connection, the caller owns the transaction then.
+    :param bind: an Engine or a Connection, None for <qat.database.get_engine()>.
+        Writing through an Engine holds <qat.database.writer>; a Connection belongs to
+        the caller, who holds it for the whole transaction.
+    :return: the number of inserted rows.
+    """
+    if bind is None:
+        bind = get_engine()
+    columns = _to_columns(table, data)
+    total = len(next(iter(columns.values()))) if columns else 0
+    if total == 0:
+        return 0
+
+    write = _copy if bind.dialect.name == 'postgresql' else _execute_many
+    chunks = ({x: y[begin:begin + chunk_size] for x, y in columns.items()}
+              for begin in range(0, total, chunk_size))
+
+    if isinstance(bind, Connection):
+        for chunk in chunks:
+            write(bind, table, chunk)
+    else:
+        with writer(bind), bind.connect() as connection:
+            transaction = connection.begin()
+            for index, chunk in enumerate(chunks, 1):
+                write(connection, table, chunk)
+                if commit_every and index % commit_every == 0:
+                    transaction.commit()
+                    transaction = connection.begin()
+            transaction.commit()
+
+    logger.debug('Bulk insert {} rows into <{}>.'.format(total, table.name))
+    return total
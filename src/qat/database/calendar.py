@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+"""
+Database module - exchange trading calendar.
+"""
+
+import numpy as np
+from sqlalchemy import select
+
+from . import get_engine
+from .model import Exchange, ExchangeTradingCalendar
+from .utility import is_table_exist, create_table
+from .bulk import bulk_insert
+from .reference import reference_cache
+from ..quote.calendar import TradingCalendar
+from ..config import logger
+
+
+def load_trading_calendar(exchange: str) -> TradingCalendar:
+    """
+    Load the trading calendar of an exchange from table <exchange_trading_calendar>.
+    :param exchange: the <abbr_en> of the exchange, such as 'SSE'.
+    :return: the calendar, empty if none stored.
+    """
+    if not is_table_exist(ExchangeTradingCalendar):
+        return TradingCalendar([])
+    table = ExchangeTradingCalendar.__table__
+    result = get_engine().execute(select([table.c.date])
+                                  .where(table.c.exchange_id == reference_cache.resolve(Exchange, exchange)))
+    return TradingCalendar(np.array([x for x, in result], dtype='datetime64[D]'))
+
+
+def save_trading_calendar(exchange: str, calendar: TradingCalendar) -> int:
+    """
+    Store the sessions of a calendar that are not stored yet.
+    :param exchange: the <abbr_en> of the exchange, such as 'SSE'.
+    :param calendar: the calendar.
+    :return: the number of inserted sessions.
+    """
+    if not is_table_exist(ExchangeTradingCalendar):
+        create_table(ExchangeTradingCalendar)
+    stored = load_trading_calendar(exchange)
+    new = calendar.sessions[~stored.is_session(calendar.sessions)]
+    exchange_id = reference_cache.resolve(Exchange, exchange)
+    total = bulk_insert(ExchangeTradingCalendar.__table__,
+                        {'exchange_id': np.full(len(new), exchange_id), 'date': new})
+    logger.info('Save {} trading sessions of <{}>.'.format(total, exchange))
+    return total
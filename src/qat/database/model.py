@@ -4,11 +4,12 @@
 Database model orm module.
 """
 
-from sqlalchemy import Column, ForeignKey
+from sqlalchemy import Column, ForeignKey, Index
 from sqlalchemy import (String,
                         Unicode,
                         Boolean,
                         Integer,
+                        BigInteger,
                         Float,
                         Date,
                         Time)
@@ -61,6 +62,30 @@ class QuoteDailyBase(QuoteBase):
         return 'QuoteDailyBase'
 
 
+class QuoteSyncState(ModelBase):
+    """
+    行情文件的导入进度（高水位）。
+
+    通达信每天只在行情文件末尾追加记录，记住已导入的字节偏移、最后一条记录和文件的 mtime/size，
+    下次只需导入新追加的部分；若最后一条记录对不上或文件变短，说明文件被重写，需要全量重新导入。
+    """
+    __tablename__ = 'quote_sync_state'
+
+    id = Column(Integer, primary_key=True, comment='主键')
+    filename = Column(String, nullable=False, unique=True, comment='行情文件')
+    table_name = Column(String, nullable=False, comment='行情表')
+    offset = Column(BigInteger, nullable=False, comment='已导入的字节偏移')
+    last_date = Column(Date, nullable=True, comment='最后一条记录的日期')
+    last_time = Column(Time, nullable=True, comment='最后一条记录的时间，分钟线才需要')
+    last_record = Column(String, nullable=True, comment='最后一条记录的原始字节（十六进制）')
+    size = Column(BigInteger, nullable=False, comment='文件大小')
+    # 整数纳秒（os.stat().st_mtime_ns），比较时没有浮点误差。
+    mtime = Column(BigInteger, nullable=False, comment='文件修改时间（纳秒）')
+
+    def __str__(self):
+        return 'QuoteSyncState(filename="%s", offset=%d)' % (self.filename, self.offset)
+
+
 class Location(ModelBase):
     """
     区位。
@@ -110,6 +135,7 @@ class Exchange(ModelBase):
     security_list = relationship('Security', back_populates='exchange')
     stock_list = relationship('Stock', back_populates='exchange')
     board_list = relationship('Board', back_populates='exchange')
+    trading_calendar = relationship('ExchangeTradingCalendar', back_populates='exchange')
 
     def __str__(self):
         return 'Exchange(name_zh="%s", name_en="%s")' % (self.name_zh, self.name_en)
@@ -155,11 +181,20 @@ class SecurityStatus(ModelBase):
 class ExchangeTradingCalendar(ModelBase):
     """
     交易所交易日历。
+    每个交易所的每个交易日一行；内存中的快速查询见 <qat.quote.calendar.TradingCalendar>。
     """
     __tablename__ = 'exchange_trading_calendar'
 
     id = Column(Integer, primary_key=True, comment='主键')
-    exchange = Column(Unicode, unique=True, comment='休市')
+    exchange_id = Column(Integer, ForeignKey('exchange.id'), nullable=False, comment='交易所')
+    date = Column(Date, nullable=False, comment='交易日')
+
+    __table_args__ = (Index('ix_exchange_trading_calendar_exchange_date', 'exchange_id', 'date', unique=True),)
+
+    exchange = relationship('Exchange', back_populates='trading_calendar')
+
+    def __str__(self):
+        return 'ExchangeTradingCalendar(exchange_id=%s, date="%s")' % (self.exchange_id, self.date)
 
 
 class Broker(ModelBase):
@@ -341,6 +376,9 @@ class StockInformation(ModelBase):
 class IndustryBase(ModelBase):
     """
     板块，概念
+
+    层级以嵌套集合保存（见 <qat.data_source.industry>）：同一维护者中，
+    下级的 lft 落在 (上级.lft, 上级.rgt] 内，因此全部下级、上级链都是 lft 上的索引范围查询。
     """
     __tablename__ = 'industry'
 
@@ -350,6 +388,12 @@ class IndustryBase(ModelBase):
     name_zh = Column(String, nullable=False, comment='名称（中文）（板块/概念/行业）')
     name_en = Column(String, nullable=False, comment='名称（英文）（板块/概念/行业）')
     comment = Column(String, comment='注释')
+    parent_id = Column(Integer, ForeignKey('industry.id'), nullable=True, comment='上级，表<industry>的<id>字段')
+    level = Column(Integer, nullable=True, comment='层级，顶层为 1')
+    lft = Column(Integer, nullable=True, comment='嵌套集合左值（先序编号）')
+    rgt = Column(Integer, nullable=True, comment='嵌套集合右值（最后一个下级的先序编号）')
+
+    __table_args__ = (Index('ix_industry_maintainer_lft', 'maintainer', 'lft'),)
 
     __mapper_args__ = {'polymorphic_on': maintainer,
                        'polymorphic_identity': 'Common'}
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+
+"""
+Database module - partitioned quote tables.
+
+All securities share one daily table <quote_daily> and one minute table <quote_minutely>,
+keyed by (security_id, date[, time]), instead of one table per security per frequency.
+    PostgreSQL: declarative range partitioning by year, <quote_daily_2020> is a partition of <quote_daily>.
+    SQLite:     one database file per year, <security_quote_2020.sqlite> beside <security.sqlite>,
+                each holding its own <quote_daily> and <quote_minutely>.
+Either way a cross-sectional query ("all stocks on date D") touches one year and scans the date index.
+"""
+
+from __future__ import annotations
+
+import os.path
+import glob
+import datetime
+import typing
+
+import numpy as np
+from sqlalchemy import Table, select
+from sqlalchemy.engine import Engine
+
+from . import get_engine, create_database_engine
+from .table import quote_table_daily, quote_table_minutely
+from .bulk import bulk_insert
+from ..config import logger
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+
+
+# 行情频次 -> 全部证券共用的行情表。
+# 5 分钟线与 1 分钟线的主键相同，不能共用 <quote_minutely>，暂不分区保存。
+partitioned_quote_table = {
+    'daily': quote_table_daily,
+    '1min': quote_table_minutely,
+}
+
+# 已创建的分区与 SQLite 分片的引擎，按主数据库的 URL 区分，切换数据库后不会沿用旧的。
+_created_partition = set()
+_shard_engine = {}
+
+
+def get_partitioned_table(frequency: str) -> Table:
+    """
+    Return the partitioned quote table of a frequency.
+    :param frequency: 'daily' or '1min'.
+    :return: the table, type of <sqlalchemy.Table>.
+    """
+    try:
+        return partitioned_quote_table[frequency]
+    except KeyError:
+        raise ValueError('Frequency <{}> has no partitioned quote table, supported: {}.'.format(
+            frequency, ', '.join(partitioned_quote_table))) from None
+
+
+def is_postgresql() -> bool:
+    return get_engine().dialect.name == 'postgresql'
+
+
+def _database_key() -> str:
+    return str(get_engine().url)
+
+
+def _shard_filename(year: typing.Union[int, str]) -> typing.Optional[str]:
+    """
+    SQLite shard file of a year, beside the main database file; None if the main database is in memory.
+    """
+    database = get_engine().url.database
+    if not database or database == ':memory:':
+        return None
+    stem = os.path.splitext(database)[0]
+    return '{}_quote_{}.sqlite'.format(stem, year)
+
+
+def _shard_years() -> typing.List[int]:
+    """
+    Years of the existing SQLite shards.
+    """
+    pattern = _shard_filename('*')
+    if pattern is None:
+        key = _database_key()
+        return sorted(year for database, year in _shard_engine if database == key)
+    prefix, suffix = pattern.split('*')
+    return sorted(int(x[len(prefix):-len(suffix)]) for x in glob.glob(pattern))
+
+
+def get_shard_engine(year: int) -> Engine:
+    """
+    Return the engine of a SQLite shard; the shards of an in-memory database are in memory too.
+    :param year: the year.
+    :return: the engine.
+    """
+    key = (_database_key(), year)
+    if key not in _shard_engine:
+        filename = _shard_filename(year)
+        _shard_engine[key] = create_database_engine('sqlite://' if filename is None
+                                                    else 'sqlite:///{}'.format(filename))
+    return _shard_engine[key]
+
+
+def create_quote_partition(frequency: str, year: int) -> None:
+    """
+    Create the partition (PostgreSQL) or the shard table (SQLite) of a year, if not exists.
+    :param frequency: 'daily' or '1min'.
+    :param year: the year.
+    :return:
+    """
+    key = (_database_key(), frequency, year)
+    if key in _created_partition:
+        return
+    table = get_partitioned_table(frequency)
+    logger.debug('Create partition of <{}> for year {}.'.format(table.name, year))
+    if is_postgresql():
+        table.create(get_engine(), checkfirst=True)
+        sql = ("CREATE TABLE IF NOT EXISTS {table}_{year} PARTITION OF {table} "
+               "FOR VALUES FROM ('{year}-01-01') TO ('{next}-01-01')").format(table=table.name,
+                                                                              year=year,
+                                                                              next=year + 1)
+        get_engine().execute(sql)
+    else:
+        table.create(get_shard_engine(year), checkfirst=True)
+    _created_partition.add(key)
+
+
+def _bind(year: int) -> Engine:
+    return get_engine() if is_postgresql() else get_shard_engine(year)
+
+
+def insert_quote(frequency: str,
+                 security_id: int,
+                 data: typing.Union[pd.DataFrame, typing.Dict[str, np.ndarray]],
+                 **kwargs
+                 ) -> int:
+    """
+    Insert the quote of a security into the partitioned quote table, split by year.
+    :param frequency: 'daily' or '1min'.
+    :param security_id: the <id> of table <security>.
+    :param data: a DataFrame or a dict of arrays, with a datetime64 <date> column.
+    :param kwargs: passed to <qat.database.bulk_insert>.
+    :return: the number of inserted rows.
+    """
+    table = get_partitioned_table(frequency)
+    columns = {x: np.asarray(data[x]) for x in data.keys() if x in table.columns}
+    if len(columns['date']) == 0:
+        return 0
+    columns['security_id'] = np.full(len(columns['date']), security_id)
+    year = columns['date'].astype('datetime64[Y]').astype(np.int64) + 1970
+
+    total = 0
+    for item in np.unique(year).tolist():
+        create_quote_partition(frequency, item)
+        mask = year == item
+        total += bulk_insert(table, {x: y[mask] for x, y in columns.items()}, bind=_bind(item), **kwargs)
+    return total
+
+
+def _read(table: Table, bind: Engine, where) -> pd.DataFrame:
+    import pandas as pd
+
+    result = bind.execute(select([table]).where(where).order_by(*table.primary_key.columns))
+    return pd.DataFrame(result.fetchall(), columns=result.keys())
+
+
+def read_cross_section(frequency: str, date: datetime.date) -> pd.DataFrame:
+    """
+    Read the quote of all securities on a date.
+    :param frequency: 'daily' or '1min'.
+    :param date: the date.
+    :return: pandas DataFrame.
+    """
+    import pandas as pd
+
+    table = get_partitioned_table(frequency)
+    if not is_postgresql():
+        if date.year not in _shard_years():
+            return pd.DataFrame(columns=[x.name for x in table.columns])
+        create_quote_partition(frequency, date.year)
+    return _read(table, _bind(date.year), table.c.date == date)
+
+
+def read_security(frequency: str,
+                  security_id: int,
+                  start: typing.Optional[datetime.date] = None,
+                  end: typing.Optional[datetime.date] = None
+                  ) -> pd.DataFrame:
+    """
+    Read the quote of a security in date range [start, end].
+    :param frequency: 'daily' or '1min'.
+    :param security_id: the <id> of table <security>.
+    :param start: start date, None for unlimited.
+    :param end: end date (inclusive), None for unlimited.
+    :return: pandas DataFrame.
+    """
+    import pandas as pd
+
+    table = get_partitioned_table(frequency)
+    where = table.c.security_id == security_id
+    if start is not None:
+        where = where & (table.c.date >= start)
+    if end is not None:
+        where = where & (table.c.date <= end)
+
+    if is_postgresql():
+        return _read(table, get_engine(), where)
+    frames = []
+    for year in _shard_years():
+        if (start is None or year >= start.year) and (end is None or year <= end.year):
+            create_quote_partition(frequency, year)
+            frames.append(_read(table, get_shard_engine(year), where))
+    if not frames:
+        return pd.DataFrame(columns=[x.name for x in table.columns])
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+"""
+Database module - reference data cache.
+"""
+
+import threading
+import time
+import typing
+
+from sqlalchemy.orm import Session
+
+from . import session_scope, ModelBase
+from .model import (Currency,
+                    Location,
+                    Exchange,
+                    Board,
+                    SecurityStatus,
+                    IndustryNBS,
+                    IndustryCSRC,
+                    IndustryCSIC)
+from .. import config
+from ..config import logger
+
+
+# 参考数据表 -> 自然键字段。
+reference_key = {
+    Exchange: ('abbr_en',),
+    Currency: ('abbr',),
+    Board: ('exchange_id', 'name'),     # 沪深两市都有“主板”和“B股”。
+    SecurityStatus: ('status',),
+    Location: ('code',),
+    IndustryNBS: ('code',),
+    IndustryCSRC: ('code',),
+    IndustryCSIC: ('code',),
+}
+
+
+class ReferenceCache:
+    """
+    Read-through in-process cache of reference data, keyed by natural keys.
+    Each table is loaded by one query on first use; later lookups are dictionary lookups.
+    Entries are plain row tuples detached from any session, so they never trigger lazy loads.
+    A table is reloaded after <invalidate>/<refresh>, or once it is older than <ttl> seconds.
+    The cache is shared by threads: a table is loaded by one thread at a time, and readers
+    always see the key map and the id map of the same load.
+    """
+
+    def __init__(self, ttl: typing.Optional[float] = None, session: typing.Optional[Session] = None):
+        """
+        :param ttl: seconds before a loaded table expires, None for never.
+        :param session: the session to query with, None for a new session of <qat.database.session_scope()>
+            per load.
+        """
+        self.ttl = ttl
+        self.session = session
+        # model -> (key map, id map, loaded at)，整体替换，无锁读取时也不会看到不完整的一次加载。
+        self._entry: typing.Dict[type, typing.Tuple[dict, dict, float]] = {}
+        self._lock = threading.Lock()
+
+    def _is_fresh(self, entry: typing.Optional[tuple]) -> bool:
+        return entry is not None and (self.ttl is None or time.monotonic() - entry[2] <= self.ttl)
+
+    def _query(self, model: ModelBase) -> list:
+        columns = [getattr(model, x.key) for x in model.__mapper__.column_attrs]
+        if self.session is not None:
+            return self.session.query(*columns).all()
+        with session_scope() as session:
+            return session.query(*columns).all()
+
+    @staticmethod
+    def _key_map(model: ModelBase, rows: list) -> dict:
+        """
+        Map the natural keys to the rows. Rows with a NULL key field are reachable by id only;
+        of the rows sharing a key, the one with the smallest id is kept.
+        """
+        fields = reference_key[model]
+        result = {}
+        for row in sorted(rows, key=lambda x: x.id):
+            key = tuple(getattr(row, x) for x in fields)
+            if None in key:
+                continue
+            key = key[0] if len(fields) == 1 else key
+            if key in result:
+                logger.warning('<{}> has duplicate key {}, id {} is ignored.'.format(model.__tablename__, key, row.id))
+                continue
+            result[key] = row
+        return result
+
+    def _load(self, model: ModelBase) -> typing.Tuple[dict, dict, float]:
+        entry = self._entry.get(model)
+        if self._is_fresh(entry):
+            return entry
+        with self._lock:
+            # 等锁期间可能已被其他线程加载。
+            entry = self._entry.get(model)
+            if not self._is_fresh(entry):
+                rows = self._query(model)
+                entry = (self._key_map(model, rows), {x.id: x for x in rows}, time.monotonic())
+                self._entry[model] = entry
+                logger.debug('Load {} records of <{}> into reference cache.'.format(len(rows), model.__tablename__))
+        return entry
+
+    def load(self, model: ModelBase) -> dict:
+        """
+        Return the {natural key: row} map of a table, loading it when not cached or expired.
+        The key is a value for single-field keys, otherwise a tuple; rows with a NULL key field are left out.
+        :param model: an ORM class in <reference_key>.
+        :return: dict.
+        """
+        return self._load(model)[0]
+
+    def get(self, model: ModelBase, *key) -> tuple:
+        """
+        Return the record of a natural key.
+        :param model: an ORM class in <reference_key>.
+        :param key: the natural key fields, in the order of <reference_key>.
+        :return: the record, a row tuple with the mapped attributes.
+        """
+        mapping = self.load(model)
+        try:
+            return mapping[key[0] if len(key) == 1 else key]
+        except KeyError:
+            raise KeyError('<{}> has no record {}.'.format(model.__tablename__, key)) from None
+
+    def get_by_id(self, model: ModelBase, id_: int) -> tuple:
+        """
+        Return the record of an id.
+        :param model: an ORM class in <reference_key>.
+        :param id_: the id.
+        :return: the record, a row tuple with the mapped attributes.
+        """
+        try:
+            return self._load(model)[1][id_]
+        except KeyError:
+            raise KeyError('<{}> has no record of id {}.'.format(model.__tablename__, id_)) from None
+
+    def resolve(self, model: ModelBase, *key) -> int:
+        """
+        Resolve a natural key into the id.
+        :param model: an ORM class in <reference_key>.
+        :param key: the natural key fields, in the order of <reference_key>.
+        :return: the id.
+        """
+        return self.get(model, *key).id
+
+    def invalidate(self, model: typing.Optional[ModelBase] = None) -> None:
+        """
+        Drop a table from the cache, it will be reloaded on next use.
+        :param model: an ORM class, None for all tables.
+        :return:
+        """
+        with self._lock:
+            if model is None:
+                self._entry.clear()
+            else:
+                self._entry.pop(model, None)
+
+    def refresh(self, model: ModelBase) -> dict:
+        """
+        Reload a table now.
+        :param model: an ORM class in <reference_key>.
+        :return: the {natural key: row} map.
+        """
+        self.invalidate(model)
+        return self.load(model)
+
+
+# 进程内共享的参考数据缓存，<initialize_table_*> 写入后会使相应的表失效。
+reference_cache = ReferenceCache(ttl=config.REFERENCE_CACHE_TTL)
@@ -4,7 +4,7 @@
 Database model orm module.
 """
 
-from sqlalchemy import Table, Column
+from sqlalchemy import Table, Column, Index
 from sqlalchemy import (Integer,
                         Float,
                         Date,
@@ -12,17 +12,24 @@ from sqlalchemy import (Integer,
 
 from . import db_metadata
 
+# 各行情表的 pre_close, change, change_percent, amplitude 在导入时整列计算，见 <qat.quote.derive>；
+# 没有前收盘价的记录（第一条）为 NULL。涨跌幅与振幅是比值（0.05 即 5%），与 <QuoteBase.change_percent> 一致。
+
 # Quote for minute.
 quote_table_minutely_base = Table('quote_minutely_base', db_metadata,
                                   Column('id', Integer, primary_key=True, comment='主键'),
-                                  Column('date', Date, nullable=False, unique=True, comment='行情日期'),
+                                  Column('date', Date, nullable=False, index=True, comment='行情日期'),
                                   Column('time', Time, nullable=False, comment='行情时间'),
                                   Column('open', Float, nullable=False, comment='开盘价'),
                                   Column('high', Float, nullable=False, comment='最高价'),
                                   Column('low', Float, nullable=False, comment='最低价'),
                                   Column('close', Float, nullable=False, comment='收盘价'),
                                   Column('volume', Float, nullable=False, comment='成交量'),
-                                  Column('amount', Float, nullable=False, comment='成交额')
+                                  Column('amount', Float, nullable=False, comment='成交额'),
+                                  Column('pre_close', Float, nullable=True, comment='前收盘价'),
+                                  Column('change', Float, nullable=True, comment='涨跌'),
+                                  Column('change_percent', Float, nullable=True, comment='涨跌幅（比值）'),
+                                  Column('amplitude', Float, nullable=True, comment='振幅')
                                   )
 
 # Quote for daily.
@@ -34,7 +41,11 @@ quote_table_daily_base = Table('quote_daily_base', db_metadata,
                                Column('low', Float, nullable=False, comment='最低价'),
                                Column('close', Float, nullable=False, comment='收盘价'),
                                Column('volume', Float, nullable=False, comment='成交量'),
-                               Column('amount', Float, nullable=False, comment='成交额')
+                               Column('amount', Float, nullable=False, comment='成交额'),
+                               Column('pre_close', Float, nullable=True, comment='前收盘价'),
+                               Column('change', Float, nullable=True, comment='涨跌'),
+                               Column('change_percent', Float, nullable=True, comment='涨跌幅（比值）'),
+                               Column('amplitude', Float, nullable=True, comment='振幅')
                                )
 
 # Quote for weekly.
@@ -47,7 +58,11 @@ quote_table_weekly_base = Table('quote_weekly_base', db_metadata,
                                 Column('low', Float, nullable=False, comment='最低价'),
                                 Column('close', Float, nullable=False, comment='收盘价'),
                                 Column('volume', Float, nullable=False, comment='成交量'),
-                                Column('amount', Float, nullable=False, comment='成交额')
+                                Column('amount', Float, nullable=False, comment='成交额'),
+                                Column('pre_close', Float, nullable=True, comment='前收盘价'),
+                                Column('change', Float, nullable=True, comment='涨跌'),
+                                Column('change_percent', Float, nullable=True, comment='涨跌幅（比值）'),
+                                Column('amplitude', Float, nullable=True, comment='振幅')
                                 )
 
 # Quote for monthly.
@@ -60,5 +75,56 @@ quote_table_monthly_base = Table('quote_monthly_base', db_metadata,
                                  Column('low', Float, nullable=False, comment='最低价'),
                                  Column('close', Float, nullable=False, comment='收盘价'),
                                  Column('volume', Float, nullable=False, comment='成交量'),
-                                 Column('amount', Float, nullable=False, comment='成交额')
+                                 Column('amount', Float, nullable=False, comment='成交额'),
+                                 Column('pre_close', Float, nullable=True, comment='前收盘价'),
+                                 Column('change', Float, nullable=True, comment='涨跌'),
+                                 Column('change_percent', Float, nullable=True, comment='涨跌幅（比值）'),
+                                 Column('amplitude', Float, nullable=True, comment='振幅')
                                  )
+
+# 全部证券共用的行情表，以 (security_id, date[, time]) 为主键。
+# PostgreSQL 上按年声明式范围分区，SQLite 上按年分文件存放，见 <qat.database.partition>。
+# security_id 为表<security>的<id>字段，两者不在同一个 MetaData 中，不设外键。
+quote_table_daily = Table('quote_daily', db_metadata,
+                          Column('security_id', Integer, primary_key=True, comment='证券'),
+                          Column('date', Date, primary_key=True, comment='行情日期'),
+                          Column('open', Float, nullable=False, comment='开盘价'),
+                          Column('high', Float, nullable=False, comment='最高价'),
+                          Column('low', Float, nullable=False, comment='最低价'),
+                          Column('close', Float, nullable=False, comment='收盘价'),
+                          Column('volume', Float, nullable=False, comment='成交量'),
+                          Column('amount', Float, nullable=False, comment='成交额'),
+                          Column('pre_close', Float, nullable=True, comment='前收盘价'),
+                          Column('change', Float, nullable=True, comment='涨跌'),
+                          Column('change_percent', Float, nullable=True, comment='涨跌幅（比值）'),
+                          Column('amplitude', Float, nullable=True, comment='振幅'),
+                          Index('ix_quote_daily_date', 'date'),
+                          postgresql_partition_by='RANGE (date)'
+                          )
+
+quote_table_minutely = Table('quote_minutely', db_metadata,
+                             Column('security_id', Integer, primary_key=True, comment='证券'),
+                             Column('date', Date, primary_key=True, comment='行情日期'),
+                             Column('time', Time, primary_key=True, comment='行情时间'),
+                             Column('open', Float, nullable=False, comment='开盘价'),
+                             Column('high', Float, nullable=False, comment='最高价'),
+                             Column('low', Float, nullable=False, comment='最低价'),
+                             Column('close', Float, nullable=False, comment='收盘价'),
+                             Column('volume', Float, nullable=False, comment='成交量'),
+                             Column('amount', Float, nullable=False, comment='成交额'),
+                             Column('pre_close', Float, nullable=True, comment='前收盘价'),
+                             Column('change', Float, nullable=True, comment='涨跌'),
+                             Column('change_percent', Float, nullable=True, comment='涨跌幅（比值）'),
+                             Column('amplitude', Float, nullable=True, comment='振幅'),
+                             Index('ix_quote_minutely_date', 'date'),
+                             postgresql_partition_by='RANGE (date)'
+                             )
+
+# 行情频次 -> 行情表的基表。
+quote_table_base = {
+    '1min': quote_table_minutely_base,
+    '5min': quote_table_minutely_base,
+    'daily': quote_table_daily_base,
+    'weekly': quote_table_weekly_base,
+    'monthly': quote_table_monthly_base,
+}
@@ -4,15 +4,50 @@
 Database module - utility.
 """
 
+import threading
+import typing
 
-from . import (db_engine,
-               db_session,
-               db_inspect,
+from sqlalchemy import Table
+
+from . import (get_engine,
+               get_session,
+               get_inspector,
+               writer,
                db_metadata,
-               ModelBase)
+               ModelBase,
+               security_quote_table_name_template)
+from .table import quote_table_base
 from ..config import logger
 
 
+# 数据库中已存在的表名，按数据库的 URL 区分，切换数据库后不会沿用旧的。
+# 每个数据库首次使用时查询一次，之后由本模块的 DDL 函数增量维护，不再重新反射整个数据库。
+_existing_table_names: typing.Dict[str, set] = {}
+
+# 多个线程可能同时第一次用到同一张行情表，只有一个线程把它加入 <db_metadata>（或从中移除）。
+# 与 <writer> 同时持有时，总是先取得 <writer>。
+_metadata_lock = threading.Lock()
+
+
+def _get_existing_table_names() -> set:
+    key = str(get_engine().url)
+    if key not in _existing_table_names:
+        _existing_table_names[key] = set(get_inspector().get_table_names())
+    return _existing_table_names[key]
+
+
+def _forget_table(table_name: str) -> None:
+    """
+    Remove a dropped table from the caches.
+    """
+    _get_existing_table_names().discard(table_name)
+    with _metadata_lock:
+        table = db_metadata.tables.get(table_name)
+        # 只移除反射得到的表，保留 <qat.database.table> 中的表定义。
+        if table is not None and table.info.get('reflected'):
+            db_metadata.remove(table)
+
+
 def get_table_name(instance: ModelBase) -> str:
     """
     Return the table name of an ORM instance.
@@ -22,13 +57,30 @@ def get_table_name(instance: ModelBase) -> str:
     return instance.__tablename__
 
 
-def get_table_instance(table_name: str) -> ModelBase:
+def get_table_instance(table_name: str) -> Table:
     """
-    Return the ORM instance of a table name.
+    Return the table of a table name, reflecting only this table on first use.
     :param table_name: the table name,  type of Python <str>.
-    :return: the ORM instance, type of <qat.database.ModelBase>.
+    :return: the table, type of <sqlalchemy.Table>, None if not exist.
     """
-    return db_metadata.tables.get(table_name)
+    table = db_metadata.tables.get(table_name)
+    if table is None and table_name in _get_existing_table_names():
+        # 反射会修改 <db_metadata>，且不能与 DDL 交错。
+        with writer(), _metadata_lock:
+            table = db_metadata.tables.get(table_name)
+            if table is None:
+                db_metadata.reflect(get_engine(), only=[table_name])
+                table = db_metadata.tables[table_name]
+                table.info['reflected'] = True
+    return table
+
+
+def _to_table(table: typing.Union[ModelBase, Table, str]) -> Table:
+    if isinstance(table, str):
+        return get_table_instance(table)
+    if isinstance(table, Table):
+        return table
+    return table.__table__
 
 
 def is_database_empty() -> bool:
@@ -36,8 +88,7 @@ def is_database_empty() -> bool:
     Is the database empty?
     :return: True if the database has no tables, otherwise False.
     """
-    table_names = db_inspect.get_table_names()
-    return table_names == []
+    return len(_get_existing_table_names()) == 0
 
 
 def is_table_exist(table: ModelBase or str) -> bool:
@@ -49,9 +100,11 @@ def is_table_exist(table: ModelBase or str) -> bool:
     table_name: str
     if isinstance(table, str):
         table_name = table
+    elif isinstance(table, Table):
+        table_name = table.name
     else:
         table_name = get_table_name(table)
-    return table_name in db_metadata.tables.keys()
+    return table_name in _get_existing_table_names()
 
 
 def is_table_empty(table: ModelBase or str) -> bool:
@@ -65,7 +118,7 @@ def is_table_empty(table: ModelBase or str) -> bool:
         instance = get_table_instance(table)
     else:
         instance = table
-    return False if db_session.query(instance).first() else True
+    return False if get_session().query(instance).first() else True
 
 
 def drop_table(table: ModelBase or str) -> None:
@@ -74,16 +127,14 @@ def drop_table(table: ModelBase or str) -> None:
     :param table: An ORM instance, or the name of a table.
     :return:
     """
-    instance: ModelBase
-    if isinstance(table, str):
-        instance = get_table_instance(table)
-    else:
-        instance = table
+    instance = _to_table(table)
+    if instance is None:
+        return
 
-    logger.debug('Drop table <{}>.'.format(instance.__tablename__))
-    ModelBase.metadata.drop_all(db_engine, [instance], checkfirst=True)
-    db_metadata.remove(instance)
-    db_metadata.reflect(db_engine)
+    logger.debug('Drop table <{}>.'.format(instance.name))
+    with writer():
+        instance.drop(get_engine(), checkfirst=True)
+        _forget_table(instance.name)
 
 
 def drop_all_tables() -> None:
@@ -92,8 +143,10 @@ def drop_all_tables() -> None:
     :return:
     """
     logger.debug('Drop all tables.')
-    ModelBase.metadata.drop_all(db_engine)
-    db_metadata.reflect(db_engine)
+    with writer():
+        ModelBase.metadata.drop_all(get_engine())
+        for table_name in list(ModelBase.metadata.tables.keys()):
+            _forget_table(table_name)
 
 
 def create_table(table: ModelBase or str, drop: bool = False) -> bool:
@@ -103,27 +156,23 @@ def create_table(table: ModelBase or str, drop: bool = False) -> bool:
     :param drop: True if drop the existed table before create, otherwise False.
     :return: True if create succeed, otherwise False.
     """
-    instance: ModelBase
-    table_name: str
-    if isinstance(table, str):
-        instance = get_table_instance(table)
-        table_name = table
-
-    else:
-        instance = table
-        table_name = get_table_name(table)
+    instance = _to_table(table)
+    table_name = instance.name
 
-    logger.debug('Create table <{}> for object <{}>.'.format(table_name, instance))
-    if is_table_exist(instance):
+    logger.debug('Create table <{}> for object <{}>.'.format(table_name, table))
+    if is_table_exist(table_name):
         if drop:
             logger.debug('Table {} already existed, drop it...'.format(table_name))
-            instance.__table__.drop()
+            with writer():
+                instance.drop(get_engine(), checkfirst=True)
         else:
             logger.debug('Table <{}> already existed, do nothing without <drop=True>'.format(table_name))
             return False
     logger.debug('Table <{}> created.'.format(table_name))
-    instance.__table__.create(db_engine)
-    db_metadata.reflect(db_engine)
+    # 建表也是写操作；checkfirst 避免与并发的建表冲突。
+    with writer():
+        instance.create(get_engine(), checkfirst=True)
+    _get_existing_table_names().add(table_name)
     return True
 
 
@@ -133,5 +182,39 @@ def create_all_tables() -> None:
     :return:
     """
     logger.debug('Create all tables.')
-    ModelBase.metadata.create_all(db_engine)
-    db_metadata.reflect(db_engine)
+    with writer():
+        ModelBase.metadata.create_all(get_engine())
+        _get_existing_table_names().update(ModelBase.metadata.tables.keys())
+
+
+def get_quote_table(exchange: str,
+                    product: str,
+                    code: str,
+                    frequency: str,
+                    create: bool = True
+                    ) -> Table:
+    """
+    Return the quote table of a security, named by <security_quote_table_name_template>.
+    :param exchange: exchange abbreviation, such as 'sh'.
+    :param product: product, such as 'stock'.
+    :param code: security code, such as '600000'.
+    :param frequency: one of the keys of <qat.database.table.quote_table_base>.
+    :param create: True if create the table when it does not exist.
+    :return: the table, type of <sqlalchemy.Table>.
+    """
+    table_name = security_quote_table_name_template.format(exchange=exchange,
+                                                           product=product,
+                                                           code=code,
+                                                           frequency=frequency)
+    table = db_metadata.tables.get(table_name)
+    if table is None:
+        with _metadata_lock:
+            table = db_metadata.tables.get(table_name)
+            if table is None:
+                table = quote_table_base[frequency].tometadata(db_metadata, name=table_name)
+    if create and not is_table_exist(table_name):
+        logger.debug('Create quote table <{}>.'.format(table_name))
+        with writer():
+            table.create(get_engine(), checkfirst=True)
+        _get_existing_table_names().add(table_name)
+    return table
@@ -2,43 +2,229 @@
 
 """
 TDX (通达信) data reader module.
+
+pandas 只在解码为 DataFrame 时才导入，只读取文件的短任务不必为导入 pandas 付出启动时间。
 """
 
+from __future__ import annotations
+
 import typing
 import struct
+import bisect
 import datetime
 import os.path
+import glob
+import concurrent.futures
 
-import pandas as pd
+import numpy as np
 
+from qat import config
 from qat.config import logger
 
+if typing.TYPE_CHECKING:
+    import pandas as pd
+
+
+class _SortKey:
+    """
+    按需计算第 i 条记录排序键的只读序列，供 bisect 做二分查找，只会访问 O(log n) 条记录。
+    """
+
+    def __init__(self, record: np.ndarray, key: typing.Callable):
+        self.record = record
+        self.key = key
+
+    def __len__(self) -> int:
+        return len(self.record)
+
+    def __getitem__(self, index: int) -> int:
+        return self.key(self.record[index])
+
 
 class QuoteReaderBase:
     """
     通达信行情数据文件读取器的基类。
+
+    通达信行情数据文件由定长记录组成，并按日期（时间）升序排列，
+    因此可以按日期二分查找记录的位置，只解码需要的部分。
     """
 
-    def __init__(self, filename: str, pattern: str):
+    def __init__(self, filename: str, pattern: str, fields: typing.Sequence[str]):
         self.filename = filename
         self.struct = struct.Struct(pattern)
+        # 与 struct 格式等价的 NumPy 结构化类型，用于整块解码。
+        self.dtype = np.dtype({'names': list(fields),
+                               'formats': [pattern[0] + x for x in pattern[1:]]})
+        assert self.dtype.itemsize == self.struct.size
 
     def raw(self) -> bytes:
         with open(self.filename, 'rb') as f:
             return f.read()
 
     def unpack(self) -> typing.Generator:
-        raw = self.raw()
+        raw = self.memmap()
         return (self.struct.unpack_from(raw, offset)
-                for offset in range(0, len(raw), self.struct.size)
+                for offset in range(0, raw.nbytes, self.struct.size)
                 )
 
+    def __len__(self) -> int:
+        """
+        文件中完整记录的条数。
+        """
+        return os.path.getsize(self.filename) // self.struct.size
+
+    def memmap(self) -> np.ndarray:
+        """
+        以内存映射方式打开文件，返回只读的 NumPy 结构化数组视图，不读入、不复制数据。
+        对视图切片（如 memmap()[-n:]）时，只有被访问到的页才会从磁盘读入。
+        :return: read-only NumPy structured array (np.memmap).
+        """
+        count = len(self)
+        if count == 0:
+            # 空文件无法映射。
+            return np.empty(0, dtype=self.dtype)
+        return np.memmap(self.filename, dtype=self.dtype, mode='r', shape=(count,))
+
+    def to_numpy(self, mmap: bool = False) -> np.ndarray:
+        """
+        把整个文件读为 NumPy 结构化数组，每条记录一个元素，字段名即 <fields>。
+        :param mmap: True 则返回内存映射视图（见 <memmap>），否则一次性读入内存。
+        :return: NumPy structured array.
+        """
+        if mmap:
+            return self.memmap()
+        return np.fromfile(self.filename, dtype=self.dtype, count=len(self))
+
+    def sort_key(self, item: np.void) -> int:
+        """
+        单条记录的排序键。
+        """
+        raise NotImplementedError('This class is a abstract base class.')
+
+    def bound_key(self, value: datetime.date, upper: bool) -> int:
+        """
+        日期（时间）边界对应的排序键。
+        :param value: datetime.date or datetime.datetime.
+        :param upper: True 为上界（包含），False 为下界。
+        """
+        raise NotImplementedError('This class is a abstract base class.')
+
+    def locate(self,
+               start: typing.Optional[datetime.date] = None,
+               end: typing.Optional[datetime.date] = None
+               ) -> slice:
+        """
+        二分查找日期范围 [start, end] 内的记录位置。
+        :param start: 开始日期（时间），None 表示不限。
+        :param end: 结束日期（时间，包含），None 表示不限。
+        :return: 记录下标的 slice.
+        """
+        record = self.memmap()
+        key = _SortKey(record, self.sort_key)
+        begin = 0 if start is None else bisect.bisect_left(key, self.bound_key(start, False))
+        stop = len(record) if end is None else bisect.bisect_right(key, self.bound_key(end, True))
+        return slice(begin, max(begin, stop))
+
+    def records(self,
+                start: typing.Optional[datetime.date] = None,
+                end: typing.Optional[datetime.date] = None
+                ) -> np.ndarray:
+        """
+        日期范围 [start, end] 内的记录。未指定范围时读入整个文件，否则只读取匹配的部分。
+        :param start: 开始日期（时间），None 表示不限。
+        :param end: 结束日期（时间，包含），None 表示不限。
+        :return: NumPy structured array.
+        """
+        if start is None and end is None:
+            return self.to_numpy()
+        return self.memmap()[self.locate(start, end)]
+
+    def iter_chunks(self,
+                    chunk_rows: int = 100000,
+                    start: typing.Optional[datetime.date] = None,
+                    end: typing.Optional[datetime.date] = None,
+                    raw: bool = False,
+                    offset: int = 0,
+                    **kwargs
+                    ) -> typing.Generator:
+        """
+        按固定条数分批读取日期范围 [start, end] 内的记录。
+        每批单独从文件读入，用完即可释放，内存占用只与 <chunk_rows> 有关，与文件大小无关。
+        :param chunk_rows: 每批的记录条数。
+        :param start: 开始日期（时间），None 表示不限。
+        :param end: 结束日期（时间，包含），None 表示不限。
+        :param raw: True 则产出结构化数组，否则产出 <decode> 解码的 DataFrame。
+        :param offset: 跳过文件中的前 offset 条记录（如已导入的部分）。
+        :param kwargs: 传给 <decode>。
+        :return: generator of NumPy structured array or pandas DataFrame.
+        """
+        span = slice(0, len(self)) if start is None and end is None else self.locate(start, end)
+        span = slice(max(span.start, offset), span.stop)
+        with open(self.filename, 'rb') as f:
+            f.seek(span.start * self.dtype.itemsize)
+            for begin in range(span.start, span.stop, chunk_rows):
+                record = np.fromfile(f, dtype=self.dtype, count=min(chunk_rows, span.stop - begin))
+                yield record if raw else self.decode(record, **kwargs)
+
     def to_python(self) -> typing.Generator:
         raise NotImplementedError('This class is a abstract base class.')
 
-    def to_pandas(self) -> pd.DataFrame:
+    def decode(self, record: np.ndarray, **kwargs) -> pd.DataFrame:
+        """
+        把结构化数组（<to_numpy> 的结果或其切片）解码为 DataFrame。
+        """
         raise NotImplementedError('This class is a abstract base class.')
 
+    def tail(self, n: int, **kwargs) -> pd.DataFrame:
+        """
+        只解码最后 n 条记录，其余部分不会被读入。
+        :param n: 记录条数。
+        :return: pandas DataFrame.
+        """
+        record = self.memmap()
+        return self.decode(record[len(record) - min(n, len(record)):], **kwargs)
+
+
+def yyyymmdd_to_datetime64(value: np.ndarray) -> np.ndarray:
+    """
+    把 YYYYMMDD 形式的整数数组转换为 datetime64[D] 数组（整列运算）。
+    :param value: integer array, such as 20200103.
+    :return: datetime64[D] array.
+    """
+    value = value.astype(np.int64)
+    year = value // 10000
+    month = value // 100 % 100
+    day = value % 100
+    return ((year - 1970).astype('datetime64[Y]')
+            + (month - 1).astype('timedelta64[M]')
+            + (day - 1).astype('timedelta64[D]'))
+
+
+def packed_date_to_datetime64(value: np.ndarray) -> np.ndarray:
+    """
+    把通达信分钟线的压缩日期（year=num//2048+2004, month=num%2048//100, day=num%2048%100）
+    数组转换为 datetime64[D] 数组（整列运算）。
+    :param value: integer array.
+    :return: datetime64[D] array.
+    """
+    value = value.astype(np.int64)
+    year = value // 2048 + 2004
+    month = value % 2048 // 100
+    day = value % 2048 % 100
+    return ((year - 1970).astype('datetime64[Y]')
+            + (month - 1).astype('timedelta64[M]')
+            + (day - 1).astype('timedelta64[D]'))
+
+
+def _as_object(value: np.ndarray, convert: typing.Callable) -> np.ndarray:
+    """
+    把数组转换为 Python 对象数组，每个不同的值只构造一次对象。
+    """
+    unique, inverse = np.unique(value, return_inverse=True)
+    result = np.empty(len(unique), dtype=object)
+    result[:] = [convert(x) for x in unique.tolist()]
+    return result[inverse]
+
 
 class DailyQuoteReader(QuoteReaderBase):
     """
@@ -61,8 +247,25 @@ class DailyQuoteReader(QuoteReaderBase):
     28 ~ 31 字节：int, 上日收盘，单位（分）。
     """
 
+    # 各字段由文件中的原始值到解码值的转换，价格以分为单位。
+    _convert = {
+        'date': yyyymmdd_to_datetime64,
+        'open': lambda x: x * 0.01,
+        'high': lambda x: x * 0.01,
+        'low': lambda x: x * 0.01,
+        'close': lambda x: x * 0.01,
+        'amount': lambda x: x.astype(np.float64),
+        'volume': lambda x: x.astype(np.int64),
+        'pre_close': lambda x: x * 0.01,
+    }
+
+    # <to_python>、<decode> 默认的列；上日收盘（pre_close）只在需要时解码。
+    FIELDS = ('date', 'open', 'high', 'low', 'close', 'amount', 'volume')
+
     def __init__(self, filename: str):
-        super().__init__(filename, '<IIIIIfII')
+        super().__init__(filename,
+                         '<IIIIIfII',
+                         ('date', 'open', 'high', 'low', 'close', 'amount', 'volume', 'pre_close'))
 
     def to_python(self) -> typing.Generator:
         unpack = self.unpack()
@@ -75,11 +278,53 @@ class DailyQuoteReader(QuoteReaderBase):
                    item[5],
                    item[6])
 
-    def to_pandas(self) -> pd.DataFrame:
-        return pd.DataFrame(
-            self.to_python(),
-            columns=['date', 'open', 'high', 'low', 'close', 'amount', 'volume']
-        )
+    def decode(self, record: np.ndarray, date_as_object: bool = False, pre_close: bool = False) -> pd.DataFrame:
+        """
+        以整列运算的方式解码，列与 <to_python> 相同。
+        :param record: 结构化数组（<to_numpy> 的结果或其切片）。
+        :param date_as_object: True 则 <date> 列为 datetime.date 对象，否则为 datetime64。
+        :param pre_close: True 则增加上日收盘价 <pre_close> 列。
+        :return: pandas DataFrame.
+        """
+        import pandas as pd
+
+        column = self.decode_columns(record, self.FIELDS + ('pre_close',) if pre_close else None)
+        if date_as_object:
+            column['date'] = column['date'].astype(object)
+        return pd.DataFrame(column)
+
+    def decode_columns(self,
+                       record: np.ndarray,
+                       fields: typing.Optional[typing.Iterable[str]] = None
+                       ) -> typing.Dict[str, np.ndarray]:
+        """
+        解码为 {列名: 数组}，不构造 DataFrame，只解码需要的列。
+        :param record: 结构化数组（<to_numpy> 的结果或其切片）。
+        :param fields: 需要的列，可以包括 <pre_close>，None 则为 <FIELDS>。
+        :return: dict, <date> 列为 datetime64[D]。
+        """
+        return {x: self._convert[x](record[x]) for x in (self.FIELDS if fields is None else fields)}
+
+    def sort_key(self, item: np.void) -> int:
+        return int(item['date'])
+
+    def bound_key(self, value: datetime.date, upper: bool) -> int:
+        return value.year * 10000 + value.month * 100 + value.day
+
+    def to_pandas(self,
+                  date_as_object: bool = True,
+                  start: typing.Optional[datetime.date] = None,
+                  end: typing.Optional[datetime.date] = None,
+                  pre_close: bool = False
+                  ) -> pd.DataFrame:
+        """
+        :param date_as_object: 见 <decode>，默认与 <to_python> 一样为 datetime.date 对象。
+        :param start: 开始日期，None 表示不限。
+        :param end: 结束日期（包含），None 表示不限。
+        :param pre_close: 见 <decode>。
+        :return: pandas DataFrame.
+        """
+        return self.decode(self.records(start, end), date_as_object, pre_close)
 
 
 class MinuteQuoteReader(QuoteReaderBase):
@@ -103,7 +348,9 @@ class MinuteQuoteReader(QuoteReaderBase):
     """
 
     def __init__(self, filename: str):
-        super().__init__(filename, '<HHfffffII')
+        super().__init__(filename,
+                         '<HHfffffII',
+                         ('date', 'time', 'open', 'high', 'low', 'close', 'amount', 'volume', 'reserved'))
 
     def to_python(self) -> typing.Generator:
         unpack = self.unpack()
@@ -121,11 +368,167 @@ class MinuteQuoteReader(QuoteReaderBase):
                    float(item[6]),
                    int(item[7]))
 
+    def decode(self,
+               record: np.ndarray,
+               date_as_object: bool = False,
+               time_as_object: bool = False
+               ) -> pd.DataFrame:
+        """
+        以整列运算的方式解码。
+        <datetime> 列为 datetime64[m] 时间戳，其余列与 <to_python> 相同。
+        :param record: 结构化数组（<to_numpy> 的结果或其切片）。
+        :param date_as_object: True 则 <date> 列为 datetime.date 对象，否则为 datetime64[D]。
+        :param time_as_object: True 则 <time> 列为 datetime.time 对象，否则为 timedelta64[m]（距 0 点的分钟数）。
+        :return: pandas DataFrame.
+        """
+        import pandas as pd
+
+        date = packed_date_to_datetime64(record['date'])
+        time = record['time'].astype('timedelta64[m]')
+        return pd.DataFrame({
+            'datetime': date + time,
+            'date': _as_object(date, lambda x: x) if date_as_object else date,
+            'time': (_as_object(record['time'], lambda x: datetime.time(hour=x // 60, minute=x % 60))
+                     if time_as_object else time),
+            'open': record['open'].astype(np.float64),
+            'high': record['high'].astype(np.float64),
+            'low': record['low'].astype(np.float64),
+            'close': record['close'].astype(np.float64),
+            'amount': record['amount'].astype(np.float64),
+            'volume': record['volume'].astype(np.int64),
+        })
+
+    def sort_key(self, item: np.void) -> int:
+        # 压缩日期随日期单调递增（月日部分不超过 1231 < 2048），分钟数小于 1440。
+        return int(item['date']) * 1440 + int(item['time'])
+
+    def bound_key(self, value: datetime.date, upper: bool) -> int:
+        date = (value.year - 2004) * 2048 + value.month * 100 + value.day
+        if isinstance(value, datetime.datetime):
+            minute = value.hour * 60 + value.minute
+        else:
+            # 只给出日期时，包含当天全部分钟线。
+            minute = 1439 if upper else 0
+        return date * 1440 + minute
+
     def to_pandas(self,
                   date_as_object: bool = False,
-                  time_as_object: bool = False
+                  time_as_object: bool = False,
+                  start: typing.Optional[datetime.date] = None,
+                  end: typing.Optional[datetime.date] = None
                   ) -> pd.DataFrame:
-        return pd.DataFrame(
-            self.to_python(),
-            columns=['date', 'time', 'open', 'high', 'low', 'close', 'amount', 'volume']
-        )
+        """
+        :param date_as_object: 见 <decode>。
+        :param time_as_object: 见 <decode>。
+        :param start: 开始日期（时间），None 表示不限。
+        :param end: 结束日期（时间，包含），None 表示不限。
+        :return: pandas DataFrame.
+        """
+        return self.decode(self.records(start, end), date_as_object, time_as_object)
+
+
+# 通达信 vipdoc 目录下各频次行情文件的位置：<vipdoc>/<交易所代码>/<子目录>/<交易所代码><证券代码><扩展名>
+# frequency: (子目录, 扩展名, 读取器)
+TDX_FILE_LAYOUT = {
+    'daily': ('lday', '.day', DailyQuoteReader),
+    '1min': ('minline', '.lc1', MinuteQuoteReader),
+    '5min': ('fzline', '.lc5', MinuteQuoteReader),
+}
+
+
+def find_quote_files(vipdoc: typing.Optional[str] = None,
+                     frequency: str = 'daily',
+                     exchange: typing.Iterable[str] = ('sh', 'sz')
+                     ) -> typing.List[typing.Tuple[str, str, str]]:
+    """
+    查找 vipdoc 目录下某一频次的全部行情文件。
+    :param vipdoc: vipdoc 目录，None 则为 <config.TDX_ROOT_PATH>/vipdoc。
+    :param frequency: 'daily', '1min' or '5min'.
+    :param exchange: 交易所代码。
+    :return: list of (exchange, code, filename).
+    """
+    if vipdoc is None:
+        vipdoc = os.path.join(config.TDX_ROOT_PATH, 'vipdoc')
+    folder, extension, _ = TDX_FILE_LAYOUT[frequency]
+    result = []
+    for item in exchange:
+        for filename in sorted(glob.glob(os.path.join(vipdoc, item, folder, item + '*' + extension))):
+            code = os.path.basename(filename)[len(item):-len(extension)]
+            result.append((item, code, filename))
+    return result
+
+
+def _read_quote_file(task: tuple) -> typing.Tuple[str, str, np.ndarray]:
+    """
+    进程池的工作函数，必须位于模块顶层才能被 pickle。
+    只返回未解码的结构化数组（每条 32 字节），进程间传输的数据量最小，解码在主进程中整列完成。
+    """
+    exchange, code, filename, frequency, start, end = task
+    reader = TDX_FILE_LAYOUT[frequency][2](filename)
+    return exchange, code, np.array(reader.records(start, end))
+
+
+def read_vipdoc(vipdoc: typing.Optional[str] = None,
+                frequency: str = 'daily',
+                exchange: typing.Iterable[str] = ('sh', 'sz'),
+                start: typing.Optional[datetime.date] = None,
+                end: typing.Optional[datetime.date] = None,
+                workers: typing.Optional[int] = None,
+                combine: bool = True
+                ) -> typing.Union[pd.DataFrame, typing.Dict[typing.Tuple[str, str], pd.DataFrame]]:
+    """
+    用进程池并行读取 vipdoc 目录下某一频次的全部行情文件。
+    :param vipdoc: vipdoc 目录，None 则为 <config.TDX_ROOT_PATH>/vipdoc。
+    :param frequency: 'daily', '1min' or '5min'.
+    :param exchange: 交易所代码。
+    :param start: 开始日期（时间），None 表示不限。
+    :param end: 结束日期（时间，包含），None 表示不限。
+    :param workers: 进程数，None 为 CPU 核数，1 为在本进程内串行读取。
+    :param combine: True 则返回以 (exchange, code) 为索引的长表，否则返回 {(exchange, code): DataFrame}。
+    :return: pandas DataFrame or dict.
+    """
+    import pandas as pd
+
+    tasks = [(item, code, filename, frequency, start, end)
+             for item, code, filename in find_quote_files(vipdoc, frequency, exchange)]
+    logger.debug('Read {} <{}> quote files with {} workers.'.format(len(tasks), frequency, workers or 'all'))
+
+    if workers == 1:
+        result = list(map(_read_quote_file, tasks))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            result = list(executor.map(_read_quote_file, tasks, chunksize=max(1, len(tasks) // 256)))
+
+    if not result:
+        return pd.DataFrame() if combine else {}
+    # 解码与文件无关，借用第一个文件的读取器。
+    reader = TDX_FILE_LAYOUT[frequency][2](tasks[0][2])
+    if not combine:
+        return {(item, code): reader.decode(record) for item, code, record in result}
+
+    frame = reader.decode(np.concatenate([record for _, _, record in result]))
+    # 按文件构造 MultiIndex 的编码，避免对逐行的字符串做 factorize。
+    count = [len(record) for _, _, record in result]
+    exchange_level, exchange_code = np.unique([item for item, _, _ in result], return_inverse=True)
+    code_level, code_code = np.unique([code for _, code, _ in result], return_inverse=True)
+    frame.index = pd.MultiIndex(levels=[exchange_level, code_level],
+                                codes=[np.repeat(exchange_code, count), np.repeat(code_code, count)],
+                                names=['exchange', 'code'])
+    return frame
+
+
+def read_trading_dates(vipdoc: typing.Optional[str] = None,
+                       exchange: str = 'sh',
+                       ) -> np.ndarray:
+    """
+    由一个交易所全部日线文件中出现过的日期之并集得到交易日。
+    只读取日期字段（memmap），由 <qat.quote.calendar.union_dates> 求并集。
+    :param vipdoc: vipdoc 目录，None 则为 <config.TDX_ROOT_PATH>/vipdoc。
+    :param exchange: 交易所代码。
+    :return: 升序的 datetime64[D] 数组。
+    """
+    # qat.quote 导入本模块，这里延迟导入以免循环引用。
+    from qat.quote.calendar import union_dates
+
+    return union_dates(yyyymmdd_to_datetime64(DailyQuoteReader(filename).memmap()['date'])
+                       for _, _, filename in find_quote_files(vipdoc, 'daily', (exchange,)))
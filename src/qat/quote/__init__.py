@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+
+"""
+Quote processing module.
+"""
+
+from .resample import (
+    resample,
+    resample_all,
+    merge_bars,
+    IncrementalResampler
+)
+
+from .calendar import TradingCalendar, union_dates
+from .store import ColumnStore
+from .adjust import AdjustmentFactor, AdjustmentCache
+from .derive import derive_quote_columns
+from .indicator import ma, ema, MA, EMA, MACD, RSI, KDJ, BOLL, ATR, OBV
+from .panel import Panel, panel_from_tdx, panel_from_store
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+
+"""
+Quote processing module - price adjustment (复权).
+
+除权除息日的上日收盘价（交易所公布的除权参考价）与前一交易日的实际收盘价不同，
+二者之比就是这一次除权除息的复权比例：
+    ratio = 前一交易日收盘价 / 除权日上日收盘价
+只保存除权除息日及其比例（每只证券一生不过几十条），复权因子由它们的累积乘积得出：
+    后复权因子(t) = t 及之前全部除权除息日的 ratio 之积，后复权价 = 价格 * 后复权因子；
+    前复权价 = 价格 * 后复权因子 / 最新的后复权因子。
+新数据只需检查新增的记录：新的除权除息日追加在末尾，已有的后复权因子不变，
+前复权只是除数（最新的后复权因子）改变，不必重算全部历史。
+"""
+
+from __future__ import annotations
+
+import os
+import os.path
+import glob
+import typing
+
+import numpy as np
+
+from ..config import logger
+from ..datasource.tdx import DailyQuoteReader, find_quote_files
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+
+
+PRICE_COLUMNS = ('open', 'high', 'low', 'close')
+
+# 上日收盘价以分为单位，相差不足 0.5 分视为舍入误差而不是除权除息。
+TOLERANCE = 0.005
+
+
+class AdjustmentFactor:
+    """
+    一只证券的复权因子。
+    """
+
+    def __init__(self,
+                 ex_date: typing.Optional[np.ndarray] = None,
+                 ratio: typing.Optional[np.ndarray] = None,
+                 last_date: typing.Optional[np.datetime64] = None,
+                 last_close: typing.Optional[float] = None):
+        """
+        :param ex_date: 除权除息日，升序。
+        :param ratio: 各除权除息日的复权比例。
+        :param last_date: 已处理的最后一个交易日。
+        :param last_close: 已处理的最后一个交易日的收盘价，用于检查下一批数据的第一条记录。
+        """
+        self.ex_date = np.asarray([] if ex_date is None else ex_date, dtype='datetime64[D]')
+        self.ratio = np.asarray([] if ratio is None else ratio, dtype=np.float64)
+        self.last_date = None if last_date is None else np.datetime64(last_date, 'D')
+        self.last_close = last_close
+        self._cumulative = np.cumprod(np.r_[1.0, self.ratio])
+
+    def __len__(self) -> int:
+        return len(self.ex_date)
+
+    def __repr__(self):
+        return 'AdjustmentFactor(events=%d, last_date="%s")' % (len(self), self.last_date)
+
+    def update(self, date: np.ndarray, close: np.ndarray, pre_close: np.ndarray) -> int:
+        """
+        检查新的日线数据，追加其中的除权除息日。早于或等于 <last_date> 的记录被忽略。
+        :param date: 日期，升序。
+        :param close: 收盘价。
+        :param pre_close: 上日收盘价，0 表示缺失（不检查该记录）。
+        :return: 新增的除权除息日个数。
+        """
+        date = np.asarray(date, dtype='datetime64[D]')
+        close = np.asarray(close, dtype=np.float64)
+        pre_close = np.asarray(pre_close, dtype=np.float64)
+        if self.last_date is not None:
+            begin = int(np.searchsorted(date, self.last_date, side='right'))
+            date, close, pre_close = date[begin:], close[begin:], pre_close[begin:]
+        if len(date) == 0:
+            return 0
+
+        previous = np.r_[np.nan if self.last_close is None else self.last_close, close[:-1]]
+        event = (pre_close > 0) & (np.abs(previous - pre_close) > TOLERANCE)
+        event &= ~np.isnan(previous)
+
+        self.ex_date = np.concatenate([self.ex_date, date[event]])
+        self.ratio = np.concatenate([self.ratio, previous[event] / pre_close[event]])
+        self._cumulative = np.cumprod(np.r_[1.0, self.ratio])
+        self.last_date = date[-1]
+        self.last_close = float(close[-1])
+        return int(event.sum())
+
+    def backward_factor(self, date: np.ndarray) -> np.ndarray:
+        """
+        后复权因子，O(log n) 每个日期。
+        :param date: 日期数组。
+        :return: float64 数组。
+        """
+        index = np.searchsorted(self.ex_date, np.asarray(date, dtype='datetime64[D]'), side='right')
+        return self._cumulative[index]
+
+    def forward_factor(self, date: np.ndarray) -> np.ndarray:
+        """
+        前复权因子，最新的价格不变。
+        :param date: 日期数组。
+        :return: float64 数组。
+        """
+        return self.backward_factor(date) / self._cumulative[-1]
+
+    def _apply(self, bars: pd.DataFrame, factor: np.ndarray, columns: typing.Iterable[str]) -> pd.DataFrame:
+        result = bars.copy()
+        for column in columns:
+            if column in result:
+                result[column] = result[column].values * factor
+        return result
+
+    def backward(self, bars: pd.DataFrame, columns: typing.Iterable[str] = PRICE_COLUMNS) -> pd.DataFrame:
+        """
+        后复权。
+        :param bars: 行情，需有 <date> 列。
+        :param columns: 要复权的价格列。
+        :return: 复权后的 DataFrame（副本）。
+        """
+        return self._apply(bars, self.backward_factor(bars['date'].values), columns)
+
+    def forward(self, bars: pd.DataFrame, columns: typing.Iterable[str] = PRICE_COLUMNS) -> pd.DataFrame:
+        """
+        前复权。
+        :param bars: 行情，需有 <date> 列。
+        :param columns: 要复权的价格列。
+        :return: 复权后的 DataFrame（副本）。
+        """
+        return self._apply(bars, self.forward_factor(bars['date'].values), columns)
+
+    def save(self, filename: str) -> None:
+        np.savez(filename,
+                 ex_date=self.ex_date,
+                 ratio=self.ratio,
+                 last_date=np.array([] if self.last_date is None else [self.last_date], dtype='datetime64[D]'),
+                 last_close=np.array([] if self.last_close is None else [self.last_close], dtype=np.float64))
+
+    @classmethod
+    def load(cls, filename: str) -> 'AdjustmentFactor':
+        with np.load(filename) as data:
+            return cls(data['ex_date'],
+                       data['ratio'],
+                       data['last_date'][0] if len(data['last_date']) else None,
+                       float(data['last_close'][0]) if len(data['last_close']) else None)
+
+
+class AdjustmentCache:
+    """
+    复权因子的缓存，可选地保存在目录中（每只证券一个 .npz 文件）。
+    """
+
+    def __init__(self, root: typing.Optional[str] = None):
+        """
+        :param root: 保存复权因子的目录，None 则只在内存中缓存。
+        """
+        self.root = root
+        self._factor: typing.Dict[typing.Tuple[str, str], AdjustmentFactor] = {}
+
+    def _filename(self, exchange: str, code: str) -> str:
+        return os.path.join(self.root, exchange, code + '.npz')
+
+    def get(self, exchange: str, code: str) -> AdjustmentFactor:
+        """
+        一只证券的复权因子，没有则为空（尚未处理任何数据）。
+        """
+        key = (exchange, code)
+        if key not in self._factor:
+            if self.root is not None and os.path.exists(self._filename(exchange, code)):
+                self._factor[key] = AdjustmentFactor.load(self._filename(exchange, code))
+            else:
+                self._factor[key] = AdjustmentFactor()
+        return self._factor[key]
+
+    def update(self, exchange: str, code: str, bars: typing.Union[pd.DataFrame, typing.Dict[str, np.ndarray]]) -> int:
+        """
+        用新的日线数据更新一只证券的复权因子。
+        :param exchange: 交易所代码。
+        :param code: 证券代码。
+        :param bars: 需有 date, close, pre_close 列。
+        :return: 新增的除权除息日个数。
+        """
+        factor = self.get(exchange, code)
+        last_date = factor.last_date
+        count = factor.update(bars['date'], bars['close'], bars['pre_close'])
+        if self.root is not None and factor.last_date != last_date:
+            os.makedirs(os.path.join(self.root, exchange), exist_ok=True)
+            factor.save(self._filename(exchange, code))
+        return count
+
+    def invalidate(self, exchange: typing.Optional[str] = None, code: typing.Optional[str] = None) -> None:
+        """
+        丢弃缓存（包括保存的文件），下次更新时从头计算。
+        :param exchange: 交易所代码，None 则为全部。
+        :param code: 证券代码，None 则为该交易所的全部。
+        """
+        for key in list(self._factor.keys()):
+            if (exchange is None or key[0] == exchange) and (code is None or key[1] == code):
+                del self._factor[key]
+        if self.root is None or not os.path.isdir(self.root):
+            return
+        for folder in ([exchange] if exchange else os.listdir(self.root)):
+            for item in glob.glob(os.path.join(self.root, folder, (code or '*') + '.npz')):
+                os.remove(item)
+
+    def update_tdx(self,
+                   vipdoc: typing.Optional[str] = None,
+                   exchange: typing.Iterable[str] = ('sh', 'sz')
+                   ) -> int:
+        """
+        由通达信日线文件增量更新：每个文件只解码上次处理之后的记录。
+        :param vipdoc: vipdoc 目录，None 则为 <config.TDX_ROOT_PATH>/vipdoc。
+        :param exchange: 交易所代码。
+        :return: 新增的除权除息日个数。
+        """
+        total = 0
+        for item, code, filename in find_quote_files(vipdoc, 'daily', exchange):
+            reader = DailyQuoteReader(filename)
+            last_date = self.get(item, code).last_date
+            record = reader.to_numpy() if last_date is None else reader.records(start=last_date.item())
+            total += self.update(item, code, reader.decode_columns(record, ('date', 'close', 'pre_close')))
+        logger.info('Found {} new ex-dates.'.format(total))
+        return total
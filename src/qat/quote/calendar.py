@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+
+"""
+Quote processing module - trading calendar.
+
+交易日历保存为两份等价的数据：
+    sessions: 升序、不重复的交易日（datetime64[D]），用于按序号取交易日；
+    rank:     从第一个交易日到最后一个交易日的每一个自然日，到该日为止（含）的交易日个数。
+是否交易日、前后第 N 个交易日、区间内的交易日个数都只需一次数组下标运算，O(1)，
+且参数为数组时整列计算。A 股 30 年约 11000 个自然日，rank 不到 100 KB。
+"""
+
+import datetime
+import typing
+
+import numpy as np
+
+
+DateLike = typing.Union[datetime.date, np.datetime64, str]
+
+
+def _day_number(value) -> np.ndarray:
+    """
+    日期（标量或数组）距 1970-01-01 的天数。
+    """
+    return np.asarray(value, dtype='datetime64[D]').astype(np.int64)
+
+
+def union_dates(dates: typing.Iterable[np.ndarray]) -> np.ndarray:
+    """
+    多个日期数组的并集。
+    各数组的日期标记在一张按天编号的位图上，位图只覆盖已出现的最早到最晚日期，遇到范围之外的日期时扩展。
+    :param dates: 日期数组（datetime64 或可转换为 datetime64[D]）的序列。
+    :return: 升序、不重复的 datetime64[D] 数组。
+    """
+    origin = 0
+    bitmap = np.zeros(0, dtype=np.bool_)
+    for item in dates:
+        day = _day_number(item)
+        if len(day) == 0:
+            continue
+        low, high = int(day.min()), int(day.max()) + 1
+        if len(bitmap) == 0:
+            origin, bitmap = low, np.zeros(high - low, dtype=np.bool_)
+        elif low < origin or high > origin + len(bitmap):
+            begin, end = min(low, origin), max(high, origin + len(bitmap))
+            grown = np.zeros(end - begin, dtype=np.bool_)
+            grown[origin - begin:origin - begin + len(bitmap)] = bitmap
+            origin, bitmap = begin, grown
+        bitmap[day - origin] = True
+    return (np.flatnonzero(bitmap) + origin).astype('datetime64[D]')
+
+
+class TradingCalendar:
+    """
+    交易日历。
+    """
+
+    def __init__(self, sessions: typing.Iterable[DateLike]):
+        """
+        :param sessions: 交易日，可以无序、重复。
+        """
+        self.sessions = np.unique(np.asarray(list(sessions) if not isinstance(sessions, np.ndarray) else sessions,
+                                             dtype='datetime64[D]'))
+        day = self.sessions.astype(np.int64)
+        self._origin = int(day[0]) if len(day) else 0
+        bitmap = np.zeros(int(day[-1]) - self._origin + 1 if len(day) else 0, dtype=np.bool_)
+        bitmap[day - self._origin] = True
+        self._bitmap = bitmap
+        self._rank = np.cumsum(bitmap, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def __contains__(self, date: DateLike) -> bool:
+        return bool(self.is_session(date))
+
+    def __repr__(self):
+        if len(self) == 0:
+            return 'TradingCalendar()'
+        return 'TradingCalendar(first="%s", last="%s", sessions=%d)' % (self.first, self.last, len(self))
+
+    @property
+    def first(self) -> np.datetime64:
+        return self.sessions[0]
+
+    @property
+    def last(self) -> np.datetime64:
+        return self.sessions[-1]
+
+    def _count_until(self, day: np.ndarray) -> np.ndarray:
+        """
+        到天数 <day> 为止（含）的交易日个数。
+        """
+        position = day - self._origin
+        return np.where(position < 0,
+                        0,
+                        self._rank[np.clip(position, 0, max(len(self._rank) - 1, 0))] if len(self._rank) else 0)
+
+    def is_session(self, date: typing.Union[DateLike, np.ndarray]) -> typing.Union[bool, np.ndarray]:
+        """
+        是否交易日，O(1)。
+        :param date: 日期或日期数组。
+        :return: bool 或 bool 数组。
+        """
+        position = _day_number(date) - self._origin
+        inside = (position >= 0) & (position < len(self._bitmap))
+        return inside & self._bitmap[np.where(inside, position, 0)] if len(self._bitmap) else inside
+
+    def count(self, start: DateLike, end: DateLike) -> typing.Union[int, np.ndarray]:
+        """
+        [start, end] 内的交易日个数，O(1)。
+        """
+        return self._count_until(_day_number(end)) - self._count_until(_day_number(start) - 1)
+
+    def sessions_in_range(self, start: typing.Optional[DateLike] = None,
+                          end: typing.Optional[DateLike] = None) -> np.ndarray:
+        """
+        [start, end] 内的交易日。
+        :param start: 开始日期，None 则不限。
+        :param end: 结束日期（含），None 则不限。
+        :return: datetime64[D] 数组（视图）。
+        """
+        begin = 0 if start is None else int(self._count_until(_day_number(start) - 1))
+        stop = len(self.sessions) if end is None else int(self._count_until(_day_number(end)))
+        return self.sessions[begin:stop]
+
+    def offset(self, date: typing.Union[DateLike, np.ndarray], n: int) -> typing.Union[np.datetime64, np.ndarray]:
+        """
+        <date> 之后（n > 0）或之前（n < 0）的第 |n| 个交易日，O(1)。
+        <date> 本身不计入；n == 0 时 <date> 必须是交易日。
+        :param date: 日期或日期数组。
+        :param n: 偏移的交易日个数。
+        :return: datetime64[D] 或其数组。
+        """
+        day = _day_number(date)
+        rank = self._count_until(day)
+        if n > 0:
+            index = rank - 1 + n
+        elif n < 0:
+            index = rank - self.is_session(date) + n
+        else:
+            if not np.all(self.is_session(date)):
+                raise KeyError('<{}> is not a trading session.'.format(date))
+            index = rank - 1
+        if np.any(index < 0) or np.any(index >= len(self.sessions)):
+            raise IndexError('Offset {} from <{}> is out of the calendar.'.format(n, date))
+        return self.sessions[index]
+
+    def next_session(self, date: typing.Union[DateLike, np.ndarray], n: int = 1):
+        """
+        <date> 之后的第 n 个交易日。
+        """
+        return self.offset(date, n)
+
+    def previous_session(self, date: typing.Union[DateLike, np.ndarray], n: int = 1):
+        """
+        <date> 之前的第 n 个交易日。
+        """
+        return self.offset(date, -n)
+
+    def missing(self, dates: np.ndarray,
+                start: typing.Optional[DateLike] = None,
+                end: typing.Optional[DateLike] = None) -> np.ndarray:
+        """
+        缺口检测：[start, end] 内不在 <dates> 中的交易日。
+        :param dates: 已有数据的日期。
+        :param start: 开始日期，None 则为 <dates> 中最早的日期。
+        :param end: 结束日期（含），None 则为 <dates> 中最晚的日期。
+        :return: datetime64[D] 数组。
+        """
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        if len(dates) == 0 and (start is None or end is None):
+            return self.sessions[:0]
+        expected = self.sessions_in_range(dates.min() if start is None else start,
+                                          dates.max() if end is None else end)
+        return expected[~np.isin(expected, dates)]
+
+    def union(self, sessions: typing.Union['TradingCalendar', np.ndarray]) -> 'TradingCalendar':
+        """
+        合并新的交易日（例如增量导入的行情日期），返回新的日历。
+        """
+        if isinstance(sessions, TradingCalendar):
+            sessions = sessions.sessions
+        return TradingCalendar(np.concatenate([self.sessions, np.asarray(sessions, dtype='datetime64[D]')]))
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+"""
+Quote processing module - derived columns.
+
+由一批行情整列地计算派生列：
+    pre_close:      前一周期收盘价；
+    change:         涨跌，close - pre_close；
+    change_percent: 涨跌幅，change / pre_close；
+    amplitude:      振幅，(high - low) / pre_close。
+涨跌幅与振幅都是比值，不乘 100（0.05 即 5%）；TuShare 的 pct_chg 是百分数，不直接使用。
+批次的第一条记录用上一批最后的收盘价（<last_close>）作为前收盘，增量导入时不必回读历史。
+数据自带上日收盘价（通达信日线的 pre_close，交易所公布的除权参考价）时优先使用它，
+这样除权除息日的涨跌与交易所口径一致。
+"""
+
+from __future__ import annotations
+
+import typing
+
+import numpy as np
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+
+
+DERIVED_COLUMNS = ('pre_close', 'change', 'change_percent', 'amplitude')
+
+
+def derive_quote_columns(bars: pd.DataFrame, last_close: typing.Optional[float] = None) -> pd.DataFrame:
+    """
+    计算派生列，原地添加到 <bars> 中。
+    :param bars: 按时间升序的一批行情，需有 high, low, close 列，可以有 pre_close 列（0 表示缺失）。
+    :param last_close: 上一批最后一条记录的收盘价，None 表示没有（第一批）。
+    :return: <bars>. 无法得到前收盘的记录，派生列为 NaN。
+    """
+    close = bars['close'].values.astype(np.float64)
+    previous = np.empty(len(close), dtype=np.float64)
+    if len(close):
+        previous[0] = np.nan if last_close is None else last_close
+        previous[1:] = close[:-1]
+    if 'pre_close' in bars:
+        given = bars['pre_close'].values.astype(np.float64)
+        previous = np.where(given > 0, given, previous)
+
+    # 前收盘为 0 的记录（如新股上市首日前）不计算涨跌幅。
+    with np.errstate(divide='ignore', invalid='ignore'):
+        denominator = np.where(previous > 0, previous, np.nan)
+        bars['pre_close'] = previous
+        bars['change'] = close - previous
+        bars['change_percent'] = (close - previous) / denominator
+        bars['amplitude'] = (bars['high'].values - bars['low'].values) / denominator
+    return bars
@@ -0,0 +1,373 @@
+# -*- coding: utf-8 -*-
+
+"""
+Quote processing module - technical indicators.
+
+每个指标有两种算法，结果相同：
+    compute(bars): 对整段行情（<DailyQuoteReader.to_pandas> 等的结果）做整列运算；
+    update(bar):   追加一根 K 线，只用指标对象中保存的少量状态，O(1)，不必重算全部历史。
+compute 之后指标对象的状态即为最后一根 K 线处的状态，可以接着 update。
+
+递推型的指标（EMA 及由它构成的 MACD、RSI、KDJ）用分块的闭式解整列计算：
+    y[t] = w^t * (y[0] + a * sum(x[s] / w^s, s = 1..t))，w = 1 - a，
+分块使 w^-t 不超过 1e100，块内只有 cumsum。
+各指标的定义采用通达信的口径：SMA(X, N, M) 即 alpha = M / N 的 EMA，RSI、KDJ 由它构成。
+"""
+
+from __future__ import annotations
+
+import collections
+import math
+import typing
+
+import numpy as np
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+
+
+def _column(bars, name: str) -> np.ndarray:
+    return np.asarray(bars[name], dtype=np.float64)
+
+
+def ma(x: np.ndarray, n: int) -> np.ndarray:
+    """
+    简单移动平均，前 n - 1 个值为 NaN。
+    """
+    x = np.asarray(x, dtype=np.float64)
+    result = np.full(len(x), np.nan)
+    if len(x) >= n:
+        total = np.cumsum(np.r_[0.0, x])
+        result[n - 1:] = (total[n:] - total[:-n]) / n
+    return result
+
+
+def ema(x: np.ndarray,
+        n: typing.Optional[int] = None,
+        alpha: typing.Optional[float] = None,
+        initial: typing.Optional[float] = None) -> np.ndarray:
+    """
+    指数移动平均 y[t] = alpha * x[t] + (1 - alpha) * y[t - 1]。
+    :param x: 数组。
+    :param n: 周期，alpha = 2 / (n + 1)。
+    :param alpha: 平滑系数，给出时忽略 <n>。
+    :param initial: y[-1]，None 则 y[0] = x[0]。
+    :return: float64 数组。
+    """
+    x = np.asarray(x, dtype=np.float64)
+    a = alpha if alpha is not None else 2.0 / (n + 1)
+    w = 1.0 - a
+    result = np.empty(len(x))
+    if len(x) == 0:
+        return result
+    if w <= 0.0:
+        result[:] = x
+        return result
+
+    block = max(1, int(230.0 / -np.log(w)))
+    previous = x[0] if initial is None else initial
+    for begin in range(0, len(x), block):
+        segment = x[begin:begin + block]
+        power = w ** np.arange(1, len(segment) + 1)
+        result[begin:begin + len(segment)] = power * (previous + a * np.cumsum(segment / power))
+        previous = result[begin + len(segment) - 1]
+    return result
+
+
+def _rolling(x: np.ndarray, n: int, function: np.ufunc) -> np.ndarray:
+    """
+    窗口为 n 的滚动最大（function 为 np.maximum）或最小（np.minimum），O(len(x))，与 n 无关。
+    前 n - 1 个值在已有的数据上计算（与通达信的 HHV、LLV 相同）。
+    把数据按 n 个一组分块，窗口至多跨两块：块内后缀的极值与下一块前缀的极值合并即为窗口的极值。
+    """
+    if len(x) == 0:
+        return x.copy()
+    padded = np.r_[np.repeat(x[:1], n - 1), x]
+    block = -(-len(padded) // n)
+    padded = np.r_[padded, np.repeat(padded[-1:], block * n - len(padded))].reshape(block, n)
+    prefix = function.accumulate(padded, axis=1).ravel()
+    suffix = function.accumulate(padded[:, ::-1], axis=1)[:, ::-1].ravel()
+    return function(suffix[:len(x)], prefix[n - 1:n - 1 + len(x)])
+
+
+def _previous_close(close: np.ndarray) -> np.ndarray:
+    """
+    前一根 K 线的收盘价，第一根没有前收盘，用它自己的收盘价。
+    """
+    return np.r_[close[:1], close[:-1]]
+
+
+class Indicator:
+    """
+    指标的基类。
+    """
+
+    columns: typing.Tuple[str, ...] = ()
+
+    def compute(self, bars: typing.Union[pd.DataFrame, typing.Dict[str, np.ndarray]]) -> pd.DataFrame:
+        """
+        整列计算，并把状态重置为最后一根 K 线处的状态。
+        :param bars: 按时间升序的行情，DataFrame 或 {列名: 数组}。
+        :return: pandas DataFrame, 列为 <columns>，DataFrame 的索引与 <bars> 相同。
+        """
+        import pandas as pd
+
+        return pd.DataFrame(self._compute(bars), index=getattr(bars, 'index', None))
+
+    def update(self, bar: typing.Mapping) -> typing.Dict[str, float]:
+        """
+        追加一根 K 线，O(1)。
+        :param bar: 一根 K 线，可以是 dict、pandas Series 等。
+        :return: {列名: 指标值}.
+        """
+        raise NotImplementedError('This class is a abstract base class.')
+
+    def _compute(self, bars) -> typing.Dict[str, np.ndarray]:
+        raise NotImplementedError('This class is a abstract base class.')
+
+
+class MA(Indicator):
+    """
+    简单移动平均。
+    """
+
+    columns = ('ma',)
+
+    def __init__(self, n: int = 5, column: str = 'close'):
+        self.n = n
+        self.column = column
+        self._window = collections.deque(maxlen=n)
+        self._sum = 0.0
+        self._updates = 0
+
+    def _compute(self, bars) -> typing.Dict[str, np.ndarray]:
+        x = _column(bars, self.column)
+        self._window = collections.deque(x[-self.n:].tolist(), maxlen=self.n)
+        self._sum = math.fsum(self._window)
+        self._updates = 0
+        return {'ma': ma(x, self.n)}
+
+    def update(self, bar: typing.Mapping) -> typing.Dict[str, float]:
+        value = float(bar[self.column])
+        if len(self._window) == self.n:
+            self._sum -= self._window[0]
+        self._window.append(value)
+        self._sum += value
+        # 滚动的和每次加减都有舍入误差，窗口每滚过一轮重新精确求和一次，均摊仍为 O(1)。
+        self._updates += 1
+        if self._updates >= self.n:
+            self._sum = math.fsum(self._window)
+            self._updates = 0
+        return {'ma': self._sum / self.n if len(self._window) == self.n else np.nan}
+
+
+class EMA(Indicator):
+    """
+    指数移动平均。
+    """
+
+    columns = ('ema',)
+
+    def __init__(self, n: int = 12, column: str = 'close'):
+        self.n = n
+        self.column = column
+        self.alpha = 2.0 / (n + 1)
+        self.value: typing.Optional[float] = None
+
+    def _compute(self, bars) -> typing.Dict[str, np.ndarray]:
+        result = ema(_column(bars, self.column), alpha=self.alpha)
+        self.value = float(result[-1]) if len(result) else None
+        return {'ema': result}
+
+    def update(self, bar: typing.Mapping) -> typing.Dict[str, float]:
+        value = float(bar[self.column])
+        self.value = value if self.value is None else self.alpha * value + (1.0 - self.alpha) * self.value
+        return {'ema': self.value}
+
+
+class MACD(Indicator):
+    """
+    DIF = EMA(C, short) - EMA(C, long)，DEA = EMA(DIF, mid)，MACD = (DIF - DEA) * 2。
+    """
+
+    columns = ('dif', 'dea', 'macd')
+
+    def __init__(self, short: int = 12, long: int = 26, mid: int = 9):
+        self.short = EMA(short)
+        self.long = EMA(long)
+        self.mid = EMA(mid, column='dif')
+
+    def _compute(self, bars) -> typing.Dict[str, np.ndarray]:
+        dif = self.short._compute(bars)['ema'] - self.long._compute(bars)['ema']
+        dea = self.mid._compute({'dif': dif})['ema']
+        return {'dif': dif, 'dea': dea, 'macd': (dif - dea) * 2.0}
+
+    def update(self, bar: typing.Mapping) -> typing.Dict[str, float]:
+        dif = self.short.update(bar)['ema'] - self.long.update(bar)['ema']
+        dea = self.mid.update({'dif': dif})['ema']
+        return {'dif': dif, 'dea': dea, 'macd': (dif - dea) * 2.0}
+
+
+class RSI(Indicator):
+    """
+    RSI = SMA(MAX(C - LC, 0), N, 1) / SMA(ABS(C - LC), N, 1) * 100，没有涨跌时为 50。
+    """
+
+    columns = ('rsi',)
+
+    def __init__(self, n: int = 6):
+        self.n = n
+        self.alpha = 1.0 / n
+        self.last_close: typing.Optional[float] = None
+        self._up: typing.Optional[float] = None
+        self._move: typing.Optional[float] = None
+
+    @staticmethod
+    def _ratio(up, move):
+        up, move = np.asarray(up, dtype=np.float64), np.asarray(move, dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(move > 0, up / move * 100.0, 50.0)
+
+    def _compute(self, bars) -> typing.Dict[str, np.ndarray]:
+        close = _column(bars, 'close')
+        change = close - _previous_close(close)
+        up = ema(np.maximum(change, 0.0), alpha=self.alpha)
+        move = ema(np.abs(change), alpha=self.alpha)
+        if len(close):
+            self.last_close, self._up, self._move = float(close[-1]), float(up[-1]), float(move[-1])
+        return {'rsi': self._ratio(up, move)}
+
+    def update(self, bar: typing.Mapping) -> typing.Dict[str, float]:
+        close = float(bar['close'])
+        change = 0.0 if self.last_close is None else close - self.last_close
+        a = self.alpha
+        self._up = max(change, 0.0) if self._up is None else a * max(change, 0.0) + (1.0 - a) * self._up
+        self._move = abs(change) if self._move is None else a * abs(change) + (1.0 - a) * self._move
+        self.last_close = close
+        return {'rsi': float(self._ratio(self._up, self._move))}
+
+
+class KDJ(Indicator):
+    """
+    RSV = (C - LLV(L, N)) / (HHV(H, N) - LLV(L, N)) * 100，K = SMA(RSV, M1, 1)，D = SMA(K, M2, 1)，J = 3K - 2D。
+    K、D 的初值为 50；最高价等于最低价时 RSV 为 50。
+    """
+
+    columns = ('k', 'd', 'j')
+
+    def __init__(self, n: int = 9, m1: int = 3, m2: int = 3):
+        self.n = n
+        self.m1 = m1
+        self.m2 = m2
+        self._high = collections.deque(maxlen=n)
+        self._low = collections.deque(maxlen=n)
+        self.k = 50.0
+        self.d = 50.0
+
+    @staticmethod
+    def _rsv(close, highest, lowest):
+        highest, lowest = np.asarray(highest, dtype=np.float64), np.asarray(lowest, dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(highest > lowest, (close - lowest) / (highest - lowest) * 100.0, 50.0)
+
+    def _compute(self, bars) -> typing.Dict[str, np.ndarray]:
+        high, low, close = _column(bars, 'high'), _column(bars, 'low'), _column(bars, 'close')
+        rsv = self._rsv(close, _rolling(high, self.n, np.maximum), _rolling(low, self.n, np.minimum))
+        k = ema(rsv, alpha=1.0 / self.m1, initial=50.0)
+        d = ema(k, alpha=1.0 / self.m2, initial=50.0)
+        self._high = collections.deque(high[-self.n:].tolist(), maxlen=self.n)
+        self._low = collections.deque(low[-self.n:].tolist(), maxlen=self.n)
+        self.k, self.d = (float(k[-1]), float(d[-1])) if len(k) else (50.0, 50.0)
+        return {'k': k, 'd': d, 'j': 3.0 * k - 2.0 * d}
+
+    def update(self, bar: typing.Mapping) -> typing.Dict[str, float]:
+        self._high.append(float(bar['high']))
+        self._low.append(float(bar['low']))
+        rsv = float(self._rsv(float(bar['close']), max(self._high), min(self._low)))
+        self.k = (rsv + (self.m1 - 1) * self.k) / self.m1
+        self.d = (self.k + (self.m2 - 1) * self.d) / self.m2
+        return {'k': self.k, 'd': self.d, 'j': 3.0 * self.k - 2.0 * self.d}
+
+
+class BOLL(Indicator):
+    """
+    MID = MA(C, N)，UPPER = MID + K * STD(C, N)，LOWER = MID - K * STD(C, N)，STD 为总体标准差。
+    """
+
+    columns = ('mid', 'upper', 'lower')
+
+    def __init__(self, n: int = 20, k: float = 2.0):
+        self.n = n
+        self.k = k
+        self._window = collections.deque(maxlen=n)
+
+    def _compute(self, bars) -> typing.Dict[str, np.ndarray]:
+        close = _column(bars, 'close')
+        mid = ma(close, self.n)
+        # 减去均值后再求滚动的平方和，避免长序列上的大数相消。
+        centered = close - close.mean() if len(close) else close
+        variance = ma(centered * centered, self.n) - ma(centered, self.n) ** 2
+        deviation = np.sqrt(np.maximum(variance, 0.0))
+        self._window = collections.deque(close[-self.n:].tolist(), maxlen=self.n)
+        return {'mid': mid, 'upper': mid + self.k * deviation, 'lower': mid - self.k * deviation}
+
+    def update(self, bar: typing.Mapping) -> typing.Dict[str, float]:
+        self._window.append(float(bar['close']))
+        if len(self._window) < self.n:
+            return {'mid': np.nan, 'upper': np.nan, 'lower': np.nan}
+        window = np.fromiter(self._window, dtype=np.float64, count=self.n)
+        mid, deviation = window.mean(), window.std()
+        return {'mid': mid, 'upper': mid + self.k * deviation, 'lower': mid - self.k * deviation}
+
+
+class ATR(Indicator):
+    """
+    TR = MAX(H - L, ABS(H - LC), ABS(L - LC))，ATR = MA(TR, N)。
+    """
+
+    columns = ('atr',)
+
+    def __init__(self, n: int = 14):
+        self.n = n
+        self.last_close: typing.Optional[float] = None
+        self._ma = MA(n, column='tr')
+
+    def _compute(self, bars) -> typing.Dict[str, np.ndarray]:
+        high, low, close = _column(bars, 'high'), _column(bars, 'low'), _column(bars, 'close')
+        previous = _previous_close(close)
+        tr = np.maximum(high - low, np.maximum(np.abs(high - previous), np.abs(low - previous)))
+        self.last_close = float(close[-1]) if len(close) else None
+        return {'atr': self._ma._compute({'tr': tr})['ma']}
+
+    def update(self, bar: typing.Mapping) -> typing.Dict[str, float]:
+        high, low, close = float(bar['high']), float(bar['low']), float(bar['close'])
+        previous = close if self.last_close is None else self.last_close
+        self.last_close = close
+        tr = max(high - low, abs(high - previous), abs(low - previous))
+        return {'atr': self._ma.update({'tr': tr})['ma']}
+
+
+class OBV(Indicator):
+    """
+    OBV = SUM(IF(C > LC, V, IF(C < LC, -V, 0)), 0)，第一根 K 线为 0。
+    """
+
+    columns = ('obv',)
+
+    def __init__(self):
+        self.last_close: typing.Optional[float] = None
+        self.value = 0.0
+
+    def _compute(self, bars) -> typing.Dict[str, np.ndarray]:
+        close, volume = _column(bars, 'close'), _column(bars, 'volume')
+        result = np.cumsum(np.sign(close - _previous_close(close)) * volume)
+        if len(close):
+            self.last_close, self.value = float(close[-1]), float(result[-1])
+        return {'obv': result}
+
+    def update(self, bar: typing.Mapping) -> typing.Dict[str, float]:
+        close = float(bar['close'])
+        if self.last_close is not None:
+            self.value += float(np.sign(close - self.last_close)) * float(bar['volume'])
+        self.last_close = close
+        return {'obv': self.value}
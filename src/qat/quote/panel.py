@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+
+"""
+Quote processing module - panel.
+
+全市场的面板数据：每个字段一个 (交易日 × 证券) 的二维数组，按共同的交易日对齐，缺失的日期为 NaN。
+构造时不拼接逐只证券的 DataFrame：先分配整块矩阵，再把每只证券的列按交易日的行号直接写入它的那一列。
+可以直接构造在 .npy 文件上（np.lib.format.open_memmap），之后任意多个分析进程以 mmap 打开，不必重新加载：
+    <directory>/dates.npy, securities.npy, <field>.npy
+"""
+
+from __future__ import annotations
+
+import os
+import os.path
+import datetime
+import typing
+
+import numpy as np
+
+from ..config import logger
+from ..datasource.tdx import DailyQuoteReader, find_quote_files, read_trading_dates
+from .calendar import TradingCalendar, union_dates
+from .store import ColumnStore
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+
+
+PANEL_FIELDS = ('open', 'high', 'low', 'close', 'volume', 'amount')
+
+
+class Panel:
+    """
+    面板数据。
+    """
+
+    def __init__(self, dates: np.ndarray, securities: np.ndarray, data: typing.Dict[str, np.ndarray]):
+        """
+        :param dates: 交易日，datetime64[D]，升序。
+        :param securities: 证券，如 'sh600000'。
+        :param data: {字段: (len(dates), len(securities)) 的数组}.
+        """
+        self.dates = dates
+        self.securities = securities
+        self.data = data
+        self._column = {x: i for i, x in enumerate(securities.tolist())}
+
+    def __repr__(self):
+        return 'Panel(dates=%d, securities=%d, fields=%s)' % (len(self.dates), len(self.securities), self.fields)
+
+    @property
+    def fields(self) -> typing.List[str]:
+        return list(self.data.keys())
+
+    @property
+    def shape(self) -> typing.Tuple[int, int]:
+        return len(self.dates), len(self.securities)
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        return self.data[field]
+
+    def column(self, security: str) -> int:
+        """
+        证券所在的列。
+        """
+        return self._column[security]
+
+    def frame(self, field: str) -> pd.DataFrame:
+        """
+        一个字段的 DataFrame（不复制数据），索引为交易日，列为证券。
+        """
+        import pandas as pd
+
+        return pd.DataFrame(self.data[field], index=pd.DatetimeIndex(self.dates), columns=self.securities, copy=False)
+
+    def save(self, directory: str) -> None:
+        """
+        保存为目录中的 .npy 文件，之后可以用 <Panel.load> 以 mmap 打开。
+        """
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, 'dates.npy'), self.dates)
+        np.save(os.path.join(directory, 'securities.npy'), self.securities)
+        for field, value in self.data.items():
+            filename = os.path.abspath(os.path.join(directory, field + '.npy'))
+            # 直接构造在该文件上的面板只需写回。
+            if getattr(value, 'filename', None) == filename:
+                value.flush()
+            else:
+                np.save(filename, value)
+
+    @classmethod
+    def load(cls, directory: str, fields: typing.Optional[typing.Iterable[str]] = None, mmap: bool = True) -> 'Panel':
+        """
+        打开保存的面板。
+        :param directory: 目录。
+        :param fields: 需要的字段，None 则为全部。
+        :param mmap: True 则以只读 mmap 打开，多个进程共享操作系统的页缓存。
+        :return: Panel.
+        """
+        if fields is None:
+            fields = sorted(os.path.splitext(x)[0] for x in os.listdir(directory)
+                            if x.endswith('.npy') and x not in ('dates.npy', 'securities.npy'))
+        return cls(np.load(os.path.join(directory, 'dates.npy')),
+                   np.load(os.path.join(directory, 'securities.npy')),
+                   {x: np.load(os.path.join(directory, x + '.npy'), mmap_mode='r' if mmap else None) for x in fields})
+
+
+def _allocate(dates: np.ndarray,
+              securities: typing.List[str],
+              fields: typing.Iterable[str],
+              dtype,
+              directory: typing.Optional[str]) -> Panel:
+    """
+    分配填满 NaN 的面板，<directory> 不为 None 时直接分配在 .npy 文件上。
+    """
+    shape = (len(dates), len(securities))
+    data = {}
+    for field in fields:
+        if directory is None:
+            data[field] = np.full(shape, np.nan, dtype=dtype)
+        else:
+            os.makedirs(directory, exist_ok=True)
+            data[field] = np.lib.format.open_memmap(os.path.join(directory, field + '.npy'),
+                                                    mode='w+', dtype=dtype, shape=shape)
+            data[field][:] = np.nan
+    return Panel(dates, np.array(securities, dtype=str), data)
+
+
+def _scatter(panel: Panel, column: int, date: np.ndarray, value: typing.Dict[str, np.ndarray]) -> None:
+    """
+    把一只证券的数据按交易日写入它的那一列，不在交易日中的日期被丢弃。
+    """
+    row = np.searchsorted(panel.dates, date)
+    inside = row < len(panel.dates)
+    inside[inside] = panel.dates[row[inside]] == date[inside]
+    for field, array in panel.data.items():
+        array[row[inside], column] = value[field][inside]
+
+
+def _sessions(dates: typing.Union[TradingCalendar, np.ndarray],
+              start: typing.Optional[datetime.date],
+              end: typing.Optional[datetime.date]) -> np.ndarray:
+    calendar = dates if isinstance(dates, TradingCalendar) else TradingCalendar(dates)
+    return np.array(calendar.sessions_in_range(start, end))
+
+
+def panel_from_tdx(vipdoc: typing.Optional[str] = None,
+                   exchange: typing.Iterable[str] = ('sh', 'sz'),
+                   fields: typing.Iterable[str] = PANEL_FIELDS,
+                   start: typing.Optional[datetime.date] = None,
+                   end: typing.Optional[datetime.date] = None,
+                   calendar: typing.Optional[TradingCalendar] = None,
+                   dtype=np.float32,
+                   directory: typing.Optional[str] = None
+                   ) -> Panel:
+    """
+    由通达信日线文件构造面板，每个文件只读取日期范围内的记录、只解码需要的字段。
+    :param vipdoc: vipdoc 目录，None 则为 <config.TDX_ROOT_PATH>/vipdoc。
+    :param exchange: 交易所代码。
+    :param fields: 字段，见 <DailyQuoteReader.decode_columns>。
+    :param start: 开始日期，None 表示不限。
+    :param end: 结束日期（包含），None 表示不限。
+    :param calendar: 交易日历，None 则为这些文件中出现过的全部日期。
+    :param dtype: np.float32 or np.float64.
+    :param directory: 不为 None 时直接构造在该目录的 .npy 文件上，见 <Panel.load>。
+    :return: Panel.
+    """
+    fields = list(fields)
+    files = find_quote_files(vipdoc, 'daily', exchange)
+    if calendar is None:
+        calendar = TradingCalendar(np.concatenate([read_trading_dates(vipdoc, x) for x in exchange]))
+    panel = _allocate(_sessions(calendar, start, end), [x + y for x, y, _ in files], fields, dtype, directory)
+
+    for column, (_, _, filename) in enumerate(files):
+        reader = DailyQuoteReader(filename)
+        value = reader.decode_columns(reader.records(start, end), ['date'] + fields)
+        _scatter(panel, column, value['date'], value)
+
+    if directory is not None:
+        panel.save(directory)
+    logger.debug('Build panel {} from TDX files.'.format(panel))
+    return panel
+
+
+def panel_from_store(store: ColumnStore,
+                     exchange: typing.Iterable[str] = ('sh', 'sz'),
+                     fields: typing.Iterable[str] = PANEL_FIELDS,
+                     start: typing.Optional[datetime.date] = None,
+                     end: typing.Optional[datetime.date] = None,
+                     calendar: typing.Optional[TradingCalendar] = None,
+                     dtype=np.float32,
+                     directory: typing.Optional[str] = None
+                     ) -> Panel:
+    """
+    由列式行情存储中的日线构造面板，参数与 <panel_from_tdx> 相同。
+    """
+    fields = list(fields)
+    securities = [x for item in exchange for x in store.securities('daily', item)]
+    if calendar is None:
+        calendar = TradingCalendar(union_dates(store.read('daily', item, code, columns=[], as_frame=False)['date']
+                                               for item, code in securities))
+    panel = _allocate(_sessions(calendar, start, end), [x + y for x, y in securities], fields, dtype, directory)
+
+    for column, (item, code) in enumerate(securities):
+        value = store.read('daily', item, code, start, end, columns=fields, as_frame=False)
+        _scatter(panel, column, value['date'], value)
+
+    if directory is not None:
+        panel.save(directory)
+    logger.debug('Build panel {} from column store <{}>.'.format(panel, store.root))
+    return panel
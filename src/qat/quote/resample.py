@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+
+"""
+Quote processing module - resample.
+
+把细粒度的 K 线（1 分钟、日线）整列地合成为粗粒度的 K 线。
+    开盘价取组内第一根，收盘价取最后一根，最高价、最低价取极值，成交量、成交额求和。
+    数据必须按时间升序排列，同一组的 K 线是连续的一段，用 np.*.reduceat 一次完成聚合。
+分钟线按交易时段对齐（A 股 60 分钟线为 10:30、11:30、14:00、15:00），不跨越午休和交易日；
+日线以上只按实际出现的交易日分组，周线、月线的 begin/end 为组内第一个、最后一个交易日。
+"""
+
+from __future__ import annotations
+
+import typing
+
+import numpy as np
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+
+
+# A 股交易时段，距 0 点的分钟数：09:30 ~ 11:30，13:00 ~ 15:00。
+A_SHARE_SESSIONS = ((570, 690), (780, 900))
+
+INTRADAY_FREQUENCY = {'5min': 5, '15min': 15, '30min': 30, '60min': 60}
+
+# 由细到粗。每个频次都可以由它前面的任何一个频次合成（分组是嵌套的）。
+FREQUENCY = ('1min', '5min', '15min', '30min', '60min', 'daily', 'weekly', 'monthly')
+
+PRICE_COLUMNS = ('open', 'high', 'low', 'close', 'volume', 'amount')
+
+
+def _day_number(date: np.ndarray) -> np.ndarray:
+    return date.astype('datetime64[D]').astype(np.int64)
+
+
+def _bar_key(bars: pd.DataFrame, frequency: str, sessions=A_SHARE_SESSIONS) -> np.ndarray:
+    """
+    每根 K 线在目标频次中所属组的键，以及（分钟线）该组的时间标签。
+    """
+    if frequency in INTRADAY_FREQUENCY:
+        return _intraday_label(bars, INTRADAY_FREQUENCY[frequency], sessions).astype(np.int64)
+    date = bars['begin'].values if 'begin' in bars else bars['date'].values
+    if frequency == 'daily':
+        return _day_number(date)
+    if frequency == 'weekly':
+        # 1970-01-01 是星期四，(天数 + 3) // 7 是以星期一为一周开始的周序号。
+        return (_day_number(date) + 3) // 7
+    if frequency == 'monthly':
+        return date.astype('datetime64[M]').astype(np.int64)
+    raise ValueError('Unknown frequency <{}>.'.format(frequency))
+
+
+def _intraday_label(bars: pd.DataFrame, minutes: int, sessions) -> np.ndarray:
+    """
+    分钟线所属 N 分钟 K 线的时间标签（该 K 线的结束时间），按交易时段对齐。
+    """
+    moment = bars['datetime'].values.astype('datetime64[m]')
+    date = moment.astype('datetime64[D]')
+    minute = (moment - date).astype(np.int64)
+
+    label = np.empty(len(minute), dtype=np.int64)
+    # 落在第一个时段开始之前的 K 线（如集合竞价）并入第一个时段。
+    session_open = np.full(len(minute), sessions[0][0], dtype=np.int64)
+    session_close = np.full(len(minute), sessions[0][1], dtype=np.int64)
+    for begin, end in sessions[1:]:
+        later = minute > session_close
+        session_open[later] = begin
+        session_close[later] = end
+    bucket = np.maximum(1, -(-(minute - session_open) // minutes))
+    label[:] = np.minimum(session_open + bucket * minutes, session_close)
+    return date + label.astype('timedelta64[m]')
+
+
+def _aggregate(bars: pd.DataFrame, key: np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray, dict]:
+    """
+    按键聚合，键相同的 K 线必须相邻。
+    :return: (每组第一根 K 线的下标, 每组最后一根 K 线的下标, {列名: 聚合后的数组})。
+    """
+    if len(key) == 0:
+        first = last = np.empty(0, dtype=np.int64)
+    else:
+        first = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+        last = np.r_[first[1:], len(key)] - 1
+    column = {
+        'open': bars['open'].values[first],
+        'high': np.maximum.reduceat(bars['high'].values, first) if len(first) else bars['high'].values[:0],
+        'low': np.minimum.reduceat(bars['low'].values, first) if len(first) else bars['low'].values[:0],
+        'close': bars['close'].values[last],
+        'volume': np.add.reduceat(bars['volume'].values, first) if len(first) else bars['volume'].values[:0],
+        'amount': np.add.reduceat(bars['amount'].values, first) if len(first) else bars['amount'].values[:0],
+    }
+    return first, last, column
+
+
+def resample(bars: pd.DataFrame, frequency: str, sessions=A_SHARE_SESSIONS) -> pd.DataFrame:
+    """
+    把 K 线合成为更粗的频次。
+    :param bars: 按时间升序的 K 线。分钟线需有 <datetime> 列（<MinuteQuoteReader.to_pandas> 的结果），
+                 日线需有 <date> 列，周线、月线需有 <begin>, <end> 列。
+    :param frequency: '5min', '15min', '30min', '60min', 'daily', 'weekly' or 'monthly'.
+    :param sessions: 交易时段，距 0 点的分钟数，只用于分钟线。
+    :return: pandas DataFrame. 分钟线的列为 datetime, date, time；日线为 date；周线、月线为 begin, end；
+             之后是 open, high, low, close, volume, amount。
+    """
+    import pandas as pd
+
+    key = _bar_key(bars, frequency, sessions)
+    first, last, column = _aggregate(bars, key)
+
+    if frequency in INTRADAY_FREQUENCY:
+        label = key[first].astype('datetime64[m]')
+        date = label.astype('datetime64[D]')
+        head = {'datetime': label, 'date': date, 'time': label - date}
+    elif frequency == 'daily':
+        date = bars['begin'].values if 'begin' in bars else bars['date'].values
+        head = {'date': date[first].astype('datetime64[D]')}
+    else:
+        begin = bars['begin'].values if 'begin' in bars else bars['date'].values
+        end = bars['end'].values if 'end' in bars else bars['date'].values
+        head = {'begin': begin[first].astype('datetime64[D]'), 'end': end[last].astype('datetime64[D]')}
+    head.update(column)
+    return pd.DataFrame(head)
+
+
+def _nests(fine: str, coarse: str) -> bool:
+    """
+    <coarse> 的每一组是否都由完整的若干组 <fine> 构成，即能否由 <fine> 合成 <coarse>。
+    """
+    if fine == '1min':
+        return True
+    if coarse in INTRADAY_FREQUENCY:
+        return fine in INTRADAY_FREQUENCY and INTRADAY_FREQUENCY[coarse] % INTRADAY_FREQUENCY[fine] == 0
+    if coarse == 'daily':
+        return fine in INTRADAY_FREQUENCY
+    # 周线跨月，月线不能由周线合成。
+    return fine in INTRADAY_FREQUENCY or fine == 'daily'
+
+
+def resample_all(bars: pd.DataFrame,
+                 frequencies: typing.Iterable[str] = FREQUENCY[1:],
+                 source: str = '1min',
+                 sessions=A_SHARE_SESSIONS
+                 ) -> typing.Dict[str, pd.DataFrame]:
+    """
+    由最细的数据一次合成多个频次：每个频次都由已合成的、能合成它的最粗频次合成，
+    例如 60 分钟线由 30 分钟线合成，周线、月线由日线合成，数据量逐级减少。
+    :param bars: 按时间升序的 K 线。
+    :param frequencies: 目标频次。
+    :param source: <bars> 的频次，'1min', '5min', 'daily' 等。
+    :param sessions: 交易时段，距 0 点的分钟数。
+    :return: {频次: DataFrame}.
+    """
+    wanted = set(frequencies)
+    needed = set(wanted)
+    if wanted & {'weekly', 'monthly'} and FREQUENCY.index(source) < FREQUENCY.index('daily'):
+        needed.add('daily')
+
+    available = [(source, bars)]
+    result = {}
+    for frequency in FREQUENCY[FREQUENCY.index(source) + 1:]:
+        if frequency not in needed:
+            continue
+        base = next(y for x, y in reversed(available) if _nests(x, frequency))
+        result[frequency] = resample(base, frequency, sessions)
+        available.append((frequency, result[frequency]))
+    return {x: result[x] for x in FREQUENCY if x in wanted and x in result}
+
+
+def merge_bars(previous: pd.DataFrame, new: pd.DataFrame, frequency: str) -> pd.DataFrame:
+    """
+    把新合成的 K 线接到已有 K 线的后面：若新数据的第一根与已有的最后一根属于同一组（例如同一周），
+    二者合并为一根。只处理这一根，不必重算全部历史。
+    :param previous: 已有的 K 线，只用到最后一根。
+    :param new: 由新增数据合成的 K 线。
+    :param frequency: 频次。
+    :return: 需要写入（更新或追加）的 K 线：合并后的最后一根（如有）与其余新 K 线。
+    """
+    import pandas as pd
+
+    if len(previous) == 0 or len(new) == 0:
+        return new.reset_index(drop=True)
+    tail = previous.iloc[-1:].reset_index(drop=True)
+    head = new.iloc[:1].reset_index(drop=True)
+    if _bar_key(tail, frequency)[0] != _bar_key(head, frequency)[0]:
+        return new.reset_index(drop=True)
+
+    merged = tail.copy()
+    merged['high'] = max(tail['high'].iloc[0], head['high'].iloc[0])
+    merged['low'] = min(tail['low'].iloc[0], head['low'].iloc[0])
+    merged['close'] = head['close'].iloc[0]
+    merged['volume'] = tail['volume'].iloc[0] + head['volume'].iloc[0]
+    merged['amount'] = tail['amount'].iloc[0] + head['amount'].iloc[0]
+    if 'end' in merged:
+        merged['end'] = head['end'].iloc[0]
+    return pd.concat([merged, new.iloc[1:]], ignore_index=True)
+
+
+class IncrementalResampler:
+    """
+    增量合成：只保存每个频次最后一根 K 线，追加新数据时只重算受影响的那一根。
+    """
+
+    def __init__(self,
+                 frequencies: typing.Iterable[str] = FREQUENCY[1:],
+                 source: str = '1min',
+                 sessions=A_SHARE_SESSIONS):
+        self.frequencies = tuple(frequencies)
+        self.source = source
+        self.sessions = sessions
+        self.last: typing.Dict[str, pd.DataFrame] = {}
+
+    def update(self, bars: pd.DataFrame) -> typing.Dict[str, pd.DataFrame]:
+        """
+        追加新数据（必须晚于已处理的数据）。
+        :param bars: 新的细粒度 K 线。
+        :return: {频次: 需要写入（更新或追加）的 K 线}，第一根可能是对已有最后一根的更新。
+        """
+        result = {}
+        for frequency, new in resample_all(bars, self.frequencies, self.source, self.sessions).items():
+            changed = merge_bars(self.last.get(frequency, new.iloc[:0]), new, frequency)
+            if len(changed):
+                self.last[frequency] = changed.iloc[-1:].reset_index(drop=True)
+            result[frequency] = changed
+        return result
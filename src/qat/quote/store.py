@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+
+"""
+Quote processing module - columnar store.
+
+与 SQL 行情表并存的列式行情存储，每只证券每个频次一个目录，每列一个原始二进制文件：
+    <root>/<frequency>/<exchange>/<code>/manifest.json
+    <root>/<frequency>/<exchange>/<code>/<version>/<column>.bin
+manifest.json 记录当前版本、记录数和各列的 dtype，是读者唯一的入口：
+    追加：把新记录写到各列文件的末尾，再原子地替换 manifest 中的记录数，
+          读者只映射 manifest 中的记录数，看不到写了一半的尾部；
+    覆盖：写入新的版本目录，再原子地替换 manifest 指向新版本，旧版本随后删除
+          （仍被映射、暂时删不掉的旧版本在下次写入时再删除）。
+同一只证券同一时刻只允许一个写者。
+读取时用 np.memmap 映射文件，只有被选中的列、日期范围内的行才会从磁盘读入；
+日期范围用键列（日线 date，分钟线 datetime）上的二分查找定位。
+分钟线只保存 datetime，date、time 在读取时由它推出。
+"""
+
+from __future__ import annotations
+
+import os
+import os.path
+import glob
+import json
+import shutil
+import datetime
+import typing
+
+import numpy as np
+
+from ..config import logger
+from ..datasource.tdx import TDX_FILE_LAYOUT, find_quote_files
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+
+
+# 频次 -> 键列及其 dtype。
+KEY_COLUMN = {
+    'daily': ('date', 'datetime64[D]'),
+    '1min': ('datetime', 'datetime64[m]'),
+    '5min': ('datetime', 'datetime64[m]'),
+}
+
+# 由键列推出、不单独保存的列。
+DERIVED_COLUMN = ('date', 'time')
+
+MANIFEST = 'manifest.json'
+
+
+class ColumnStore:
+    """
+    列式行情存储。
+    """
+
+    def __init__(self, root: str):
+        """
+        :param root: 存储的根目录。
+        """
+        self.root = root
+
+    def path(self, frequency: str, exchange: str, code: str) -> str:
+        return os.path.join(self.root, frequency, exchange, code)
+
+    def securities(self, frequency: str, exchange: typing.Optional[str] = None) -> typing.List[typing.Tuple[str, str]]:
+        """
+        已保存的证券。
+        :param frequency: 'daily', '1min' or '5min'.
+        :param exchange: 交易所代码，None 则为全部。
+        :return: list of (exchange, code).
+        """
+        pattern = os.path.join(self.root, frequency, exchange or '*', '*', MANIFEST)
+        return sorted((os.path.basename(os.path.dirname(os.path.dirname(x))), os.path.basename(os.path.dirname(x)))
+                      for x in glob.glob(pattern))
+
+    def _manifest(self, frequency: str, exchange: str, code: str) -> typing.Optional[dict]:
+        """
+        {'version': 版本, 'rows': 记录数, 'columns': {列名: dtype}}，未保存过则为 None。
+        """
+        try:
+            with open(os.path.join(self.path(frequency, exchange, code), MANIFEST), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _save_manifest(self, frequency: str, exchange: str, code: str, manifest: dict) -> None:
+        filename = os.path.join(self.path(frequency, exchange, code), MANIFEST)
+        with open(filename + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(filename + '.tmp', filename)
+
+    def _column_file(self, frequency: str, exchange: str, code: str, version: int, column: str) -> str:
+        return os.path.join(self.path(frequency, exchange, code), str(version), column + '.bin')
+
+    def columns(self, frequency: str, exchange: str, code: str) -> typing.List[str]:
+        """
+        一只证券已保存的列。
+        """
+        manifest = self._manifest(frequency, exchange, code)
+        return [] if manifest is None else sorted(manifest['columns'])
+
+    def _load(self, manifest: dict, frequency: str, exchange: str, code: str, column: str,
+              mmap: bool = True) -> np.ndarray:
+        dtype = np.dtype(manifest['columns'][column])
+        filename = self._column_file(frequency, exchange, code, manifest['version'], column)
+        if manifest['rows'] == 0:
+            return np.zeros(0, dtype=dtype)
+        if mmap:
+            return np.memmap(filename, dtype=dtype, mode='r', shape=(manifest['rows'],))
+        return np.fromfile(filename, dtype=dtype, count=manifest['rows'])
+
+    def last_key(self, frequency: str, exchange: str, code: str) -> typing.Optional[np.datetime64]:
+        """
+        已保存的最后一条记录的键（日期或时间），没有则为 None。
+        """
+        manifest = self._manifest(frequency, exchange, code)
+        if manifest is None or manifest['rows'] == 0:
+            return None
+        return self._load(manifest, frequency, exchange, code, KEY_COLUMN[frequency][0])[-1]
+
+    def write(self,
+              frequency: str,
+              exchange: str,
+              code: str,
+              data: typing.Union[pd.DataFrame, typing.Dict[str, np.ndarray]],
+              append: bool = True
+              ) -> int:
+        """
+        保存一只证券的行情。
+        :param frequency: 'daily', '1min' or '5min'.
+        :param exchange: 交易所代码。
+        :param code: 证券代码。
+        :param data: DataFrame 或 {列名: 数组}，须有键列并按键升序。
+        :param append: True 则只追加键晚于已保存的最后一条的记录，否则覆盖。
+        :return: 写入的记录数。
+        """
+        name, dtype = KEY_COLUMN[frequency]
+        columns = {x: np.asarray(data[x]) for x in data.keys() if x not in DERIVED_COLUMN or x == name}
+        columns[name] = columns[name].astype(dtype)
+
+        manifest = self._manifest(frequency, exchange, code)
+        if append and manifest is not None:
+            if set(columns) != set(manifest['columns']):
+                raise ValueError('Columns {} of {}{} <{}> do not match the stored columns {}.'.format(
+                    sorted(columns), exchange, code, frequency, sorted(manifest['columns'])))
+            last = self._load(manifest, frequency, exchange, code, name)[-1] if manifest['rows'] else None
+            begin = 0 if last is None else int(np.searchsorted(columns[name], last, side='right'))
+            count = len(columns[name]) - begin
+            if count == 0:
+                return 0
+            version, rows = manifest['version'], manifest['rows']
+            for x, y in columns.items():
+                stored = np.dtype(manifest['columns'][x])
+                with open(self._column_file(frequency, exchange, code, version, x), 'r+b') as f:
+                    # 截掉上次中断的写入留下的、manifest 之外的尾部。
+                    f.truncate(rows * stored.itemsize)
+                    f.seek(0, os.SEEK_END)
+                    f.write(np.ascontiguousarray(y[begin:], dtype=stored).tobytes())
+            manifest['rows'] = rows + count
+            self._save_manifest(frequency, exchange, code, manifest)
+        else:
+            count = len(columns[name])
+            if count == 0 and manifest is not None:
+                return 0
+            # 写入新版本目录，再替换 manifest 切换版本，读者不会看到没有目录或只写了一半的列。
+            version = 0 if manifest is None else manifest['version'] + 1
+            folder = os.path.join(self.path(frequency, exchange, code), str(version))
+            shutil.rmtree(folder, ignore_errors=True)
+            os.makedirs(folder)
+            for x, y in columns.items():
+                np.ascontiguousarray(y).tofile(os.path.join(folder, x + '.bin'))
+            self._save_manifest(frequency, exchange, code, {
+                'version': version,
+                'rows': count,
+                'columns': {x: y.dtype.str for x, y in columns.items()},
+            })
+            self._remove_versions(frequency, exchange, code, version)
+        logger.debug('Write {} <{}> records of {}{} into column store.'.format(count, frequency, exchange, code))
+        return count
+
+    def _remove_versions(self, frequency: str, exchange: str, code: str, current: int) -> None:
+        """
+        删除当前版本以外的版本目录；仍被映射（Windows）而删不掉的留到下次。
+        """
+        folder = self.path(frequency, exchange, code)
+        for x in os.listdir(folder):
+            if x.isdigit() and int(x) != current:
+                shutil.rmtree(os.path.join(folder, x), ignore_errors=True)
+
+    def read(self,
+             frequency: str,
+             exchange: str,
+             code: str,
+             start: typing.Optional[datetime.date] = None,
+             end: typing.Optional[datetime.date] = None,
+             columns: typing.Optional[typing.Iterable[str]] = None,
+             as_frame: bool = True
+             ) -> typing.Union[pd.DataFrame, typing.Dict[str, np.ndarray]]:
+        """
+        读取一只证券日期范围 [start, end] 内的行情。
+        :param frequency: 'daily', '1min' or '5min'.
+        :param exchange: 交易所代码。
+        :param code: 证券代码。
+        :param start: 开始日期（时间），None 表示不限。
+        :param end: 结束日期（时间，包含），None 表示不限。
+        :param columns: 要读取的列，None 则为全部。键列总会读取。
+        :param as_frame: True 返回 DataFrame，否则返回 {列名: 数组}（映射文件的只读视图）。
+        :return: pandas DataFrame or dict.
+        """
+        try:
+            return self._read(self._manifest(frequency, exchange, code), frequency, exchange, code,
+                              start, end, columns, as_frame)
+        except FileNotFoundError:
+            # 读 manifest 之后旧版本恰好被覆盖写入删除，按新的 manifest 重读一次。
+            return self._read(self._manifest(frequency, exchange, code), frequency, exchange, code,
+                              start, end, columns, as_frame)
+
+    def _read(self, manifest, frequency, exchange, code, start, end, columns, as_frame):
+        """
+        按给定的 manifest 读取，参数同 <read>。
+        """
+        if manifest is None:
+            raise FileNotFoundError('{}{} <{}> is not in column store <{}>.'.format(
+                exchange, code, frequency, self.root))
+        name, dtype = KEY_COLUMN[frequency]
+        key = self._load(manifest, frequency, exchange, code, name)
+        begin = 0 if start is None else int(np.searchsorted(key, np.datetime64(start).astype(dtype), 'left'))
+        if end is None:
+            stop = len(key)
+        elif isinstance(end, datetime.datetime):
+            stop = int(np.searchsorted(key, np.datetime64(end).astype(dtype), 'right'))
+        else:
+            # 只给日期时，上界包含当天的全部分钟。
+            stop = int(np.searchsorted(key, (np.datetime64(end, 'D') + 1).astype(dtype), 'left'))
+        stop = max(begin, stop)
+
+        wanted = sorted(manifest['columns']) if columns is None else list(columns)
+        result = {name: key[begin:stop]}
+        for column in wanted:
+            if column == name:
+                continue
+            if column in DERIVED_COLUMN:
+                date = result[name].astype('datetime64[D]')
+                result[column] = date if column == 'date' else result[name] - date
+            else:
+                result[column] = self._load(manifest, frequency, exchange, code, column)[begin:stop]
+
+        if not as_frame:
+            return result
+        import pandas as pd
+
+        return pd.DataFrame(result)
+
+    def import_tdx(self,
+                   vipdoc: typing.Optional[str] = None,
+                   frequency: str = 'daily',
+                   exchange: typing.Iterable[str] = ('sh', 'sz')
+                   ) -> int:
+        """
+        由通达信行情文件增量导入：每个文件只解码键晚于已保存的最后一条的记录。
+        :param vipdoc: vipdoc 目录，None 则为 <config.TDX_ROOT_PATH>/vipdoc。
+        :param frequency: 'daily', '1min' or '5min'.
+        :param exchange: 交易所代码。
+        :return: 写入的记录数。
+        """
+        # 日线同时保存上日收盘价，供复权使用。
+        options = {'pre_close': True} if frequency == 'daily' else {}
+        total = 0
+        for item, code, filename in find_quote_files(vipdoc, frequency, exchange):
+            reader = TDX_FILE_LAYOUT[frequency][2](filename)
+            last = self.last_key(frequency, item, code)
+            if last is None:
+                record = reader.to_numpy()
+            else:
+                # 按日期定位，同一天的分钟线由 write 过滤。
+                record = reader.records(start=last.astype('datetime64[D]').item())
+            total += self.write(frequency, item, code, reader.decode(record, **options))
+        logger.info('Import {} <{}> records into column store <{}>.'.format(total, frequency, self.root))
+        return total
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+
+"""
+Shared fixtures: a fresh database per test.
+"""
+
+import pytest
+
+import qat.database
+from qat import config
+from qat.database.reference import reference_cache
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """
+    Point <config.database_url> at a new SQLite file, drop the process-wide engine and session,
+    and empty the reference data cache.
+    """
+    monkeypatch.setattr(config, 'database_url', 'sqlite:///{}'.format(tmp_path / 'security.sqlite'))
+    monkeypatch.setattr(qat.database, '_engine', None)
+    monkeypatch.setattr(qat.database, '_session', None)
+    reference_cache.invalidate()
+    yield qat.database.get_engine()
+    qat.database.remove_session()
+    reference_cache.invalidate()
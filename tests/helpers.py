@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+"""
+Helpers shared by the tests: synthetic TDX quote records.
+"""
+
+import numpy as np
+
+from qat.datasource.tdx import DailyQuoteReader, MinuteQuoteReader
+
+
+def daily_records(dates, close, pre_close=None) -> np.ndarray:
+    """
+    Records of a TDX .day file.
+    :param dates: dates, anything np.array(..., dtype='datetime64[D]') accepts.
+    :param close: close prices in yuan.
+    :param pre_close: previous close prices in yuan, None for the previous record's close.
+    """
+    date = np.array(dates, dtype='datetime64[D]')
+    close = np.asarray(close, dtype=np.float64)
+    if pre_close is None:
+        pre_close = np.r_[close[0], close[:-1]]
+    text = np.datetime_as_string(date)
+    record = np.zeros(len(date), dtype=DailyQuoteReader('').dtype)
+    record['date'] = [int(x.replace('-', '')) for x in text]
+    record['open'] = np.round(close * 100)
+    record['high'] = np.round(close * 101)
+    record['low'] = np.round(close * 99)
+    record['close'] = np.round(close * 100)
+    record['amount'] = close * 1000.0
+    record['volume'] = 1000 + np.arange(len(date))
+    record['pre_close'] = np.round(np.asarray(pre_close, dtype=np.float64) * 100)
+    return record
+
+
+def minute_records(moments, close) -> np.ndarray:
+    """
+    Records of a TDX .lc1/.lc5 file.
+    :param moments: timestamps, anything np.array(..., dtype='datetime64[m]') accepts.
+    :param close: close prices.
+    """
+    moment = np.array(moments, dtype='datetime64[m]')
+    close = np.asarray(close, dtype=np.float64)
+    date = moment.astype('datetime64[D]')
+    year = date.astype('datetime64[Y]').astype(np.int64) + 1970
+    month = date.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    day = (date - date.astype('datetime64[M]')).astype(np.int64) + 1
+    record = np.zeros(len(moment), dtype=MinuteQuoteReader('').dtype)
+    record['date'] = (year - 2004) * 2048 + month * 100 + day
+    record['time'] = (moment - date).astype(np.int64)
+    record['open'] = close
+    record['high'] = close + 0.1
+    record['low'] = close - 0.1
+    record['close'] = close
+    record['amount'] = close * 100.0
+    record['volume'] = 100
+    return record
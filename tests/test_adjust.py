@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests of the daily quote decoding and of the price adjustment factors.
+"""
+
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from qat.datasource.tdx import DailyQuoteReader
+from qat.quote import AdjustmentFactor, AdjustmentCache
+
+from helpers import daily_records
+
+
+DATES = np.arange('2020-01-01', '2020-01-11', dtype='datetime64[D]')
+CLOSE = np.array([10.0, 10.2, 10.0, 5.1, 5.0, 6.0, 5.9, 6.1, 6.2, 6.3])
+# 2020-01-04 十送十（除权参考价 5.00），2020-01-07 每股派息 0.10（除权参考价 5.90）。
+PRE_CLOSE = np.array([10.0, 10.0, 10.2, 5.0, 5.1, 5.0, 5.9, 5.9, 6.1, 6.2])
+
+
+@pytest.fixture
+def day_file(tmp_path):
+    filename = tmp_path / 'sh600000.day'
+    daily_records(DATES, CLOSE, PRE_CLOSE).tofile(str(filename))
+    return str(filename)
+
+
+def test_daily_reader_fields(day_file):
+    reader = DailyQuoteReader(day_file)
+    first = next(reader.to_python())
+    assert len(first) == 7 and first[0] == datetime.date(2020, 1, 1)
+    frame = reader.to_pandas()
+    assert list(frame.columns) == ['date', 'open', 'high', 'low', 'close', 'amount', 'volume']
+    assert frame['date'].iloc[0] == datetime.date(2020, 1, 1)
+    frame = reader.to_pandas(date_as_object=False, pre_close=True)
+    assert frame['date'].dtype.kind == 'M'
+    assert frame['pre_close'].tolist() == pytest.approx(PRE_CLOSE.tolist())
+    assert pd.DataFrame(reader.to_python(), columns=DailyQuoteReader.FIELDS)['close'].tolist() == \
+        pytest.approx(reader.to_pandas()['close'].tolist())
+
+
+def test_ex_dates_and_factors():
+    factor = AdjustmentFactor()
+    assert factor.update(DATES, CLOSE, PRE_CLOSE) == 2
+    assert factor.ex_date.tolist() == DATES[[3, 6]].tolist()
+    assert factor.ratio.tolist() == pytest.approx([10.0 / 5.0, 6.0 / 5.9])
+    backward = factor.backward_factor(DATES)
+    assert backward.tolist() == pytest.approx([1.0] * 3 + [2.0] * 3 + [2.0 * 6.0 / 5.9] * 4)
+    # 前复权：最新的价格不变，除权日前一天的价格与除权参考价一致。
+    forward = factor.forward_factor(DATES)
+    assert forward[-1] == pytest.approx(1.0)
+    assert CLOSE[5] * forward[5] == pytest.approx(PRE_CLOSE[6] * forward[6])
+    assert CLOSE[2] * forward[2] == pytest.approx(PRE_CLOSE[3] * forward[3])
+
+
+def test_backward_and_forward_prices():
+    factor = AdjustmentFactor()
+    factor.update(DATES, CLOSE, PRE_CLOSE)
+    bars = pd.DataFrame({'date': DATES, 'close': CLOSE, 'volume': np.ones(len(DATES))})
+    backward = factor.backward(bars)
+    assert backward['close'].tolist() == pytest.approx((CLOSE * factor.backward_factor(DATES)).tolist())
+    assert backward['volume'].tolist() == [1.0] * len(DATES)
+    assert bars['close'].tolist() == CLOSE.tolist()
+    assert factor.forward(bars)['close'].iloc[-1] == pytest.approx(CLOSE[-1])
+
+
+def test_incremental_update_matches_full():
+    full = AdjustmentFactor()
+    full.update(DATES, CLOSE, PRE_CLOSE)
+    factor = AdjustmentFactor()
+    for begin in range(0, len(DATES), 3):
+        factor.update(DATES[begin:begin + 3], CLOSE[begin:begin + 3], PRE_CLOSE[begin:begin + 3])
+    # 已处理过的记录被忽略。
+    assert factor.update(DATES[:5], CLOSE[:5], PRE_CLOSE[:5]) == 0
+    assert factor.ex_date.tolist() == full.ex_date.tolist()
+    assert factor.ratio.tolist() == pytest.approx(full.ratio.tolist())
+    assert factor.last_date == DATES[-1] and factor.last_close == pytest.approx(CLOSE[-1])
+
+
+def test_missing_pre_close_is_not_an_event():
+    pre_close = PRE_CLOSE.copy()
+    pre_close[3] = 0.0
+    factor = AdjustmentFactor()
+    assert factor.update(DATES, CLOSE, pre_close) == 1
+    assert factor.ex_date.tolist() == DATES[[6]].tolist()
+
+
+def test_cache_update_tdx(tmp_path):
+    folder = tmp_path / 'vipdoc' / 'sh' / 'lday'
+    folder.mkdir(parents=True)
+    record = daily_records(DATES, CLOSE, PRE_CLOSE)
+    record[:5].tofile(str(folder / 'sh600000.day'))
+    cache = AdjustmentCache(str(tmp_path / 'factor'))
+    assert cache.update_tdx(str(tmp_path / 'vipdoc'), ('sh',)) == 1
+    record.tofile(str(folder / 'sh600000.day'))
+    assert cache.update_tdx(str(tmp_path / 'vipdoc'), ('sh',)) == 1
+
+    # 由保存的文件重新加载，结果与一次处理全部数据相同。
+    factor = AdjustmentCache(str(tmp_path / 'factor')).get('sh', '600000')
+    assert factor.ex_date.tolist() == DATES[[3, 6]].tolist()
+    assert factor.ratio.tolist() == pytest.approx([10.0 / 5.0, 6.0 / 5.9])
+    cache.invalidate('sh', '600000')
+    assert len(AdjustmentCache(str(tmp_path / 'factor')).get('sh', '600000')) == 0
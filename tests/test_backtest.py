@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests of the vectorized backtest: NAV, costs, price limits and T+1.
+"""
+
+import numpy as np
+import pytest
+
+from qat.backtest import BacktestResult, backtest, sweep
+from qat.quote import Panel
+
+
+def matrix(value) -> np.ndarray:
+    # 一维数组为一只证券。
+    value = np.asarray(value, dtype=np.float64)
+    return value[:, None] if value.ndim == 1 else value
+
+
+def make_panel(dates, open_, close, **fields) -> Panel:
+    data = {'open': matrix(open_), 'close': matrix(close)}
+    data.update({x: matrix(y) for x, y in fields.items()})
+    return Panel(np.asarray(dates), np.array(['sh{:06d}'.format(x) for x in range(data['close'].shape[1])]), data)
+
+
+DATES = np.arange('2020-01-02', '2020-01-08', dtype='datetime64[D]')
+
+
+def test_nav_follows_the_close():
+    close = np.array([10.0, 10.0, 10.5, 10.2, 10.8, 11.0])
+    panel = make_panel(DATES, close, close)
+    result = backtest(panel, np.ones((6, 1)), commission=0.0, stamp_tax=0.0, capital=1000.0)
+    # 第 0 根收盘后决定满仓，第 1 根以开盘价买入。
+    assert result.nav.tolist() == pytest.approx([1000.0, 1000.0, 1050.0, 1020.0, 1080.0, 1100.0])
+    assert result.returns[0] == 0.0 and result.returns[2] == pytest.approx(0.05)
+    assert result.total_return == pytest.approx(0.1)
+    summary = result.summary()
+    assert summary['total_return'] == pytest.approx(0.1)
+    assert summary['max_drawdown'] == pytest.approx(1.0 - 1020.0 / 1050.0)
+    assert summary['cost'] == 0.0
+
+
+def test_commission_and_stamp_tax():
+    price = np.full(6, 10.0)
+    weights = np.array([1.0, 1.0, 0.0, 0.0, 0.0, 0.0])[:, None]
+    result = backtest(make_panel(DATES, price, price), weights, commission=0.001, stamp_tax=0.001, capital=1000.0)
+    # 买入时现金不足以支付佣金，按比例缩减买单。
+    bought = 1000.0 / 1.001
+    assert result.cost[1] == pytest.approx(bought * 0.001)
+    assert result.cost[3] == pytest.approx(bought * 0.002)
+    assert result.nav[-1] == pytest.approx(bought * 0.998)
+    assert result.summary()['cost'] == pytest.approx(result.cost.sum())
+
+
+def test_price_limits():
+    # 第 1 根开盘涨停不能买入，第 2 根打开后买入；第 4 根开盘跌停不能卖出，第 5 根卖出。
+    open_ = np.array([10.0, 11.0, 10.8, 10.5, 9.45, 9.5])
+    close = np.array([10.0, 10.8, 10.5, 10.5, 9.5, 9.5])
+    weights = np.array([1.0, 1.0, 1.0, 0.0, 0.0, 0.0])[:, None]
+    result = backtest(make_panel(DATES, open_, close), weights, commission=0.0, stamp_tax=0.0,
+                      capital=1080.0, record_positions=True)
+    assert result.positions[:, 0].tolist() == pytest.approx([0.0, 0.0, 100.0, 100.0, 100.0, 0.0])
+    # 涨跌停幅度为 20% 时同样的价格可以成交。
+    result = backtest(make_panel(DATES, open_, close), weights, commission=0.0, stamp_tax=0.0,
+                      limit=0.2, capital=1100.0, record_positions=True)
+    assert result.positions[:, 0].tolist() == pytest.approx([0.0, 100.0, 100.0, 100.0, 0.0, 0.0])
+
+
+def test_pre_close_and_suspension():
+    open_ = np.array([10.0, 5.5, 5.5, 5.5, 5.5, 5.5])
+    close = np.array([10.0, 5.5, 5.5, 5.5, 5.5, 5.5])
+    # 第 1 根是除权日，除权参考价 5.00，5.50 是涨停价；第 2 根停牌（成交量为 0）。
+    pre_close = np.array([10.0, 5.0, 5.5, 5.5, 5.5, 5.5])
+    volume = np.array([1.0, 1.0, 0.0, 1.0, 1.0, 1.0])
+    panel = make_panel(DATES, open_, close, pre_close=pre_close, volume=volume)
+    result = backtest(panel, np.ones((6, 1)), commission=0.0, stamp_tax=0.0, capital=550.0, record_positions=True)
+    assert result.positions[:, 0].tolist() == pytest.approx([0.0, 0.0, 0.0, 100.0, 100.0, 100.0])
+
+
+def test_t_plus_one_on_minute_bars():
+    moment = np.array(['2020-01-02T09:31', '2020-01-02T09:32', '2020-01-02T09:33',
+                       '2020-01-03T09:31', '2020-01-03T09:32'], dtype='datetime64[m]')
+    price = np.full(5, 10.0)
+    weights = np.array([1.0, 0.0, 0.0, 0.0, 0.0])[:, None]
+    result = backtest(make_panel(moment, price, price), weights, commission=0.0, stamp_tax=0.0,
+                      capital=1000.0, record_positions=True)
+    # 当日买入的股份当日不能卖出，次日第一根才卖出。
+    assert result.positions[:, 0].tolist() == pytest.approx([0.0, 100.0, 100.0, 0.0, 0.0])
+
+
+def test_empty_result():
+    panel = make_panel(DATES[:0], np.zeros((0, 1)), np.zeros((0, 1)))
+    result = backtest(panel, np.zeros((0, 1)))
+    assert len(result.nav) == 0 and len(result.returns) == 0
+    assert np.isnan(result.total_return)
+    assert 'nan' in repr(result)
+    summary = BacktestResult(DATES[:0], np.zeros(0), np.zeros(0), np.zeros(0)).summary()
+    assert np.isnan(summary['total_return']) and np.isnan(summary['sharpe']) and summary['cost'] == 0.0
+
+
+def hold(panel, weight):
+    return np.full(panel.shape, weight)
+
+
+def test_sweep_matches_backtest():
+    rng = np.random.default_rng(0)
+    close = 10.0 * np.cumprod(1.0 + rng.normal(0.0, 0.01, (6, 3)), axis=0)
+    panel = make_panel(DATES, close, close)
+    results = sweep(hold, [{'weight': 0.1}, {'weight': 0.3}], panel, workers=1)
+    assert [x.parameters for x in results] == [{'weight': 0.1}, {'weight': 0.3}]
+    np.testing.assert_allclose(results[1].nav, backtest(panel, hold(panel, 0.3)).nav)
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests of the seeding of the basic tables.
+"""
+
+import pytest
+
+from qat.database import session_scope, create_all_tables
+from qat.database.model import (Currency, Location, Exchange, Board, SecurityStatus,
+                                IndustryNBS, IndustryCSRC, IndustryCSIC)
+from qat.data_source import basic
+
+
+MODELS = [Currency, Location, Exchange, Board, SecurityStatus, IndustryNBS, IndustryCSRC, IndustryCSIC]
+
+
+def seed() -> None:
+    basic.initialize_table_currency()
+    basic.initialize_table_location()
+    basic.initialize_table_exchange()
+    basic.initialize_table_board()
+    basic.initialize_table_security_status()
+    basic.initialize_table_industry_csrc()
+    basic.initialize_table_industry_nbs()
+    basic.initialize_table_industry_csic()
+
+
+@pytest.fixture
+def seeded(database):
+    create_all_tables()
+    seed()
+    return database
+
+
+def counts() -> dict:
+    with session_scope() as db_session:
+        return {x: db_session.query(x).count() for x in MODELS}
+
+
+def test_seed_twice(seeded):
+    before = counts()
+    assert all(before.values())
+    assert before[Currency] == 8 and before[Board] == 8
+    seed()
+    assert counts() == before
+    with session_scope() as db_session:
+        board = db_session.query(Board).filter(Board.name == '科创板').one()
+        assert board.exchange.abbr_en == 'SSE' and board.currency.abbr == 'CNY'
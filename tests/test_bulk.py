@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests of the bulk insert on SQLite.
+"""
+
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import Column, Date, Float, Integer, MetaData, Table, Time, select
+from sqlalchemy.exc import IntegrityError
+
+from qat.database import bulk_insert
+
+
+@pytest.fixture
+def table(database):
+    table = Table('bulk_quote', MetaData(),
+                  Column('id', Integer, primary_key=True),
+                  Column('date', Date),
+                  Column('time', Time),
+                  Column('close', Float))
+    table.create(database)
+    return table
+
+
+def rows(count: int, first: int = 1) -> dict:
+    return {'id': np.arange(first, first + count),
+            'date': np.datetime64('2020-01-02') + np.arange(count),
+            'close': np.arange(count) + 10.0}
+
+
+def count(database, table) -> int:
+    return len(database.execute(select([table.c.id])).fetchall())
+
+
+def test_chunks_not_a_multiple_of_the_size(database, table):
+    assert bulk_insert(table, rows(7), chunk_size=3) == 7
+    assert count(database, table) == 7
+    assert [x[0] for x in database.execute(select([table.c.id]).order_by(table.c.id))] == list(range(1, 8))
+    # 多余的列被忽略。
+    assert bulk_insert(table, dict(rows(2, 8), volume=np.ones(2)), chunk_size=3) == 2
+    assert count(database, table) == 9
+
+
+def test_commit_every(database, table):
+    data = rows(7)
+    # 最后一批与第一批主键冲突。
+    data['id'][-1] = 1
+    with pytest.raises(IntegrityError):
+        bulk_insert(table, data, chunk_size=2)
+    # 全部批次在同一事务中，一起回滚。
+    assert count(database, table) == 0
+    with pytest.raises(IntegrityError):
+        bulk_insert(table, data, chunk_size=2, commit_every=2)
+    # 每两批提交一次：前两批已提交，未提交的第三批与出错的第四批回滚。
+    assert count(database, table) == 4
+
+
+def test_commit_every_is_ignored_on_a_connection(database, table):
+    with database.connect() as connection:
+        transaction = connection.begin()
+        bulk_insert(table, rows(5), chunk_size=2, commit_every=1, bind=connection)
+        transaction.rollback()
+    assert count(database, table) == 0
+
+
+def test_date_and_time_conversion(database, table):
+    data = rows(3)
+    data['time'] = np.array([571, 690, 900], dtype='timedelta64[m]')
+    frame = pd.DataFrame(data)
+    assert bulk_insert(table, frame) == 3
+    result = database.execute(select([table.c.date, table.c.time]).order_by(table.c.id)).fetchall()
+    assert [x[0] for x in result] == [datetime.date(2020, 1, 2), datetime.date(2020, 1, 3), datetime.date(2020, 1, 4)]
+    assert [x[1] for x in result] == [datetime.time(9, 31), datetime.time(11, 30), datetime.time(15, 0)]
+    # 结构化数组同样按列转换。
+    record = np.zeros(1, dtype=[('id', np.int64), ('date', 'datetime64[D]'), ('close', np.float64)])
+    record[0] = (4, np.datetime64('2020-01-06'), 11.0)
+    assert bulk_insert(table, record) == 1
+    assert database.execute(select([table.c.date]).where(table.c.id == 4)).scalar() == datetime.date(2020, 1, 6)
+
+
+def test_empty_input(database, table):
+    assert bulk_insert(table, rows(0)) == 0
+    assert bulk_insert(table, {}) == 0
+    assert bulk_insert(table, pd.DataFrame({'id': [], 'close': []})) == 0
+    assert count(database, table) == 0
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests of the trading calendar and of the union of trading dates.
+"""
+
+import numpy as np
+import pytest
+
+from qat.datasource.tdx import read_trading_dates
+from qat.quote import TradingCalendar, union_dates
+
+from helpers import daily_records
+
+
+# 2020-01-01 元旦休市；01-04、01-05 为周末。
+SESSIONS = np.array(['2019-12-30', '2019-12-31', '2020-01-02', '2020-01-03', '2020-01-06'], dtype='datetime64[D]')
+
+
+@pytest.fixture
+def calendar():
+    return TradingCalendar(SESSIONS[::-1].tolist() + [SESSIONS[0]])
+
+
+def test_is_session(calendar):
+    assert len(calendar) == 5
+    assert calendar.first == SESSIONS[0] and calendar.last == SESSIONS[-1]
+    assert '2020-01-02' in calendar
+    assert '2020-01-01' not in calendar
+    # 日历范围之外。
+    assert '2019-01-02' not in calendar and '2021-01-04' not in calendar
+    dates = np.arange('2019-12-29', '2020-01-08', dtype='datetime64[D]')
+    assert calendar.is_session(dates).tolist() == np.isin(dates, SESSIONS).tolist()
+
+
+def test_count(calendar):
+    assert calendar.count('2019-12-30', '2020-01-06') == 5
+    assert calendar.count('2020-01-01', '2020-01-01') == 0
+    assert calendar.count('2020-01-01', '2020-01-05') == 2
+    assert calendar.count('2019-01-01', '2021-01-01') == 5
+    assert calendar.count(np.array(['2019-12-31', '2020-01-03'], dtype='datetime64[D]'), '2020-01-06').tolist() == [4, 2]
+
+
+def test_sessions_in_range(calendar):
+    assert calendar.sessions_in_range('2020-01-01', '2020-01-05').tolist() == SESSIONS[2:4].tolist()
+    assert calendar.sessions_in_range(end='2019-12-31').tolist() == SESSIONS[:2].tolist()
+    assert calendar.sessions_in_range().tolist() == SESSIONS.tolist()
+
+
+def test_offset(calendar):
+    assert calendar.offset('2019-12-31', 1) == SESSIONS[2]
+    assert calendar.offset('2020-01-02', -1) == SESSIONS[1]
+    assert calendar.offset('2020-01-02', 0) == SESSIONS[2]
+    # 非交易日本身不计入。
+    assert calendar.next_session('2020-01-04') == SESSIONS[4]
+    assert calendar.previous_session('2020-01-04') == SESSIONS[3]
+    assert calendar.offset('2020-01-01', 2) == SESSIONS[3]
+    assert calendar.offset(SESSIONS[:3], 2).tolist() == SESSIONS[2:].tolist()
+    with pytest.raises(KeyError):
+        calendar.offset('2020-01-01', 0)
+    with pytest.raises(IndexError):
+        calendar.offset('2020-01-03', 2)
+    with pytest.raises(IndexError):
+        calendar.offset('2019-12-30', -1)
+
+
+def test_missing_and_union(calendar):
+    assert calendar.missing(SESSIONS[[0, 2, 4]]).tolist() == SESSIONS[[1, 3]].tolist()
+    assert calendar.missing(SESSIONS[[2]], start='2019-12-31').tolist() == SESSIONS[[1]].tolist()
+    assert len(calendar.missing(SESSIONS[:0])) == 0
+    merged = calendar.union(np.array(['2020-01-06', '2020-01-07'], dtype='datetime64[D]'))
+    assert len(merged) == 6 and merged.last == np.datetime64('2020-01-07')
+    assert merged.offset('2020-01-06', 1) == np.datetime64('2020-01-07')
+
+
+def test_union_dates_beyond_the_epoch_range():
+    dates = [np.array(['2020-01-02', '2020-01-03'], dtype='datetime64[D]'),
+             np.array([], dtype='datetime64[D]'),
+             np.array(['1969-12-31', '2020-01-02'], dtype='datetime64[D]'),
+             np.array(['2101-01-03'], dtype='datetime64[D]')]
+    assert union_dates(dates).tolist() == np.unique(np.concatenate(dates)).tolist()
+    assert union_dates([]).dtype == np.dtype('datetime64[D]') and len(union_dates([])) == 0
+
+
+def test_read_trading_dates(tmp_path):
+    folder = tmp_path / 'sh' / 'lday'
+    folder.mkdir(parents=True)
+    daily_records(SESSIONS[:3], [10, 11, 12]).tofile(str(folder / 'sh600000.day'))
+    daily_records(SESSIONS[2:], [10, 11, 12]).tofile(str(folder / 'sh600004.day'))
+    (folder / 'sh600005.day').write_bytes(b'')
+    assert read_trading_dates(str(tmp_path), 'sh').tolist() == SESSIONS.tolist()
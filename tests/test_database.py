@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests of the table helpers and of the reference data cache under concurrent use.
+"""
+
+import threading
+
+import pytest
+
+import qat.config
+import qat.database
+from qat.database import (session_scope, create_all_tables, drop_all_tables, drop_table, create_table,
+                          get_table_instance, is_table_exist)
+from qat.database.model import Exchange, Location, QuoteSyncState
+from qat.database.reference import ReferenceCache, reference_cache
+
+
+def run_threads(target, count: int = 8) -> list:
+    """
+    Run <target> in <count> threads started together, return the results, re-raise the first error.
+    """
+    barrier = threading.Barrier(count)
+    result = [None] * count
+    error = []
+
+    def run(index):
+        barrier.wait()
+        try:
+            result[index] = target()
+        except Exception as e:
+            error.append(e)
+
+    threads = [threading.Thread(target=run, args=(x,)) for x in range(count)]
+    for item in threads:
+        item.start()
+    for item in threads:
+        item.join()
+    if error:
+        raise error[0]
+    return result
+
+
+@pytest.fixture
+def exchanges(database):
+    create_table(Exchange)
+    with session_scope(write=True) as db_session:
+        db_session.add_all([Exchange(name_zh='上海证券交易所', abbr_en='SSE'),
+                            Exchange(name_zh='深圳证券交易所', abbr_en='SZSE')])
+    return database
+
+
+def test_create_and_drop_tables(database):
+    create_all_tables()
+    assert is_table_exist(QuoteSyncState)
+    drop_table(QuoteSyncState)
+    assert not is_table_exist(QuoteSyncState)
+    assert 'quote_sync_state' not in database.table_names()
+    drop_all_tables()
+    assert database.table_names() == []
+
+
+def test_table_names_follow_the_database(database, tmp_path, monkeypatch):
+    create_table(QuoteSyncState)
+    assert is_table_exist(QuoteSyncState)
+    monkeypatch.setattr(qat.config, 'database_url', 'sqlite:///{}'.format(tmp_path / 'other.sqlite'))
+    monkeypatch.setattr(qat.database, '_engine', None)
+    assert not is_table_exist(QuoteSyncState)
+    create_table(QuoteSyncState)
+    drop_table(QuoteSyncState)
+    assert not is_table_exist(QuoteSyncState)
+    # 回到原来的数据库，其中的表不受影响。
+    monkeypatch.setattr(qat.config, 'database_url', str(database.url))
+    monkeypatch.setattr(qat.database, '_engine', None)
+    assert is_table_exist(QuoteSyncState)
+
+
+def test_concurrent_reflection(database):
+    database.execute('CREATE TABLE extra (id INTEGER PRIMARY KEY, name TEXT)')
+    tables = run_threads(lambda: get_table_instance('extra'))
+    assert all(x is tables[0] for x in tables)
+    assert list(tables[0].c.keys()) == ['id', 'name']
+    drop_table('extra')
+    assert 'extra' not in qat.database.db_metadata.tables
+
+
+def test_reference_cache_loads_once(exchanges, monkeypatch):
+    queries = []
+    query = ReferenceCache._query
+
+    def counted(self, model):
+        queries.append(model)
+        return query(self, model)
+
+    monkeypatch.setattr(ReferenceCache, '_query', counted)
+    ids = run_threads(lambda: (reference_cache.resolve(Exchange, 'SSE'), reference_cache.get_by_id(Exchange, 2)))
+    assert queries == [Exchange]
+    assert {x[0] for x in ids} == {1} and {x[1].abbr_en for x in ids} == {'SZSE'}
+    # 加载使用自己的会话，不留下线程范围的会话。
+    assert qat.database._session is None or not qat.database._session.registry.has()
+
+
+def test_reference_cache_invalidate_while_reading(exchanges):
+    cache = ReferenceCache()
+
+    def read():
+        for _ in range(50):
+            cache.invalidate(Exchange)
+            assert cache.resolve(Exchange, 'SZSE') == 2
+            assert cache.get_by_id(Exchange, 1).abbr_en == 'SSE'
+
+    run_threads(read, 4)
+    with pytest.raises(KeyError):
+        cache.resolve(Exchange, 'HKEX')
+
+
+def test_reference_cache_skips_null_and_duplicate_keys(database):
+    create_table(Location)
+    with session_scope(write=True) as db_session:
+        db_session.add_all([Location(code='310000', name='上海'),
+                            Location(code=None, name='未知'),
+                            Location(code=None, name='境外'),
+                            Location(code='310000', name='上海（重复）')])
+    cache = ReferenceCache()
+    assert list(cache.load(Location)) == ['310000']
+    assert cache.get(Location, '310000').name == '上海'
+    # 没有自然键的记录仍可按 id 取得。
+    assert [cache.get_by_id(Location, x).name for x in (2, 3, 4)] == ['未知', '境外', '上海（重复）']
+    with pytest.raises(KeyError):
+        cache.resolve(Location, None)
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests of the derived quote columns.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from qat.quote.derive import derive_quote_columns, DERIVED_COLUMNS
+
+
+def bars(close, **columns) -> pd.DataFrame:
+    close = np.asarray(close, dtype=np.float64)
+    return pd.DataFrame(dict({'high': close + 0.5, 'low': close - 0.5, 'close': close}, **columns))
+
+
+def test_first_row_without_last_close():
+    frame = derive_quote_columns(bars([10.0, 10.5, 10.0]))
+    assert list(frame.columns[-4:]) == list(DERIVED_COLUMNS)
+    assert frame.loc[0, DERIVED_COLUMNS].isna().all()
+    assert frame['pre_close'].tolist()[1:] == [10.0, 10.5]
+    assert frame['change'].tolist()[1:] == pytest.approx([0.5, -0.5])
+    # 涨跌幅与振幅是比值，不乘 100。
+    assert frame['change_percent'].tolist()[1:] == pytest.approx([0.05, -0.5 / 10.5])
+    assert frame['amplitude'].tolist()[1:] == pytest.approx([0.1, 1.0 / 10.5])
+
+
+def test_first_row_with_last_close():
+    frame = derive_quote_columns(bars([10.5, 10.0]), last_close=10.0)
+    assert frame['pre_close'].tolist() == [10.0, 10.5]
+    assert frame['change_percent'].tolist() == pytest.approx([0.05, -0.5 / 10.5])
+    # 与整批一起计算的结果相同。
+    whole = derive_quote_columns(bars([10.0, 10.5, 10.0]))
+    np.testing.assert_allclose(frame[list(DERIVED_COLUMNS)].values, whole[list(DERIVED_COLUMNS)].values[1:])
+
+
+def test_zero_or_nan_previous_close():
+    frame = derive_quote_columns(bars([0.0, 10.0, np.nan, 10.0]), last_close=0.0)
+    assert frame['pre_close'].tolist()[:2] == [0.0, 0.0]
+    assert frame['change'].tolist()[1] == 10.0
+    # 前收盘为 0 或 NaN 时不计算涨跌幅与振幅。
+    assert np.isnan(frame['change_percent'].values).all()
+    assert np.isnan(frame['amplitude'].values).all()
+
+
+def test_given_pre_close():
+    # 除权日用数据自带的前收盘；为 0 或 NaN 时用上一条的收盘价。
+    frame = derive_quote_columns(bars([10.0, 5.5, 5.6, 5.7], pre_close=[0.0, 5.0, 0.0, np.nan]))
+    assert frame['pre_close'].tolist() == [pytest.approx(np.nan, nan_ok=True), 5.0, 5.5, 5.6]
+    assert frame['change_percent'].tolist()[1:] == pytest.approx([0.1, 0.1 / 5.5, 0.1 / 5.6])
+
+
+def test_empty_input():
+    frame = derive_quote_columns(bars([]), last_close=10.0)
+    assert len(frame) == 0 and set(DERIVED_COLUMNS) <= set(frame.columns)
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests of the asynchronous fetcher, against a local stand-in HTTP server.
+"""
+
+import asyncio
+import http.server
+import json
+import threading
+import time
+
+import pytest
+
+from qat.data_source.fetch import AsyncFetcher, FetchError, TokenBucket
+from qat.data_source.tushare import sync_tushare_daily
+
+
+LATENCY = 0.1
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    """
+    /ok: answers after <LATENCY>; /flaky/<n>: 503 for the first n hits; /missing: 404;
+    /tushare: a stand-in of the TuShare daily API, code 999999 is unknown.
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits[self.path] = server.hits.get(self.path, 0) + 1
+            hits = server.hits[self.path]
+        if self.path == '/ok':
+            time.sleep(LATENCY)
+            self._reply(200, {'ok': True})
+        elif self.path.startswith('/flaky/'):
+            self._reply(503 if hits <= int(self.path.split('/')[-1]) else 200, {'hits': hits})
+        else:
+            self._reply(404, {})
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with self.server.lock:
+            self.server.requests.append(payload)
+        params = payload['params']
+        if params['ts_code'].startswith('999999'):
+            self._reply(200, {'code': 40101, 'msg': 'invalid ts_code', 'data': None})
+            return
+        start = params.get('start_date', '20200101')
+        items = [[params['ts_code'], x, 10.0, 11.0, 9.5, 10.5, 10.0, 0.5, 5.0, 1234.0, 5678.0]
+                 for x in ('20200103', '20200102') if x >= start]
+        self._reply(200, {'code': 0, 'msg': '', 'data': {
+            'fields': ['ts_code', 'trade_date', 'open', 'high', 'low', 'close', 'pre_close',
+                       'change', 'pct_chg', 'vol', 'amount'],
+            'items': items}})
+
+
+class Server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    # 默认的监听队列只有 5，并发连接多时会被丢弃后重连。
+    request_queue_size = 64
+
+
+@pytest.fixture(scope='module')
+def server():
+    instance = Server(('127.0.0.1', 0), Handler)
+    instance.lock = threading.Lock()
+    instance.hits = {}
+    instance.requests = []
+    thread = threading.Thread(target=instance.serve_forever, daemon=True)
+    thread.start()
+    yield instance
+    instance.shutdown()
+    instance.server_close()
+
+
+def url_of(server, path: str) -> str:
+    return 'http://127.0.0.1:{}{}'.format(server.server_address[1], path)
+
+
+async def fetch_all(fetcher: AsyncFetcher, urls: list) -> list:
+    async with fetcher:
+        return await asyncio.gather(*[fetcher.request_json(x) for x in urls])
+
+
+def test_concurrent_requests_overlap(server):
+    begin = time.monotonic()
+    result = asyncio.run(fetch_all(AsyncFetcher(concurrency=20), [url_of(server, '/ok')] * 40))
+    elapsed = time.monotonic() - begin
+    assert result == [{'ok': True}] * 40
+    # 串行需要 40 * LATENCY = 4 秒。
+    assert elapsed < 40 * LATENCY / 4
+
+
+def test_retry_with_backoff(server):
+    fetcher = AsyncFetcher(retry_times=3, retry_interval=0.01)
+    assert fetcher.delay(0) == 0.01 and fetcher.delay(2) == 0.04
+    assert asyncio.run(fetch_all(fetcher, [url_of(server, '/flaky/2')])) == [{'hits': 3}]
+
+
+def test_retry_exhausted(server):
+    with pytest.raises(FetchError) as error:
+        asyncio.run(fetch_all(AsyncFetcher(retry_times=1, retry_interval=0.01), [url_of(server, '/flaky/5')]))
+    assert error.value.retryable
+    assert server.hits['/flaky/5'] == 2
+
+
+def test_no_retry_on_client_error(server):
+    with pytest.raises(FetchError):
+        asyncio.run(fetch_all(AsyncFetcher(retry_times=3, retry_interval=0.01), [url_of(server, '/missing')]))
+    assert server.hits['/missing'] == 1
+
+
+def test_retry_time_is_capped(server):
+    begin = time.monotonic()
+    with pytest.raises(FetchError):
+        asyncio.run(fetch_all(AsyncFetcher(retry_times=30, retry_interval=0.05, max_retry_time=0.3),
+                              [url_of(server, '/flaky/100')]))
+    # 0.05 + 0.1 之后，再等 0.2 秒就会超过 0.3 秒，不再重试。
+    assert time.monotonic() - begin < 1.0
+    assert server.hits['/flaky/100'] == 3
+
+
+def test_reuse_in_another_event_loop(server):
+    fetcher = AsyncFetcher(concurrency=2, rate=1000.0)
+    for _ in range(2):
+        assert asyncio.run(fetch_all(fetcher, [url_of(server, '/ok')] * 4)) == [{'ok': True}] * 4
+        assert fetcher._executor is None and fetcher._semaphore is None
+
+    async def without_close():
+        return await asyncio.gather(*[fetcher.request_json(url_of(server, '/ok')) for _ in range(4)])
+
+    # 不关闭而换一个事件循环，信号量和令牌桶的锁也随之重建。
+    for _ in range(2):
+        assert asyncio.run(without_close()) == [{'ok': True}] * 4
+    fetcher.close()
+
+
+def test_token_bucket():
+    async def run():
+        bucket = TokenBucket(rate=20.0, capacity=1.0)
+        for _ in range(11):
+            await bucket.acquire()
+
+    begin = time.monotonic()
+    asyncio.run(run())
+    # 第一个令牌立即可得，其余 10 个每 0.05 秒一个。
+    assert time.monotonic() - begin >= 0.45
+
+
+def test_sync_tushare_daily(server, database):
+    securities = [('sh', '600000'), ('sz', '000001')]
+
+    assert sync_tushare_daily(securities, url=url_of(server, '/tushare'), token='t') == 4
+    rows = database.execute(
+        'SELECT date, volume, amount, change_percent FROM quote_sh_stock_600000_daily ORDER BY date').fetchall()
+    assert [x[0] for x in rows] == ['2020-01-02', '2020-01-03']
+    assert rows[0][1:] == (123400.0, 5678000.0, pytest.approx(0.05))
+
+    # 再次同步只请求表中最后一个日期之后的行情。
+    assert sync_tushare_daily(securities, url=url_of(server, '/tushare'), token='t') == 0
+    assert all(x['params']['start_date'] == '20200104' for x in server.requests[-2:])
+
+
+def test_sync_tushare_daily_skips_failed_securities(server, database, caplog):
+    securities = [('sh', '999999'), ('sh', '600000'), ('sz', '999999')]
+    assert sync_tushare_daily(securities, url=url_of(server, '/tushare'), token='t') == 2
+    assert 'Failed to import 2 of 3 securities from TuShare: sh999999, sz999999.' in caplog.text
+    assert len(database.execute('SELECT * FROM quote_sh_stock_600000_daily').fetchall()) == 2
+
+    # 连接不上，重试用尽时整批中止。
+    with pytest.raises(FetchError):
+        sync_tushare_daily(securities[1:2], url='http://127.0.0.1:1/tushare', token='t',
+                           retry_times=1, retry_interval=0.01)
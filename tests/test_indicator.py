@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests of the technical indicators: batch against incremental, the block closed-form EMA, warm-up.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from qat.quote.indicator import ema, _rolling, MA, EMA, MACD, RSI, KDJ, BOLL, ATR, OBV
+
+
+def make_bars(count: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 10.0 * np.cumprod(1.0 + rng.normal(0.0, 0.02, count))
+    # 有平盘的 K 线，检验 RSI、OBV 在没有涨跌时的取值。
+    close[5:8] = close[4:5]
+    spread = np.abs(rng.normal(0.0, 0.01, (2, count))) * close
+    return pd.DataFrame({'high': close + spread[0], 'low': close - spread[1], 'close': close,
+                         'volume': rng.integers(1000, 100000, count).astype(np.float64)})
+
+
+# 指标, 预热期（前若干个值为 NaN）。
+INDICATORS = [(lambda: MA(5), 4),
+              (lambda: EMA(12), 0),
+              (lambda: MACD(), 0),
+              (lambda: RSI(6), 0),
+              (lambda: KDJ(), 0),
+              (lambda: BOLL(20), 19),
+              (lambda: ATR(14), 13),
+              (lambda: OBV(), 0)]
+
+
+def naive_ema(x, alpha, initial=None) -> np.ndarray:
+    result = np.empty(len(x))
+    previous = x[0] if initial is None else initial
+    for index, value in enumerate(x):
+        previous = alpha * value + (1.0 - alpha) * previous
+        result[index] = previous
+    return result
+
+
+@pytest.mark.parametrize('factory, warm_up', INDICATORS)
+def test_compute_matches_update(factory, warm_up):
+    bars = make_bars(300)
+    expected = factory().compute(bars)
+    indicator = factory()
+    result = pd.DataFrame([indicator.update(x) for _, x in bars.iterrows()])
+    assert list(expected.columns) == list(indicator.columns) == list(result.columns)
+    np.testing.assert_allclose(result.values, expected.values, rtol=1e-9, atol=1e-9)
+
+    # compute 之后接着 update，与整段 compute 相同。
+    indicator = factory()
+    indicator.compute(bars.iloc[:200])
+    result = pd.DataFrame([indicator.update(x) for _, x in bars.iloc[200:].iterrows()], index=bars.index[200:])
+    np.testing.assert_allclose(result.values, expected.values[200:], rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize('factory, warm_up', INDICATORS)
+def test_warm_up(factory, warm_up):
+    result = factory().compute(make_bars(50)).values
+    assert np.isnan(result[:warm_up]).all()
+    assert not np.isnan(result[warm_up:]).any()
+    # 数据不足一个周期时全部为 NaN（有预热期的指标）。
+    short = factory().compute(make_bars(3)).values
+    assert np.isnan(short).all() if warm_up >= 3 else not np.isnan(short).any()
+    assert len(factory().compute(make_bars(50).iloc[:0])) == 0
+
+
+@pytest.mark.parametrize('alpha', [2.0 / 13, 0.5, 2.0 / 3, 0.999])
+def test_block_ema_matches_recursion(alpha):
+    # 分块大小与 <ema> 中的相同，长度覆盖块的边界前后与非整数倍。
+    block = max(1, int(230.0 / -np.log(1.0 - alpha)))
+    x = make_bars(3 * block + 7, seed=1)['close'].values
+    for length in (1, block - 1, block, block + 1, 2 * block, len(x)):
+        np.testing.assert_allclose(ema(x[:length], alpha=alpha), naive_ema(x[:length], alpha), rtol=1e-10)
+        np.testing.assert_allclose(ema(x[:length], alpha=alpha, initial=50.0),
+                                   naive_ema(x[:length], alpha, initial=50.0), rtol=1e-10)
+    np.testing.assert_allclose(ema(x, 12), naive_ema(x, 2.0 / 13), rtol=1e-10)
+    assert len(ema(x[:0], alpha=alpha)) == 0
+
+
+def test_ema_without_smoothing():
+    x = np.array([1.0, 3.0, 2.0])
+    assert ema(x, alpha=1.0).tolist() == x.tolist()
+
+
+@pytest.mark.parametrize('n', [1, 3, 7])
+def test_rolling_extrema(n):
+    x = make_bars(50, seed=2)['close'].values
+    for length in (0, 1, n - 1, n, 2 * n + 1, len(x)):
+        expected = [x[max(0, y - n + 1):y + 1].max() for y in range(length)]
+        assert _rolling(x[:length], n, np.maximum).tolist() == expected
+        expected = [x[max(0, y - n + 1):y + 1].min() for y in range(length)]
+        assert _rolling(x[:length], n, np.minimum).tolist() == expected
+
+
+def test_ma_update_does_not_drift():
+    # 价格在长序列上涨跌多个数量级，滚动的和累积的舍入误差相对于当前的均值会越来越大。
+    x = 100.0 * np.cumprod(1.0 + np.random.default_rng(3).normal(0.0, 0.02, 20000))
+    indicator = MA(20)
+    error = 0.0
+    for index, value in enumerate(x):
+        result = indicator.update({'close': value})['ma']
+        if index >= 19:
+            exact = math.fsum(x[index - 19:index + 1]) / 20
+            error = max(error, abs(result - exact) / exact)
+    assert error < 1e-14
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests of the industry classification tree and of its nested-set numbering in the database.
+"""
+
+import pytest
+
+from qat.database import session_scope, create_all_tables
+from qat.database.model import IndustryCSRC, IndustryNBS
+from qat.data_source import basic
+from qat.data_source.industry import IndustryTree
+
+
+# 代码带层级；B 没有下级，C2 在 C1 的下级之后出现，检验按前缀而不是按相邻关系找上级。
+ITEMS = [{'code': 'A', 'name_zh': '农业'},
+         {'code': 'A1', 'name_zh': '种植'},
+         {'code': 'A11', 'name_zh': '谷物'},
+         {'code': 'A12', 'name_zh': '蔬菜'},
+         {'code': 'A2', 'name_zh': '林业'},
+         {'code': 'B', 'name_zh': '采矿业'},
+         {'code': 'C', 'name_zh': '制造业'},
+         {'code': 'C1', 'name_zh': '食品'},
+         {'code': 'C11', 'name_zh': '粮食加工'},
+         {'code': 'C2', 'name_zh': '纺织'}]
+
+
+def codes(nodes) -> list:
+    return [x.code for x in nodes]
+
+
+def check_nested_set(rows) -> None:
+    """
+    <rows>: (code, parent code, level, lft, rgt)。lft 是先序编号，下级的 lft 落在 (上级.lft, 上级.rgt] 内。
+    """
+    node = {x[0]: x for x in rows}
+    assert sorted(x[3] for x in rows) == list(range(len(rows)))
+    for code, parent, level, lft, rgt in rows:
+        assert lft <= rgt
+        if parent is None:
+            assert level == 1
+        else:
+            assert level == node[parent][2] + 1
+            assert node[parent][3] < lft <= rgt <= node[parent][4]
+        descendants = [x for x in rows if lft < x[3] <= rgt]
+        assert len(descendants) == rgt - lft
+        assert all(x[0].startswith(code) for x in descendants)
+
+
+@pytest.fixture
+def tree():
+    return IndustryTree(ITEMS)
+
+
+def test_structure(tree):
+    assert len(tree) == 10 and 'C11' in tree and 'D' not in tree
+    assert codes(tree.root) == ['A', 'B', 'C']
+    assert tree.parent('A12').code == 'A1' and tree.parent('A') is None
+    assert [tree.level(x) for x in ('A', 'A1', 'A11')] == [1, 2, 3]
+    check_nested_set([(x.code, x.parent.code if x.parent else None, x.level, x.lft, x.rgt) for x in tree.order])
+
+
+def test_ancestors_and_descendants(tree):
+    assert codes(tree.ancestors('A11')) == ['A1', 'A']
+    assert tree.ancestors('B') == []
+    assert codes(tree.descendants('A')) == ['A1', 'A11', 'A12', 'A2']
+    assert codes(tree.descendants('C')) == ['C1', 'C11', 'C2']
+    assert tree.descendants('B') == [] and tree.descendants('A11') == []
+    assert codes(tree.leaves('A')) == ['A11', 'A12', 'A2']
+    assert codes(tree.leaves('C')) == ['C11', 'C2']
+    assert tree['B'].is_leaf and not tree['C1'].is_leaf
+
+
+def test_is_ancestor(tree):
+    assert tree.is_ancestor('A', 'A11') and tree.is_ancestor('A1', 'A12')
+    assert not tree.is_ancestor('A11', 'A') and not tree.is_ancestor('A', 'A')
+    assert not tree.is_ancestor('A1', 'A2') and not tree.is_ancestor('B', 'C1')
+    with pytest.raises(KeyError):
+        tree.is_ancestor('D', 'A')
+
+
+def test_map_to(tree):
+    other = IndustryTree([{'code': '01', 'name_zh': '农业'},
+                          {'code': '0101', 'name_zh': '谷物'},
+                          {'code': '02', 'name_zh': '食品'},
+                          {'code': '03', 'name_zh': '食品'}])
+    assert codes(tree.map_to('A11', other)) == ['0101']
+    # 没有同名行业时取最近的同名上级。
+    assert codes(tree.map_to('A12', other)) == ['01']
+    assert codes(tree.map_to('C11', other)) == ['02', '03']
+    assert tree.map_to('B', other) == []
+
+
+def test_persisted_numbering(database):
+    create_all_tables()
+    basic.initialize_table_industry_csrc()
+    basic.initialize_table_industry_nbs()
+    # 再次初始化不改变编号。
+    basic.initialize_table_industry_nbs()
+    for model, filename in [(IndustryCSRC, 'industry_csrc.csv'), (IndustryNBS, 'industry_nbs.csv')]:
+        with session_scope() as db_session:
+            rows = db_session.query(model).all()
+            code = {x.id: x.code for x in rows}
+            persisted = [(x.code, code.get(x.parent_id), x.level, x.lft, x.rgt) for x in rows]
+        assert all(x[3] is not None for x in persisted)
+        check_nested_set(persisted)
+        tree = IndustryTree.from_csv(filename)
+        assert sorted(persisted) == sorted((x.code, x.parent.code if x.parent else None, x.level, x.lft, x.rgt)
+                                           for x in tree.order)
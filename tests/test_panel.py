@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests of the market-wide panel: scattering onto the trading dates, save/load, and the loaders.
+"""
+
+import datetime
+
+import numpy as np
+import pytest
+
+from qat.quote import ColumnStore, Panel, TradingCalendar, panel_from_tdx, panel_from_store
+from qat.quote.panel import _allocate, _scatter
+
+from helpers import daily_records
+
+
+# 2020-01-01 元旦休市；01-04、01-05 为周末。
+DATES = np.array(['2019-12-30', '2019-12-31', '2020-01-02', '2020-01-03', '2020-01-06'], dtype='datetime64[D]')
+NAN = float('nan')
+
+
+def column(panel: Panel, field: str, security: str) -> list:
+    return np.asarray(panel[field][:, panel.column(security)], dtype=np.float64).tolist()
+
+
+def same(left: list, right: list) -> bool:
+    return np.allclose(left, right, rtol=1e-6, atol=0.0, equal_nan=True)
+
+
+def test_scatter():
+    panel = _allocate(DATES, ['sh600000', 'sz000001'], ['close'], np.float64, None)
+    assert panel.shape == (5, 2) and np.isnan(panel['close']).all()
+    # 不在交易日中的日期（休市日、范围之前与之后）被丢弃。
+    date = np.array(['2019-12-01', '2019-12-31', '2020-01-01', '2020-01-03', '2020-02-01'], dtype='datetime64[D]')
+    _scatter(panel, 1, date, {'close': np.array([1.0, 2.0, 3.0, 4.0, 5.0])})
+    assert same(column(panel, 'close', 'sz000001'), [NAN, 2.0, NAN, 4.0, NAN])
+    assert np.isnan(panel['close'][:, 0]).all()
+    _scatter(panel, 0, DATES[:0], {'close': np.zeros(0)})
+    assert np.isnan(panel['close'][:, 0]).all()
+
+
+@pytest.fixture
+def panel():
+    data = {'close': np.arange(10, dtype=np.float32).reshape(5, 2),
+            'volume': np.arange(10, 20, dtype=np.float32).reshape(5, 2)}
+    return Panel(DATES, np.array(['sh600000', 'sz000001']), data)
+
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_save_and_load(panel, tmp_path, mmap):
+    panel.save(str(tmp_path / 'panel'))
+    loaded = Panel.load(str(tmp_path / 'panel'), mmap=mmap)
+    assert loaded.fields == ['close', 'volume']
+    assert loaded.dates.tolist() == DATES.tolist() and loaded.securities.tolist() == ['sh600000', 'sz000001']
+    assert isinstance(loaded['close'], np.memmap) == mmap
+    np.testing.assert_array_equal(loaded['close'], panel['close'])
+    assert loaded['volume'].dtype == np.float32
+    subset = Panel.load(str(tmp_path / 'panel'), fields=['volume'], mmap=mmap)
+    assert subset.fields == ['volume']
+    np.testing.assert_array_equal(subset['volume'], panel['volume'])
+    assert subset.frame('volume').loc['2020-01-06', 'sz000001'] == 19.0
+
+
+@pytest.fixture
+def vipdoc(tmp_path):
+    sh, sz = tmp_path / 'sh' / 'lday', tmp_path / 'sz' / 'lday'
+    sh.mkdir(parents=True)
+    sz.mkdir(parents=True)
+    daily_records(DATES, [10.0, 10.5, 10.2, 10.8, 11.0]).tofile(str(sh / 'sh600000.day'))
+    # 停牌两天。
+    daily_records(DATES[[0, 3, 4]], [5.0, 5.5, 5.6]).tofile(str(sz / 'sz000001.day'))
+    return str(tmp_path)
+
+
+def test_panel_from_tdx(vipdoc, tmp_path):
+    panel = panel_from_tdx(vipdoc, fields=['close', 'volume'])
+    assert panel.dates.tolist() == DATES.tolist()
+    assert panel.securities.tolist() == ['sh600000', 'sz000001']
+    assert panel['close'].dtype == np.float32
+    assert column(panel, 'close', 'sh600000') == pytest.approx([10.0, 10.5, 10.2, 10.8, 11.0])
+    assert same(column(panel, 'close', 'sz000001'), [5.0, NAN, NAN, 5.5, 5.6])
+
+    panel = panel_from_tdx(vipdoc, exchange=('sz',), fields=['close'], start=datetime.date(2019, 12, 31),
+                           calendar=TradingCalendar(DATES), dtype=np.float64, directory=str(tmp_path / 'panel'))
+    assert panel.dates.tolist() == DATES[1:].tolist()
+    assert same(column(panel, 'close', 'sz000001'), [NAN, NAN, 5.5, 5.6])
+    loaded = Panel.load(str(tmp_path / 'panel'))
+    np.testing.assert_array_equal(loaded['close'], panel['close'])
+
+
+def test_panel_from_store(tmp_path):
+    store = ColumnStore(str(tmp_path / 'store'))
+    store.write('daily', 'sh', '600000', {'date': DATES[:3], 'close': np.array([10.0, 10.5, 10.2])})
+    store.write('daily', 'sz', '000001', {'date': DATES[2:], 'close': np.array([5.0, 5.5, 5.6])})
+    panel = panel_from_store(store, fields=['close'], dtype=np.float64)
+    assert panel.dates.tolist() == DATES.tolist()
+    assert panel.securities.tolist() == ['sh600000', 'sz000001']
+    assert same(column(panel, 'close', 'sh600000'), [10.0, 10.5, 10.2, NAN, NAN])
+    assert same(column(panel, 'close', 'sz000001'), [NAN, NAN, 5.0, 5.5, 5.6])
+
+    panel = panel_from_store(store, exchange=('sz',), fields=['close'], end=datetime.date(2020, 1, 3),
+                             directory=str(tmp_path / 'panel'))
+    assert panel.dates.tolist() == DATES[2:4].tolist() and panel.securities.tolist() == ['sz000001']
+    assert Panel.load(str(tmp_path / 'panel'))['close'][:, 0].tolist() == pytest.approx([5.0, 5.5])
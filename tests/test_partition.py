@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests of the partitioned quote tables (SQLite shards).
+"""
+
+import datetime
+import os
+import threading
+
+import numpy as np
+import pytest
+
+import qat.database
+import qat.database.partition
+from qat import config
+from qat.database.partition import insert_quote, read_security, read_cross_section, get_shard_engine
+
+
+def bars(dates) -> dict:
+    date = np.array(dates, dtype='datetime64[D]')
+    value = np.arange(len(date), dtype=np.float64) + 10.0
+    return {'date': date, 'open': value, 'high': value, 'low': value, 'close': value,
+            'volume': value * 100, 'amount': value * 1000}
+
+
+def use_database(monkeypatch, url: str) -> None:
+    monkeypatch.setattr(config, 'database_url', url)
+    monkeypatch.setattr(qat.database, '_engine', None)
+
+
+def test_shards_beside_the_database(database, tmp_path):
+    assert insert_quote('daily', 1, bars(['2019-12-31', '2020-01-02'])) == 2
+    assert {'security_quote_2019.sqlite', 'security_quote_2020.sqlite'} <= set(os.listdir(tmp_path))
+    frame = read_security('daily', 1)
+    assert frame['close'].tolist() == [10.0, 11.0]
+    assert read_cross_section('daily', datetime.date(2020, 1, 2))['security_id'].tolist() == [1]
+
+
+def test_caches_follow_the_database(monkeypatch, tmp_path):
+    use_database(monkeypatch, 'sqlite:///{}'.format(tmp_path / 'a.sqlite'))
+    insert_quote('daily', 1, bars(['2020-01-02']))
+    use_database(monkeypatch, 'sqlite:///{}'.format(tmp_path / 'b.sqlite'))
+    assert len(read_security('daily', 1)) == 0
+    # 分区表在新数据库中重新创建，而不是因为缓存认为已创建而跳过。
+    assert insert_quote('daily', 1, bars(['2020-01-02'])) == 1
+    assert os.path.exists(tmp_path / 'b_quote_2020.sqlite')
+
+
+def test_in_memory_database_keeps_shards_in_memory(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    use_database(monkeypatch, 'sqlite://')
+    insert_quote('daily', 1, bars(['2019-12-31', '2020-01-02']))
+    assert read_security('daily', 1, start=datetime.date(2020, 1, 1))['close'].tolist() == [11.0]
+    assert [x for x in os.listdir(tmp_path) if x.endswith('.sqlite')] == []
+
+
+
+def test_in_memory_shards_are_shared_by_threads(monkeypatch):
+    use_database(monkeypatch, 'sqlite://')
+    insert_quote('daily', 1, bars(['2020-01-02']))
+    result = []
+    thread = threading.Thread(target=lambda: result.append(read_security('daily', 1)['close'].tolist()))
+    thread.start()
+    thread.join()
+    assert result == [[10.0]]
+    assert get_shard_engine(2020).pool.status().startswith('StaticPool')
+
+
+def test_unknown_frequency(database):
+    with pytest.raises(ValueError, match='daily, 1min'):
+        insert_quote('5min', 1, bars(['2020-01-02']))
+    with pytest.raises(ValueError):
+        read_cross_section('weekly', datetime.date(2020, 1, 2))
+
+
+@pytest.fixture(autouse=True)
+def reset_session(monkeypatch):
+    monkeypatch.setattr(qat.database, '_session', None)
+    # 内存数据库的 URL 都相同，分片不能在测试之间沿用。
+    monkeypatch.setattr(qat.database.partition, '_shard_engine', {})
+    monkeypatch.setattr(qat.database.partition, '_created_partition', set())
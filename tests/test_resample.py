@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests of OHLCV resampling, full and incremental.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from qat.datasource.tdx import MinuteQuoteReader
+from qat.quote import resample, resample_all, IncrementalResampler
+
+from helpers import minute_records
+
+
+# 跨越月末和周末的 8 个交易日。
+DAYS = np.array(['2020-01-22', '2020-01-23', '2020-01-24', '2020-01-31',
+                 '2020-02-03', '2020-02-04', '2020-02-05', '2020-02-06'], dtype='datetime64[D]')
+
+
+def minute_bars(days=DAYS, seed: int = 0) -> pd.DataFrame:
+    # A 股每天 240 根 1 分钟线：09:31 ~ 11:30，13:01 ~ 15:00。
+    minute = np.r_[np.arange(571, 691), np.arange(781, 901)].astype('timedelta64[m]')
+    moment = (days.astype('datetime64[m]')[:, None] + minute[None, :]).ravel()
+    rng = np.random.default_rng(seed)
+    close = 10.0 + np.cumsum(rng.normal(0.0, 0.01, len(moment)))
+    date = moment.astype('datetime64[D]')
+    return pd.DataFrame({
+        'datetime': moment,
+        'date': date,
+        'time': moment - date,
+        'open': close + rng.normal(0.0, 0.005, len(moment)),
+        'high': close + 0.02,
+        'low': close - 0.02,
+        'close': close,
+        'volume': rng.integers(100, 1000, len(moment)).astype(np.float64),
+        'amount': rng.random(len(moment)) * 1e4,
+    })
+
+
+@pytest.fixture(scope='module')
+def bars():
+    return minute_bars()
+
+
+def test_daily_from_minutes(bars):
+    daily = resample(bars, 'daily')
+    assert daily['date'].values.astype('datetime64[D]').tolist() == DAYS.tolist()
+    group = bars.groupby('date')
+    np.testing.assert_allclose(daily['open'], group['open'].first())
+    np.testing.assert_allclose(daily['high'], group['high'].max())
+    np.testing.assert_allclose(daily['low'], group['low'].min())
+    np.testing.assert_allclose(daily['close'], group['close'].last())
+    np.testing.assert_allclose(daily['volume'], group['volume'].sum())
+
+
+def test_intraday_labels_follow_the_sessions(bars):
+    hourly = resample(bars, '60min')
+    first_day = hourly[hourly['date'] == DAYS[0]]
+    assert [str(x)[11:16] for x in first_day['datetime'].values] == ['10:30', '11:30', '14:00', '15:00']
+    assert len(resample(bars, '5min')) == 48 * len(DAYS)
+    # 13:01 ~ 13:05 的 K 线属于 13:05，不与上午的最后一根合并。
+    five = resample(bars.iloc[115:125], '5min')
+    assert [str(x)[11:16] for x in five['datetime'].values] == ['11:30', '13:05']
+
+
+def test_weekly_and_monthly(bars):
+    daily = resample(bars, 'daily')
+    weekly = resample(daily, 'weekly')
+    assert weekly['begin'].values.astype('datetime64[D]').tolist() == [DAYS[0], DAYS[3], DAYS[4]]
+    assert weekly['end'].values.astype('datetime64[D]').tolist() == [DAYS[2], DAYS[3], DAYS[7]]
+    monthly = resample(daily, 'monthly')
+    assert len(monthly) == 2
+    np.testing.assert_allclose(monthly['volume'].sum(), bars['volume'].sum())
+    np.testing.assert_allclose(monthly['close'], daily['close'].values[[3, 7]])
+
+
+def test_resample_all_matches_direct_resample(bars):
+    result = resample_all(bars, ('5min', '30min', '60min', 'daily', 'weekly', 'monthly'))
+    assert list(result) == ['5min', '30min', '60min', 'daily', 'weekly', 'monthly']
+    for frequency in ('5min', '30min', '60min', 'daily'):
+        pd.testing.assert_frame_equal(result[frequency], resample(bars, frequency))
+    pd.testing.assert_frame_equal(result['weekly'], resample(resample(bars, 'daily'), 'weekly'))
+
+
+def test_empty_input(bars):
+    assert len(resample(bars.iloc[:0], '5min')) == 0
+    assert len(resample(bars.iloc[:0], 'daily')) == 0
+
+
+LABEL = {'5min': 'datetime', '60min': 'datetime', 'daily': 'date', 'weekly': 'begin', 'monthly': 'begin'}
+
+
+@pytest.mark.parametrize('size', [7, 240, 1000])
+def test_incremental_matches_full(bars, size):
+    frequencies = tuple(LABEL.keys())
+    resampler = IncrementalResampler(frequencies)
+    accumulated = {x: [] for x in frequencies}
+    for begin in range(0, len(bars), size):
+        for frequency, changed in resampler.update(bars.iloc[begin:begin + size]).items():
+            rows = accumulated[frequency]
+            # 第一根与已有的最后一根属于同一组时，是对它的更新。
+            if rows and len(changed) and rows[-1][LABEL[frequency]] == changed[LABEL[frequency]].iloc[0]:
+                rows.pop()
+            rows.extend(x for _, x in changed.iterrows())
+
+    full = resample_all(bars, frequencies)
+    for frequency in frequencies:
+        incremental = pd.DataFrame(accumulated[frequency]).reset_index(drop=True)
+        expected = full[frequency]
+        assert len(incremental) == len(expected)
+        for column in ('open', 'high', 'low', 'close', 'volume', 'amount'):
+            np.testing.assert_allclose(incremental[column].astype(np.float64), expected[column], rtol=1e-9)
+
+
+def test_incremental_consumes_file_chunks(bars, tmp_path):
+    filename = str(tmp_path / 'sh000001.lc1')
+    minute_records(bars['datetime'].values, bars['close'].values).tofile(filename)
+    reader = MinuteQuoteReader(filename)
+    resampler = IncrementalResampler(('daily',))
+    daily = []
+    for chunk in reader.iter_chunks(100):
+        changed = resampler.update(chunk)['daily']
+        if daily and len(changed) and daily[-1]['date'] == changed['date'].iloc[0]:
+            daily.pop()
+        daily.extend(x for _, x in changed.iterrows())
+    expected = resample(reader.to_pandas(), 'daily')
+    assert len(daily) == len(expected) == len(DAYS)
+    np.testing.assert_allclose([x['close'] for x in daily], expected['close'])
+    np.testing.assert_allclose([x['volume'] for x in daily], expected['volume'])
+    # 只读取 offset 之后的记录。
+    assert sum(len(x) for x in reader.iter_chunks(100, raw=True, offset=len(reader) - 250)) == 250
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests of the columnar quote store.
+"""
+
+import datetime
+import os
+
+import numpy as np
+import pytest
+
+from qat.quote import ColumnStore
+
+from helpers import daily_records, minute_records
+
+
+DATES = np.arange('2020-01-01', '2020-01-21', dtype='datetime64[D]')
+
+
+def bars(dates, close) -> dict:
+    close = np.asarray(close, dtype=np.float64)
+    return {'date': np.asarray(dates, dtype='datetime64[D]'), 'close': close, 'volume': close * 100}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ColumnStore(str(tmp_path / 'store'))
+
+
+def test_write_and_read(store):
+    assert store.write('daily', 'sh', '600000', bars(DATES, np.arange(20))) == 20
+    assert store.securities('daily') == [('sh', '600000')]
+    assert store.columns('daily', 'sh', '600000') == ['close', 'date', 'volume']
+    assert store.last_key('daily', 'sh', '600000') == DATES[-1]
+    frame = store.read('daily', 'sh', '600000', datetime.date(2020, 1, 3), datetime.date(2020, 1, 5))
+    assert frame['date'].values.astype('datetime64[D]').tolist() == DATES[2:5].tolist()
+    assert frame['close'].tolist() == [2.0, 3.0, 4.0]
+    value = store.read('daily', 'sh', '600000', columns=['volume'], as_frame=False)
+    assert sorted(value) == ['date', 'volume'] and len(value['volume']) == 20
+    with pytest.raises(FileNotFoundError):
+        store.read('daily', 'sh', '600004')
+
+
+def test_append_writes_only_the_tail_in_place(store):
+    store.write('daily', 'sh', '600000', bars(DATES[:10], np.arange(10)))
+    folder = store.path('daily', 'sh', '600000')
+    before = os.listdir(folder)
+    # 与已保存部分重叠的记录被跳过。
+    assert store.write('daily', 'sh', '600000', bars(DATES[5:], np.arange(5, 20))) == 10
+    assert store.write('daily', 'sh', '600000', bars(DATES[5:], np.arange(5, 20))) == 0
+    assert sorted(os.listdir(folder)) == sorted(before)
+    assert store.read('daily', 'sh', '600000')['close'].tolist() == list(map(float, range(20)))
+
+
+def test_append_ignores_an_interrupted_tail(store):
+    store.write('daily', 'sh', '600000', bars(DATES[:10], np.arange(10)))
+    # 写者在更新 manifest 之前中断：列文件末尾多出的数据不可见。
+    with open(store._column_file('daily', 'sh', '600000', 0, 'close'), 'ab') as f:
+        f.write(np.array([99.0, 99.0]).tobytes())
+    assert len(store.read('daily', 'sh', '600000')) == 10
+    store.write('daily', 'sh', '600000', bars(DATES[10:12], [10, 11]))
+    assert store.read('daily', 'sh', '600000')['close'].tolist() == list(map(float, range(12)))
+
+
+def test_column_mismatch_raises(store):
+    store.write('daily', 'sh', '600000', bars(DATES[:10], np.arange(10)))
+    data = bars(DATES[10:], np.arange(10, 20))
+    with pytest.raises(ValueError):
+        store.write('daily', 'sh', '600000', {x: data[x] for x in ('date', 'close')})
+    with pytest.raises(ValueError):
+        store.write('daily', 'sh', '600000', dict(data, amount=data['close']))
+    assert len(store.read('daily', 'sh', '600000')) == 10
+    # 覆盖写入可以改变列。
+    assert store.write('daily', 'sh', '600000', {x: data[x] for x in ('date', 'close')}, append=False) == 10
+    assert store.columns('daily', 'sh', '600000') == ['close', 'date']
+
+
+def test_overwrite_switches_versions(store):
+    store.write('daily', 'sh', '600000', bars(DATES[:10], np.arange(10)))
+    old = store.read('daily', 'sh', '600000', as_frame=False)
+    store.write('daily', 'sh', '600000', bars(DATES[:5], np.arange(50, 55)), append=False)
+    assert store.read('daily', 'sh', '600000')['close'].tolist() == list(map(float, range(50, 55)))
+    assert sorted(os.listdir(store.path('daily', 'sh', '600000'))) == ['1', 'manifest.json']
+    # 覆盖之前映射的视图仍然完整。
+    assert old['close'].tolist() == list(map(float, range(10)))
+
+
+def test_minute_columns_and_import_tdx(store, tmp_path):
+    folder = tmp_path / 'vipdoc' / 'sh' / 'minline'
+    folder.mkdir(parents=True)
+    moment = np.datetime64('2020-01-02T09:31') + np.arange(8).astype('timedelta64[m]')
+    record = minute_records(moment, np.arange(8) + 10.0)
+    record[:5].tofile(str(folder / 'sh000001.lc1'))
+    assert store.import_tdx(str(tmp_path / 'vipdoc'), '1min', ('sh',)) == 5
+    record.tofile(str(folder / 'sh000001.lc1'))
+    assert store.import_tdx(str(tmp_path / 'vipdoc'), '1min', ('sh',)) == 3
+
+    assert 'date' not in store.columns('1min', 'sh', '000001')
+    frame = store.read('1min', 'sh', '000001', end=datetime.datetime(2020, 1, 2, 9, 35), columns=['date', 'time', 'close'])
+    assert frame['close'].tolist() == [10.0, 11.0, 12.0, 13.0, 14.0]
+    assert str(frame['time'].iloc[0]) == '0 days 09:31:00'
+    assert len(store.read('1min', 'sh', '000001', end=datetime.date(2020, 1, 2))) == 8
+
+
+def test_import_tdx_daily(store, tmp_path):
+    folder = tmp_path / 'vipdoc' / 'sh' / 'lday'
+    folder.mkdir(parents=True)
+    record = daily_records(DATES, np.arange(10, 30))
+    record[:10].tofile(str(folder / 'sh600000.day'))
+    assert store.import_tdx(str(tmp_path / 'vipdoc'), 'daily', ('sh',)) == 10
+    record.tofile(str(folder / 'sh600000.day'))
+    assert store.import_tdx(str(tmp_path / 'vipdoc'), 'daily', ('sh',)) == 10
+    assert store.read('daily', 'sh', '600000')['close'].tolist() == pytest.approx(list(range(10, 30)))
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests of the TDX quote file readers.
+"""
+
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from qat.datasource.tdx import DailyQuoteReader, MinuteQuoteReader, read_vipdoc
+
+from helpers import daily_records, minute_records
+
+
+DATES = np.array(['2019-12-30', '2019-12-31', '2020-01-02', '2020-01-03', '2020-01-06'], dtype='datetime64[D]')
+DAILY_COLUMNS = ['date', 'open', 'high', 'low', 'close', 'amount', 'volume']
+# 两个交易日各 3 根 1 分钟线，跨越午休。
+MOMENTS = np.array(['2020-01-02T09:31', '2020-01-02T11:30', '2020-01-02T13:01',
+                    '2020-01-03T09:31', '2020-01-03T11:30', '2020-01-03T15:00'], dtype='datetime64[m]')
+MINUTE_COLUMNS = ['date', 'time', 'open', 'high', 'low', 'close', 'amount', 'volume']
+
+
+@pytest.fixture
+def day_file(tmp_path):
+    filename = tmp_path / 'sh600000.day'
+    daily_records(DATES, [10.0, 10.5, 10.2, 10.8, 11.0]).tofile(str(filename))
+    return str(filename)
+
+
+@pytest.fixture
+def minute_file(tmp_path):
+    filename = tmp_path / 'sh000001.lc1'
+    minute_records(MOMENTS, np.arange(6) + 10.25).tofile(str(filename))
+    return str(filename)
+
+
+@pytest.fixture
+def empty_day_file(tmp_path):
+    filename = tmp_path / 'sh600001.day'
+    filename.write_bytes(b'')
+    return str(filename)
+
+
+def test_daily_to_pandas_matches_to_python(day_file):
+    reader = DailyQuoteReader(day_file)
+    expected = pd.DataFrame(reader.to_python(), columns=DAILY_COLUMNS)
+    pd.testing.assert_frame_equal(reader.to_pandas(), expected, check_dtype=False)
+    assert reader.to_pandas()['date'].tolist() == [x.item() for x in DATES]
+    frame = reader.to_pandas(date_as_object=False)
+    assert frame['date'].values.astype('datetime64[D]').tolist() == DATES.tolist()
+    assert frame['volume'].dtype == np.int64
+
+
+def test_daily_decode_columns(day_file):
+    reader = DailyQuoteReader(day_file)
+    column = reader.decode_columns(reader.to_numpy(), ['date', 'close'])
+    assert sorted(column) == ['close', 'date']
+    assert column['close'].tolist() == pytest.approx([10.0, 10.5, 10.2, 10.8, 11.0])
+    assert list(reader.decode_columns(reader.to_numpy())) == DAILY_COLUMNS
+
+
+def test_empty_daily_file(empty_day_file):
+    reader = DailyQuoteReader(empty_day_file)
+    assert len(reader) == 0
+    assert list(reader.to_python()) == []
+    frame = reader.to_pandas()
+    assert len(frame) == 0 and list(frame.columns) == DAILY_COLUMNS
+
+
+def test_minute_to_pandas_matches_to_python(minute_file):
+    reader = MinuteQuoteReader(minute_file)
+    expected = pd.DataFrame(reader.to_python(), columns=MINUTE_COLUMNS)
+    frame = reader.to_pandas(date_as_object=True, time_as_object=True)
+    pd.testing.assert_frame_equal(frame[MINUTE_COLUMNS], expected, check_dtype=False)
+    assert expected['time'].tolist()[:3] == [datetime.time(9, 31), datetime.time(11, 30), datetime.time(13, 1)]
+    frame = reader.to_pandas()
+    assert frame['datetime'].values.astype('datetime64[m]').tolist() == MOMENTS.tolist()
+    assert (frame['datetime'] - frame['date'] == frame['time']).all()
+
+
+def test_empty_minute_file(tmp_path):
+    filename = tmp_path / 'sh000002.lc5'
+    filename.write_bytes(b'')
+    reader = MinuteQuoteReader(str(filename))
+    assert list(reader.to_python()) == []
+    assert len(reader.to_pandas()) == 0
+
+
+def test_memmap_and_unpack(day_file, empty_day_file):
+    reader = DailyQuoteReader(day_file)
+    record = reader.memmap()
+    assert isinstance(record, np.memmap) and not record.flags.writeable
+    assert record.tolist() == reader.to_numpy().tolist()
+    assert reader.to_numpy(mmap=True).tolist() == record.tolist()
+    assert [x for x in reader.unpack()] == record.tolist()
+    empty = DailyQuoteReader(empty_day_file)
+    assert len(empty.memmap()) == 0 and empty.memmap().dtype == reader.dtype
+    assert list(empty.unpack()) == []
+
+
+def test_tail(day_file, minute_file, empty_day_file):
+    reader = DailyQuoteReader(day_file)
+    assert reader.tail(2)['close'].tolist() == pytest.approx([10.8, 11.0])
+    pd.testing.assert_frame_equal(reader.tail(10), reader.to_pandas(date_as_object=False))
+    assert reader.tail(0).empty
+    assert reader.tail(1, date_as_object=True)['date'].tolist() == [datetime.date(2020, 1, 6)]
+    assert MinuteQuoteReader(minute_file).tail(1)['datetime'].tolist() == [pd.Timestamp('2020-01-03 15:00')]
+    assert DailyQuoteReader(empty_day_file).tail(5).empty
+
+
+def test_locate_and_records(day_file, empty_day_file):
+    reader = DailyQuoteReader(day_file)
+    assert reader.locate() == slice(0, 5)
+    # 边界不是交易日时取其后（前）的第一条。
+    assert reader.locate(datetime.date(2020, 1, 1), datetime.date(2020, 1, 5)) == slice(2, 4)
+    # 日线原始记录的价格单位为分。
+    assert reader.records(datetime.date(2019, 12, 31), datetime.date(2020, 1, 3))['close'].tolist() == [1050, 1020, 1080]
+    # 不匹配任何记录的范围：早于、晚于全部记录，或落在两条记录之间。
+    for start, end in [(datetime.date(2019, 1, 1), datetime.date(2019, 12, 29)),
+                       (datetime.date(2020, 1, 7), None),
+                       (datetime.date(2020, 1, 4), datetime.date(2020, 1, 5)),
+                       (datetime.date(2020, 1, 6), datetime.date(2020, 1, 2))]:
+        span = reader.locate(start, end)
+        assert span.start == span.stop
+        assert len(reader.records(start, end)) == 0
+        assert len(reader.to_pandas(start=start, end=end)) == 0
+    empty = DailyQuoteReader(empty_day_file)
+    assert empty.locate(datetime.date(2020, 1, 1)) == slice(0, 0)
+    assert len(empty.records(end=datetime.date(2020, 1, 1))) == 0
+
+
+def test_minute_range_by_date(minute_file):
+    reader = MinuteQuoteReader(minute_file)
+    # 只给出日期时，end 包含当天全部分钟线。
+    assert reader.locate(end=datetime.date(2020, 1, 2)) == slice(0, 3)
+    assert reader.locate(datetime.date(2020, 1, 3), datetime.date(2020, 1, 3)) == slice(3, 6)
+    assert reader.locate(end=datetime.datetime(2020, 1, 2, 11, 30)) == slice(0, 2)
+    assert reader.locate(datetime.datetime(2020, 1, 2, 11, 31), datetime.datetime(2020, 1, 2, 13, 0)) == slice(2, 2)
+    frame = reader.to_pandas(start=datetime.date(2020, 1, 2), end=datetime.date(2020, 1, 2))
+    assert frame['datetime'].tolist() == [pd.Timestamp(x) for x in MOMENTS[:3].tolist()]
+    assert len(reader.to_pandas(start=datetime.date(2020, 1, 4))) == 0
+
+
+def test_iter_chunks(day_file, minute_file, empty_day_file):
+    reader = DailyQuoteReader(day_file)
+    chunks = list(reader.iter_chunks(2))
+    assert [len(x) for x in chunks] == [2, 2, 1]
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), reader.to_pandas(date_as_object=False))
+    chunks = list(reader.iter_chunks(2, start=datetime.date(2019, 12, 31), raw=True, offset=2))
+    assert [x['close'].tolist() for x in chunks] == [[1020, 1080], [1100]]
+    assert list(reader.iter_chunks(2, offset=5)) == []
+    assert list(reader.iter_chunks(2, start=datetime.date(2020, 1, 7))) == []
+    assert list(DailyQuoteReader(empty_day_file).iter_chunks(2)) == []
+    chunks = list(MinuteQuoteReader(minute_file).iter_chunks(4, end=datetime.date(2020, 1, 2), time_as_object=True))
+    assert len(chunks) == 1 and chunks[0]['time'].tolist()[-1] == datetime.time(13, 1)
+
+
+@pytest.fixture
+def vipdoc(tmp_path):
+    for exchange, code, begin in [('sh', '600000', 0), ('sh', '600004', 2), ('sz', '000001', 1)]:
+        folder = tmp_path / exchange / 'lday'
+        folder.mkdir(parents=True, exist_ok=True)
+        daily_records(DATES[begin:], np.arange(begin, 5) + 10.0).tofile(str(folder / (exchange + code + '.day')))
+    folder = tmp_path / 'sz' / 'minline'
+    folder.mkdir(parents=True)
+    minute_records(MOMENTS, np.arange(6) + 10.25).tofile(str(folder / 'sz000001.lc1'))
+    (folder / 'sz000002.lc1').write_bytes(b'')
+    return str(tmp_path)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_read_vipdoc(vipdoc, workers):
+    frame = read_vipdoc(vipdoc, workers=workers)
+    assert frame.index.names == ['exchange', 'code']
+    assert frame.index.tolist() == [('sh', '600000')] * 5 + [('sh', '600004')] * 3 + [('sz', '000001')] * 4
+    assert frame.loc[('sh', '600004'), 'close'].tolist() == pytest.approx([12.0, 13.0, 14.0])
+    assert frame.loc[('sz', '000001'), 'date'].tolist() == [pd.Timestamp(x) for x in DATES[1:].tolist()]
+
+    result = read_vipdoc(vipdoc, exchange=('sh',), start=datetime.date(2020, 1, 3), workers=workers, combine=False)
+    assert sorted(result) == [('sh', '600000'), ('sh', '600004')]
+    assert all(x['close'].tolist() == pytest.approx([13.0, 14.0]) for x in result.values())
+
+    result = read_vipdoc(vipdoc, '1min', end=datetime.date(2020, 1, 2), workers=workers, combine=False)
+    assert sorted(result) == [('sz', '000001'), ('sz', '000002')]
+    assert len(result[('sz', '000001')]) == 3 and len(result[('sz', '000002')]) == 0
+    assert read_vipdoc(vipdoc, '5min', workers=workers).empty
+    assert read_vipdoc(vipdoc, '5min', workers=workers, combine=False) == {}
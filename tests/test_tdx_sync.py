@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests of the incremental sync of TDX quote files into the quote tables.
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from qat.database import get_quote_table
+from qat.data_source.tdx_sync import sync_quote_file
+
+from helpers import daily_records, minute_records
+
+
+DATES = np.arange('2020-01-01', '2020-01-21', dtype='datetime64[D]')
+
+
+def write(filename, record) -> None:
+    record.tofile(str(filename))
+    # 保证每次写入后 mtime 都不同，即使在同一个时钟刻度内。
+    stat = os.stat(filename)
+    os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+
+
+def rows(engine, table: str) -> list:
+    return engine.execute('SELECT date, close, pre_close FROM {} ORDER BY date'.format(table)).fetchall()
+
+
+@pytest.fixture
+def day_file(tmp_path):
+    return tmp_path / 'sh600000.day'
+
+
+def test_first_sync(database, day_file):
+    write(day_file, daily_records(DATES[:10], np.arange(10, 20)))
+    assert sync_quote_file(str(day_file), 'sh', '600000') == 10
+    result = rows(database, 'quote_sh_stock_600000_daily')
+    assert [x[1] for x in result] == list(range(10, 20))
+    assert result[0][0] == '2020-01-01'
+    state = database.execute('SELECT "offset", size, last_date FROM quote_sync_state').fetchone()
+    assert state == (320, 320, '2020-01-10')
+    # 文件未变：不读取、不写入。
+    assert sync_quote_file(str(day_file), 'sh', '600000') == 0
+
+
+def test_append_only_imports_the_tail(database, day_file):
+    record = daily_records(DATES, np.arange(10, 30))
+    write(day_file, record[:10])
+    sync_quote_file(str(day_file), 'sh', '600000')
+    write(day_file, record)
+    assert sync_quote_file(str(day_file), 'sh', '600000') == 10
+    result = rows(database, 'quote_sh_stock_600000_daily')
+    assert len(result) == 20
+    assert len({x[0] for x in result}) == 20
+    # 追加部分第一条的前收盘取自文件中的上日收盘。
+    assert result[10][2] == pytest.approx(19.0)
+
+
+def test_touched_file_is_not_reimported(database, day_file):
+    write(day_file, daily_records(DATES[:10], np.arange(10, 20)))
+    sync_quote_file(str(day_file), 'sh', '600000')
+    write(day_file, daily_records(DATES[:10], np.arange(10, 20)))
+    assert sync_quote_file(str(day_file), 'sh', '600000') == 0
+    assert len(rows(database, 'quote_sh_stock_600000_daily')) == 10
+
+
+def test_shrunk_file_is_reloaded(database, day_file):
+    write(day_file, daily_records(DATES[:10], np.arange(10, 20)))
+    sync_quote_file(str(day_file), 'sh', '600000')
+    write(day_file, daily_records(DATES[:5], np.arange(50, 55)))
+    assert sync_quote_file(str(day_file), 'sh', '600000') == 5
+    assert [x[1] for x in rows(database, 'quote_sh_stock_600000_daily')] == list(range(50, 55))
+
+
+def test_rewritten_file_is_reloaded(database, day_file):
+    write(day_file, daily_records(DATES[:10], np.arange(10, 20)))
+    sync_quote_file(str(day_file), 'sh', '600000')
+    # 同样大小，但历史记录被改写（如重新下载了全部数据）。
+    write(day_file, daily_records(DATES[:10], np.arange(30, 40)))
+    assert sync_quote_file(str(day_file), 'sh', '600000') == 10
+    assert [x[1] for x in rows(database, 'quote_sh_stock_600000_daily')] == list(range(30, 40))
+
+
+def test_missing_state_resumes_after_the_table(database, day_file):
+    record = daily_records(DATES, np.arange(10, 30))
+    write(day_file, record[:10])
+    sync_quote_file(str(day_file), 'sh', '600000')
+    database.execute('DELETE FROM quote_sync_state')
+    write(day_file, record[:13])
+    assert sync_quote_file(str(day_file), 'sh', '600000') == 3
+    result = rows(database, 'quote_sh_stock_600000_daily')
+    assert [x[1] for x in result] == list(range(10, 23))
+    assert sync_quote_file(str(day_file), 'sh', '600000') == 0
+
+
+def test_missing_state_minute_file(database, tmp_path):
+    filename = tmp_path / 'sh000001.lc1'
+    moment = np.datetime64('2020-01-02T09:31') + np.arange(8).astype('timedelta64[m]')
+    record = minute_records(moment, np.arange(8) + 10.0)
+    write(filename, record[:5])
+    assert sync_quote_file(str(filename), 'sh', '000001', '1min') == 5
+    database.execute('DELETE FROM quote_sync_state')
+    write(filename, record)
+    assert sync_quote_file(str(filename), 'sh', '000001', '1min') == 3
+    assert database.execute('SELECT count(*) FROM {}'.format(
+        get_quote_table('sh', 'stock', '000001', '1min').name)).scalar() == 8
+
+
+def test_chunks_carry_the_previous_close(database, day_file):
+    close = np.arange(10, 30)
+    pre_close = np.r_[10, close[:-1]].astype(np.float64)
+    # 第 13 条是除权日：上日收盘价取文件中的除权参考价，而不是前一条的收盘价。
+    pre_close[12] = 10.5
+    write(day_file, daily_records(DATES, close, pre_close))
+    assert sync_quote_file(str(day_file), 'sh', '600000', chunk_rows=3) == 20
+    result = rows(database, 'quote_sh_stock_600000_daily')
+    assert [x[2] for x in result] == pytest.approx(pre_close.tolist())
+    state = database.execute('SELECT "offset", last_date FROM quote_sync_state').fetchone()
+    assert state == (640, '2020-01-20')